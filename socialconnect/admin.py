@@ -1,4 +1,4 @@
-from socialconnect.models import FBPlatform, OSPlatform
+from socialconnect.models import FBPlatform, OSPlatform, RemoteJob
 from django.contrib import admin
 
 # Add the platform management to the Django admin
@@ -19,3 +19,10 @@ class OSPlatformAdmin(admin.ModelAdmin):
         ('Fields correction', {'fields': ('os_id', 'os_displayName', 'os_profileUrl', 'os_birthday', 'os_gender', 'os_description', 'os_emails', 'os_addresses', 'os_thumbnailUrl', 'os_organizations')})
     )
 admin.site.register(OSPlatform, OSPlatformAdmin )
+
+
+# Follow the remote calls made in background
+class RemoteJobAdmin(admin.ModelAdmin):
+    list_display = ('method', 'platform', 'user', 'status', 'attempts', 'next_attempt', 'created')
+    list_filter = ('status', 'method', 'platform')
+admin.site.register(RemoteJob, RemoteJobAdmin)
@@ -0,0 +1,123 @@
+'''
+    Benchmark of the PlatformAccount lookups with and without the composite indexes of its unique_together.
+
+    The table is built directly with sqlite3, with the columns and single column foreign key indexes that syncdb
+    creates for socialconnect_platformaccount. The script prints the query plan and the mean latency of each
+    access path, first with the foreign key indexes only and then with the (user, platform) and
+    (platform, remote_id) unique indexes.
+
+    Usage: python -m socialconnect.benchmarks.account_indexes [accounts] [database file]
+'''
+
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+
+
+# number of platforms and of remote friends for the matched friends lookup
+PLATFORMS = 5
+FRIENDS = 500
+
+# number of runs of each query
+RUNS = 200
+
+
+def create_table(db, accounts):
+    '''
+        Create and fill the table. Each user has one account on each platform.
+    '''
+
+    db.execute('''CREATE TABLE "socialconnect_platformaccount" (
+        "id" integer NOT NULL PRIMARY KEY,
+        "platform_id" integer NOT NULL,
+        "user_id" integer NOT NULL,
+        "remote_id" varchar(200) NULL,
+        "is_active" bool NOT NULL,
+        "content_type_id" integer NULL)''')
+    db.execute('CREATE INDEX "socialconnect_platformaccount_platform_id" ON "socialconnect_platformaccount" ("platform_id")')
+    db.execute('CREATE INDEX "socialconnect_platformaccount_user_id" ON "socialconnect_platformaccount" ("user_id")')
+    db.execute('CREATE INDEX "socialconnect_platformaccount_content_type_id" ON "socialconnect_platformaccount" ("content_type_id")')
+
+    def rows():
+        for account_id in xrange(1, accounts + 1):
+            yield (account_id, account_id % PLATFORMS + 1, account_id // PLATFORMS + 1, str(1000000000 + account_id * 7919 % 999999937), 1, 10)
+
+    db.executemany('INSERT INTO "socialconnect_platformaccount" VALUES (?, ?, ?, ?, ?, ?)', rows())
+    db.commit()
+
+
+def add_indexes(db):
+    '''
+        Create the indexes of the unique_together of PlatformAccount.
+    '''
+
+    db.execute('CREATE UNIQUE INDEX "socialconnect_platformaccount_user_platform" ON "socialconnect_platformaccount" ("user_id", "platform_id")')
+    db.execute('CREATE UNIQUE INDEX "socialconnect_platformaccount_platform_remote_id" ON "socialconnect_platformaccount" ("platform_id", "remote_id")')
+    db.execute('ANALYZE')
+    db.commit()
+
+
+def queries(db, accounts):
+    '''
+        The access paths of the SocialContext with parameters picked among the existing accounts.
+    '''
+
+    remote_ids = [row[0] for row in db.execute('SELECT "remote_id" FROM "socialconnect_platformaccount" WHERE "platform_id" = 1 LIMIT ?', (FRIENDS * 4, ))]
+    users = accounts // PLATFORMS
+
+    return [
+        ('check_synchronization (user, platform)',
+            'SELECT * FROM "socialconnect_platformaccount" WHERE "platform_id" = ? AND "user_id" = ?',
+            lambda: (random.randint(1, PLATFORMS), random.randint(1, users))),
+        ('duplicate check (platform, remote_id)',
+            'SELECT COUNT(*) FROM "socialconnect_platformaccount" WHERE "platform_id" = ? AND "remote_id" = ? AND NOT "user_id" = ?',
+            lambda: (1, random.choice(remote_ids), random.randint(1, users))),
+        ('matched friends (platform, remote_id IN)',
+            'SELECT * FROM "socialconnect_platformaccount" WHERE "platform_id" = ? AND "remote_id" IN (%s)' % ', '.join(['?'] * FRIENDS),
+            lambda: [1] + random.sample(remote_ids, FRIENDS)),
+    ]
+
+
+def run(db, accounts):
+    for name, sql, params in queries(db, accounts):
+        plan = ' / '.join([row[-1] for row in db.execute('EXPLAIN QUERY PLAN ' + sql, params())])
+
+        start = time.time()
+        for i in xrange(RUNS):
+            db.execute(sql, params()).fetchall()
+        latency = (time.time() - start) / RUNS * 1000
+
+        print '  %-42s %9.3f ms   %s' % (name, latency, plan)
+
+
+def main(accounts=1000000, path=None):
+    random.seed(0)
+
+    if path is None:
+        handle, path = tempfile.mkstemp(suffix='.db')
+        os.close(handle)
+        os.remove(path)
+
+    db = sqlite3.connect(path)
+    try:
+        start = time.time()
+        create_table(db, accounts)
+        print 'Created %d accounts in %.1f s (sqlite %s)' % (accounts, time.time() - start, sqlite3.sqlite_version)
+
+        print 'Foreign key indexes only:'
+        run(db, accounts)
+
+        add_indexes(db)
+        print 'With the unique_together indexes:'
+        run(db, accounts)
+    finally:
+        db.close()
+        os.remove(path)
+
+
+if __name__ == '__main__':
+    args = sys.argv[1:]
+    main(args and int(args[0]) or 1000000, len(args) > 1 and args[1] or None)
@@ -0,0 +1,11 @@
+from django.db import models
+from django.contrib.auth.models import User
+
+
+class BenchmarkProfile(models.Model):
+    '''
+        The AUTH_PROFILE_MODULE of the socialconnect.benchmarks.social_context benchmarks, the minimal profile the
+        platform accounts can be linked to.
+    '''
+
+    user = models.ForeignKey(User, unique=True)
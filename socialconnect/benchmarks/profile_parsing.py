@@ -0,0 +1,99 @@
+'''
+    Microbenchmark of the gender and birthday parsing of FBProfile and OSProfile.
+
+    The parsers of socialconnect.classes.parsers are compared with the previous implementation, which compiled the
+    patterns for each profile and resolved the month names with time.strptime. Both run over the same synthetic profiles.
+
+    Usage: python -m socialconnect.benchmarks.profile_parsing [profiles]
+'''
+
+import random
+import re
+import sys
+import time
+from datetime import date
+
+from socialconnect.classes import parsers
+
+
+MONTHS = ('January', 'February', 'March', 'April', 'May', 'June', 'July', 'August', 'September', 'October', 'November', 'December')
+
+
+def old_fb_sex(sex):
+    if sex is not None:
+        reg_male = re.compile('^male$')
+        reg_female = re.compile('^female$')
+        if reg_male.match(sex):
+            return 'M'
+        elif reg_female.match(sex):
+            return 'F'
+    return 'X'
+
+
+def old_fb_birthday(birthday):
+    if birthday is not None:
+        reg = re.compile('^(\w+)\s(\d{1,2}),\s(\d{4})$')
+        m = reg.match(birthday)
+        if m:
+            return date(int(m.group(3)), time.strptime(m.group(1), "%B")[1], int(m.group(2)))
+    return birthday
+
+
+def old_os_sex(sex):
+    if sex is not None:
+        reg_male = re.compile('^male|Male$')
+        reg_female = re.compile('^female|Female$')
+        if reg_male.match(sex):
+            return 'M'
+        elif reg_female.match(sex):
+            return 'F'
+    return 'X'
+
+
+def old_os_birthday(birthday):
+    if birthday is not None:
+        reg = re.compile('^(\d{4})-(\d{2})-(\d{2})')
+        m = reg.match(birthday)
+        if m:
+            return date(int(m.group(1)), int(m.group(2)), int(m.group(3)))
+    return birthday
+
+
+def synthetic_profiles(count):
+    '''
+        Return (sex, Facebook birthday, OpenSocial birthday) tuples with some missing values.
+    '''
+
+    random.seed(0)
+    profiles = []
+    for i in xrange(count):
+        year, month, day = random.randint(1940, 2000), random.randint(1, 12), random.randint(1, 28)
+        sex = random.choice(('male', 'female', None))
+        fb_birthday = random.choice(('%s %d, %d' % (MONTHS[month - 1], day, year), None))
+        os_birthday = random.choice(('%04d-%02d-%02d' % (year, month, day), None))
+        profiles.append((sex, fb_birthday, os_birthday))
+    return profiles
+
+
+def measure(name, profiles, parse_sex, parse_birthday, index):
+    start = time.time()
+    results = [(parse_sex(profile[0]), parse_birthday(profile[index])) for profile in profiles]
+    elapsed = time.time() - start
+    print '  %-24s %8.3f s  %8.2f us/profile' % (name, elapsed, elapsed / len(profiles) * 1000000)
+    return results
+
+
+def main(count=100000):
+    profiles = synthetic_profiles(count)
+    print 'Parsing %d profiles:' % count
+
+    for platform, index, old, new in (
+            ('Facebook', 1, (old_fb_sex, old_fb_birthday), (parsers.parse_fb_sex, parsers.parse_fb_birthday)),
+            ('OpenSocial', 2, (old_os_sex, old_os_birthday), (parsers.parse_os_sex, parsers.parse_os_birthday))):
+        old_results = measure('%s old' % platform, profiles, old[0], old[1], index)
+        new_results = measure('%s new' % platform, profiles, new[0], new[1], index)
+        assert old_results == new_results, 'the parsers disagree'
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:2]])
@@ -0,0 +1,341 @@
+'''
+    Benchmarks of the SocialContext hot paths: the wall time and the number of database queries of each call.
+
+    Django is configured in memory (sqlite3 :memory:, locmem cache, remote cache disabled) with a Facebook and an OpenSocial
+    platform and local accounts linked to the remote ids 1 to accounts. pyfacebook, the OpenSocial client and the signed
+    OpenSocial requests are replaced by stubs returning canned payloads, built once from a FriendGraph, so the results only
+    depend on the code under test. The friends of the remote user 1 are drawn among twice as many remote users as there are
+    local accounts, about half of them are matched.
+
+    The results are printed as JSON with the commit they were measured on. --output writes them to a file and --compare
+    prints the ratio of each benchmark to the results of a previous run.
+
+    Usage: python -m socialconnect.benchmarks.social_context [--accounts 1000] [--friends 500] [--runs 20]
+           [--output results.json] [--compare previous.json]
+'''
+
+import cPickle as pickle
+import os
+import re
+import subprocess
+import sys
+import time
+from StringIO import StringIO
+from optparse import OptionParser
+
+try:
+    import json
+except ImportError:
+    import simplejson as json
+
+from django.conf import settings
+
+from socialconnect.simulator.graph import FriendGraph
+
+
+# the remote id of the benchmarked user on both platforms
+REMOTE_ID = 1
+
+# the canned payloads, see build_payloads
+PAYLOADS = {}
+
+# the paging of the FQL queries
+FQL_PAGE = re.compile(r'LIMIT (\d+)(?: OFFSET (\d+))?$')
+
+
+class Namespace(object):
+    '''
+        An object with the given attributes, like the namespaces of pyfacebook (friends, fql...).
+    '''
+
+    def __init__(self, **attributes):
+        self.__dict__.update(attributes)
+
+
+
+class StubFacebook(object):
+    '''
+        Stands in for the pyfacebook Facebook object. Only the calls of the benchmarks are implemented.
+    '''
+
+    def __init__(self, api_key, secret_key, auth_token=None, **kwargs):
+        self.session_key = auth_token
+        self.session_key_expires = None
+        self.uid = None
+        self.friends = Namespace(get=lambda: PAYLOADS['fb_friends_ids'])
+        self.fql = Namespace(query=lambda query: fql_page(PAYLOADS['fb_friends'], query))
+
+
+
+def fql_page(friends, query):
+    '''
+        Return the page of the friends selected by the LIMIT and OFFSET of a FQL query.
+    '''
+
+    m = FQL_PAGE.search(query)
+    if m is None:
+        return friends
+    offset = int(m.group(2) or 0)
+    return friends[offset:offset + int(m.group(1))]
+
+
+
+class StubOpenSocial(object):
+    '''
+        Stands in for the OpenSocial object of opensocial-rest-client. Only the calls of the benchmarks are implemented.
+    '''
+
+    def __init__(self, consumer_key, consumer_secret, signature_method, api_url, key, secret, expire):
+        self.token = Namespace(key=key, secret=secret)
+        self.token_expire = expire
+
+
+    def get_friends(self, fields):
+        return PAYLOADS['os_friends']
+
+
+
+def open_canned_request(platform, token, path, parameters=None, body=None, method='GET'):
+    '''
+        Stands in for streaming.open_signed_request: the response is the canned JSON document of the friends, with the ids
+        only when they are the only requested field.
+    '''
+
+    if parameters and parameters.get('fields') == 'id':
+        return StringIO(PAYLOADS['os_friends_ids_document'])
+    return StringIO(PAYLOADS['os_friends_document'])
+
+
+def build_payloads(accounts, friends):
+    '''
+        Build the canned payloads of the friends of REMOTE_ID in the formats of both platforms.
+    '''
+
+    from socialconnect.classes.profile import Profile
+
+    graph = FriendGraph(size=accounts * 2, mean_friends=friends * 100, max_friends=friends)
+    ids = graph.friends(REMOTE_ID)
+    fb_fields = Profile.get_default_fields('FB').values()
+    os_fields = Profile.get_default_fields('OS').values()
+
+    PAYLOADS['fb_friends_ids'] = ids
+    PAYLOADS['fb_friends'] = [graph.fb_profile(uid, fb_fields) for uid in ids]
+    PAYLOADS['os_friends'] = [graph.os_person(uid, os_fields) for uid in ids]
+    PAYLOADS['os_friends_document'] = json.dumps({'startIndex': 0, 'totalResults': len(ids), 'entry': PAYLOADS['os_friends']})
+    PAYLOADS['os_friends_ids_document'] = json.dumps({'startIndex': 0, 'totalResults': len(ids), 'entry': [{'id': str(uid)} for uid in ids]})
+
+
+def configure():
+    '''
+        Configure Django, install the stubs and create the tables. Must be called before socialconnect.models is imported.
+    '''
+
+    settings.configure(
+        # connection.queries is only filled in debug
+        DEBUG=True,
+        DATABASE_ENGINE='sqlite3',
+        DATABASE_NAME=':memory:',
+        CACHE_BACKEND='locmem:///',
+        INSTALLED_APPS=('django.contrib.auth', 'django.contrib.contenttypes', 'django.contrib.sessions', 'socialconnect', 'socialconnect.benchmarks'),
+        AUTH_PROFILE_MODULE='benchmarks.BenchmarkProfile',
+        # every call goes to the (stub) platform
+        SOCIALCONNECT_CACHE_TTL=0,
+    )
+
+    from django.core.management import call_command
+    from socialconnect import models
+    from socialconnect.proxylayer import request_proxy
+
+    models.Facebook = StubFacebook
+    models.OpenSocial = StubOpenSocial
+    request_proxy.open_signed_request = open_canned_request
+
+    call_command('syncdb', verbosity=0, interactive=False)
+
+
+def create_fixtures(accounts):
+    '''
+        Create the platforms and the local users, each one with an account on both platforms. The first user is the
+        benchmarked one. Return the Facebook and the OpenSocial platforms.
+    '''
+
+    from django.contrib.auth.models import User
+    from django.db import transaction
+    from socialconnect.benchmarks.models import BenchmarkProfile
+    from socialconnect.models import FBPlatform, OSPlatform, PlatformFBAccount, PlatformOSAccount
+
+    fb_platform = FBPlatform.objects.create(name='Facebook', api_url='http://localhost/restserver.php', login_url='http://localhost/login.php',
+        api_key='key', api_secret='secret', support_people=True)
+    os_platform = OSPlatform.objects.create(name='OpenSocial', api_url='http://localhost/social/rest', oauth_consumer_key='key', oauth_consumer_secret='secret',
+        oauth_request_token_url='http://localhost/oauth/request_token', oauth_authorization_url='http://localhost/oauth/authorize',
+        oauth_access_token_url='http://localhost/oauth/access_token', oauth_token_validity=0, oauth_signature_method='OAuthSignatureMethod_HMAC_SHA1',
+        support_people=True)
+
+    transaction.enter_transaction_management()
+    transaction.managed(True)
+    try:
+        for remote_id in xrange(1, accounts + 1):
+            profile = BenchmarkProfile.objects.create(user=User.objects.create(username='user%d' % remote_id))
+            PlatformFBAccount.objects.create(platform=fb_platform, user=profile, remote_id=str(remote_id), token='session%d' % remote_id, token_expire=0)
+            PlatformOSAccount.objects.create(platform=os_platform, user=profile, remote_id=str(remote_id), oauth_token='token%d' % remote_id,
+                oauth_token_secret='secret%d' % remote_id, oauth_token_expire=0)
+        transaction.commit()
+    finally:
+        transaction.leave_transaction_management()
+
+    return fb_platform, os_platform
+
+
+class BenchmarkRequest(object):
+    '''
+        The attributes of an http request used by the SocialContext: a fresh user and a session.
+    '''
+
+    def __init__(self, session=None):
+        from django.contrib.auth.models import User
+        self.user = User.objects.get(username='user%d' % REMOTE_ID)
+        self.session = session or {}
+
+
+def measure(function, setup=None, runs=20):
+    '''
+        Call function runs times and return its best and mean wall time in ms and its mean number of queries.
+        setup is called before each call, its time and its queries are not counted.
+    '''
+
+    from django.db import connection, reset_queries
+
+    times = []
+    queries = 0
+    for i in xrange(runs):
+        argument = setup and setup()
+        reset_queries()
+        start = time.time()
+        if setup:
+            function(argument)
+        else:
+            function()
+        times.append(time.time() - start)
+        queries += len(connection.queries)
+
+    return {'runs': runs, 'best_ms': min(times) * 1000, 'mean_ms': sum(times) / runs * 1000, 'queries': queries / float(runs)}
+
+
+def run_benchmarks(platforms, runs):
+    '''
+        Run the benchmarks on each platform and return their results keyed by name.
+    '''
+
+    from socialconnect.models import SocialContext
+
+    results = {}
+    for platform in platforms:
+        prefix = platform.__class__.__name__[:2].lower()
+        fields = platform.get_fields()
+        profile_class = platform.profile_class
+        payload = PAYLOADS['%s_friends' % prefix]
+
+        # a context validated once, as it is after the first request
+        request = BenchmarkRequest()
+        context = SocialContext.get_or_create_social_context(request, platform.id)
+        context._validate_context(request, 'benchmark', ())
+
+        def restored_request():
+            # the context is pickled in the session between two requests
+            return BenchmarkRequest({'social_context': pickle.loads(pickle.dumps(context))})
+
+        def restored_context():
+            request = restored_request()
+            return request, SocialContext.get_or_create_social_context(request, platform.id)
+
+        def parse_profiles():
+            for profile in fields.build_profiles(payload):
+                profile.givenName, profile.gender, profile.birthday
+
+        benchmarks = (
+            ('get_or_create_social_context (new)', lambda request: SocialContext.get_or_create_social_context(request, platform.id), BenchmarkRequest),
+            ('get_or_create_social_context (session)', lambda request: SocialContext.get_or_create_social_context(request, platform.id), restored_request),
+            ('_validate_context (valid com object)', lambda: context._validate_context(request, 'benchmark', ()), None),
+            ('_validate_context (session)', lambda (request, context): context._validate_context(request, 'benchmark', ()), restored_context),
+            ('_get_friends (unmatched)', lambda: context._get_friends(False), None),
+            ('_get_friends (matched)', lambda: list(context._get_friends(True)), None),
+            ('build_profiles', lambda: platform.build_profiles(fields, payload), None),
+            ('%s parsing' % profile_class.__name__, parse_profiles, None),
+        )
+        for name, function, setup in benchmarks:
+            results['%s %s' % (prefix, name)] = measure(function, setup, runs)
+
+    return results
+
+
+def git_commit():
+    '''
+        Return the commit of the working copy or None if it's not known.
+    '''
+
+    try:
+        process = subprocess.Popen(['git', 'rev-parse', 'HEAD'], cwd=os.path.dirname(os.path.abspath(__file__)), stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        commit = process.communicate()[0].strip()
+    except OSError:
+        return None
+    return process.returncode == 0 and commit or None
+
+
+def print_comparison(results, previous):
+    print '%-56s %10s %10s %7s %9s %9s' % ('benchmark', 'best ms', 'prev ms', 'ratio', 'queries', 'prev')
+    for name in sorted(results):
+        result = results[name]
+        reference = previous['results'].get(name)
+        if reference is None:
+            print '%-56s %10.3f %10s %7s %9.1f %9s' % (name, result['best_ms'], '-', '-', result['queries'], '-')
+        else:
+            ratio = reference['best_ms'] and result['best_ms'] / reference['best_ms'] or 0
+            print '%-56s %10.3f %10.3f %7.2f %9.1f %9.1f' % (name, result['best_ms'], reference['best_ms'], ratio, result['queries'], reference['queries'])
+    print 'previous commit: %s' % previous['meta'].get('commit')
+
+
+def main(argv=None):
+    parser = OptionParser(usage='python -m socialconnect.benchmarks.social_context [options]')
+    parser.add_option('--accounts', type='int', default=1000, help='number of local users with an account on each platform')
+    parser.add_option('--friends', type='int', default=500, help='number of friends of the benchmarked user')
+    parser.add_option('--runs', type='int', default=20, help='number of runs of each benchmark')
+    parser.add_option('--output', help='file where the JSON results are written')
+    parser.add_option('--compare', help='JSON results of a previous run to compare with')
+    options, args = parser.parse_args(argv)
+
+    configure()
+    build_payloads(options.accounts, options.friends)
+    platforms = create_fixtures(options.accounts)
+
+    report = {
+        'meta': {
+            'commit': git_commit(),
+            'date': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': sys.version.split()[0],
+            'accounts': options.accounts,
+            'friends': len(PAYLOADS['fb_friends_ids']),
+            'runs': options.runs,
+        },
+        'results': run_benchmarks(platforms, options.runs),
+    }
+
+    document = json.dumps(report, indent=2, sort_keys=True)
+    if options.output:
+        output = open(options.output, 'w')
+        try:
+            output.write(document)
+        finally:
+            output.close()
+
+    if options.compare:
+        previous = open(options.compare)
+        try:
+            print_comparison(report['results'], json.load(previous))
+        finally:
+            previous.close()
+    elif not options.output:
+        print document
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
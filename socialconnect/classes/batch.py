@@ -0,0 +1,171 @@
+from array import array
+from datetime import date
+
+
+# gender codes stored in the gender column
+GENDERS = ('X', 'M', 'F')
+GENDER_CODES = dict([(gender, code) for code, gender in enumerate(GENDERS)])
+
+
+def parse_column(values, parse):
+    '''
+        Return the list of the parsed values, each distinct value being parsed once. The values that are not hashable (the
+        dicts or lists of some OpenSocial fields) are parsed one at a time.
+    '''
+
+    parsed = {}
+    results = []
+    for value in values:
+        try:
+            result = parsed[value]
+        except KeyError:
+            result = parsed[value] = parse(value)
+        except TypeError:
+            result = parse(value)
+        results.append(result)
+    return results
+
+
+class ProfileBatch(object):
+    '''
+        A list of profiles stored by columns instead of one Profile object per profile, for users with large friend lists.
+
+        The batch keeps parallel columns for the id, the displayName, the profile url and the photo url, the gender as a code
+        in an array of bytes and the birthday as a date ordinal in an array of ints (0 when it's unknown). The gender and the
+        birthday are parsed once per distinct value of the batch instead of once per profile.
+
+        Iterating over the batch or indexing it returns lightweight ProfileRow objects created on demand, with the same
+        attributes as a Profile for these fields, so a batch can be used in templates in place of a list of profiles.
+
+        Params:
+            fields: the ProfileFields of the platform
+            profiles: the raw profiles from the platform
+    '''
+
+    def __init__(self, fields=None, profiles=()):
+        self.ids = []
+        self.names = []
+        self.profile_urls = []
+        self.photos = []
+        self.genders = array('b')
+        self.birthdays = array('l')
+
+        # birthdays that are not dates, for example a Facebook birthday without year, keyed by index
+        self.raw_birthdays = {}
+
+        if fields is not None:
+            self._load(fields, profiles)
+
+
+    def _load(self, fields, profiles):
+        id, name, profile_url, photo, sex, birthday = fields['id'], fields['displayName'], fields['profile_url'], fields['photo'], fields['gender'], fields['birthday']
+
+        sexes = []
+        birthdays = []
+        for profile in profiles:
+            get = profile.get
+            self.ids.append(profile[id])
+            self.names.append(profile[name])
+            self.profile_urls.append(get(profile_url))
+            self.photos.append(get(photo))
+            sexes.append(get(sex))
+            birthdays.append(get(birthday))
+
+        # parse each distinct gender and birthday once for the whole batch
+        parse_sex = fields.profile_class.parse_sex
+        self.genders = array('b', [GENDER_CODES.get(value, 0) for value in parse_column(sexes, parse_sex)])
+
+        ordinals = array('l')
+        for index, value in enumerate(parse_column(birthdays, fields.profile_class.parse_birthday)):
+            if isinstance(value, date):
+                ordinals.append(value.toordinal())
+            else:
+                ordinals.append(0)
+                if value:
+                    self.raw_birthdays[index] = value
+        self.birthdays = ordinals
+
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __iter__(self):
+        for index in xrange(len(self.ids)):
+            yield ProfileRow(self, index)
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += len(self.ids)
+        if not 0 <= index < len(self.ids):
+            raise IndexError('ProfileBatch index out of range')
+        return ProfileRow(self, index)
+
+
+    def select(self, indexes):
+        '''
+            Return a new batch with the profiles at the given indexes.
+        '''
+
+        batch = ProfileBatch()
+        for index in indexes:
+            batch.ids.append(self.ids[index])
+            batch.names.append(self.names[index])
+            batch.profile_urls.append(self.profile_urls[index])
+            batch.photos.append(self.photos[index])
+            batch.genders.append(self.genders[index])
+            batch.birthdays.append(self.birthdays[index])
+            if index in self.raw_birthdays:
+                batch.raw_birthdays[len(batch.ids) - 1] = self.raw_birthdays[index]
+        return batch
+
+
+    def exclude_ids(self, ids):
+        '''
+            Return a new batch without the profiles whose id is in ids. Ids are compared as strings.
+        '''
+
+        ids = set([unicode(id) for id in ids])
+        return self.select([index for index, id in enumerate(self.ids) if unicode(id) not in ids])
+
+
+class ProfileRow(object):
+    '''
+        A profile of a ProfileBatch. The values are read from the columns of the batch.
+    '''
+
+    __slots__ = ('batch', 'index')
+
+    def __init__(self, batch, index):
+        self.batch = batch
+        self.index = index
+
+    def _column(name):
+        return property(lambda self: getattr(self.batch, name)[self.index])
+
+    id = _column('ids')
+    displayName = _column('names')
+    profile_url = _column('profile_urls')
+    photo = _column('photos')
+
+    del _column
+
+    def _get_names(self):
+        name = self.displayName
+        if name.count(' ') != 0:
+            return name.split(' ', 1)
+        return name, ''
+
+    givenName = property(lambda self: self._get_names()[0])
+    familyName = property(lambda self: self._get_names()[1])
+    gender = property(lambda self: GENDERS[self.batch.genders[self.index]])
+
+    def _get_birthday(self):
+        ordinal = self.batch.birthdays[self.index]
+        if ordinal:
+            return date.fromordinal(ordinal)
+        return self.batch.raw_birthdays.get(self.index)
+
+    birthday = property(_get_birthday)
+
+    def __unicode__(self):
+        return self.displayName
@@ -0,0 +1,115 @@
+'''
+    Parsers for the gender and the birthday of the profiles sent by the platforms.
+
+    The patterns are compiled once, the month names are resolved with a lookup table instead of time.strptime (which
+    depends on the locale) and the parsed birthdays are memoized, friends often share the same birthday strings.
+'''
+
+import re
+from datetime import date
+
+
+# Format: male or female (Facebook)
+FB_MALE = re.compile('^male$')
+FB_FEMALE = re.compile('^female$')
+
+# Format: male or Male, female or Female (OpenSocial)
+OS_MALE = re.compile('^(?:male|Male)$')
+OS_FEMALE = re.compile('^(?:female|Female)$')
+
+# Format: January 1, 1970 (Facebook)
+FB_BIRTHDAY = re.compile('^(\w+)\s(\d{1,2}),\s(\d{4})$')
+
+# Format: 1970-01-01 (OpenSocial)
+OS_BIRTHDAY = re.compile('^(\d{4})-(\d{2})-(\d{2})')
+
+# english month names, whatever the locale of the process
+MONTHS = dict([(name, number + 1) for number, name in enumerate(('january', 'february', 'march', 'april', 'may', 'june', 'july', 'august', 'september', 'october', 'november', 'december'))])
+
+# maximum number of memoized birthdays per format
+BIRTHDAYS_CACHE_SIZE = 10000
+
+_fb_birthdays = {}
+_os_birthdays = {}
+
+
+def parse_sex(sex, reg_male, reg_female):
+    '''
+        Return 'M', 'F' or 'X' if the gender is unknown or isn't a string.
+    '''
+
+    if isinstance(sex, basestring):
+        if reg_male.match(sex):
+            return 'M'
+        elif reg_female.match(sex):
+            return 'F'
+    return 'X'
+
+
+def parse_fb_sex(sex):
+    return parse_sex(sex, FB_MALE, FB_FEMALE)
+
+
+def parse_os_sex(sex):
+    return parse_sex(sex, OS_MALE, OS_FEMALE)
+
+
+def _memoize(cache, birthday, parse):
+    '''
+        Return the parsed birthday from the cache or parse it and add it to the cache.
+        The cache is emptied when it's full.
+    '''
+
+    try:
+        return cache[birthday]
+    except KeyError:
+        value = parse(birthday)
+        if len(cache) >= BIRTHDAYS_CACHE_SIZE:
+            cache.clear()
+        cache[birthday] = value
+        return value
+    except TypeError:
+        # not hashable, it can't be a birthday string
+        return birthday
+
+
+def _parse_fb_birthday(birthday):
+    m = FB_BIRTHDAY.match(birthday)
+    if m:
+        month = MONTHS.get(m.group(1).lower())
+        if month is not None:
+            try:
+                return date(int(m.group(3)), month, int(m.group(2)))
+            except ValueError:
+                pass
+    return birthday
+
+
+def _parse_os_birthday(birthday):
+    m = OS_BIRTHDAY.match(birthday)
+    if m:
+        try:
+            return date(int(m.group(1)), int(m.group(2)), int(m.group(3)))
+        except ValueError:
+            pass
+    return birthday
+
+
+def parse_fb_birthday(birthday):
+    '''
+        Return the birthday as a Python date, or unchanged if it's not in the Facebook format.
+    '''
+
+    if birthday is None:
+        return None
+    return _memoize(_fb_birthdays, birthday, _parse_fb_birthday)
+
+
+def parse_os_birthday(birthday):
+    '''
+        Return the birthday as a Python date, or unchanged if it's not in the OpenSocial format.
+    '''
+
+    if birthday is None:
+        return None
+    return _memoize(_os_birthdays, birthday, _parse_os_birthday)
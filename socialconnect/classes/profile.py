@@ -1,6 +1,4 @@
-import re
-import time
-from datetime import date
+from parsers import parse_fb_sex, parse_fb_birthday, parse_os_sex, parse_os_birthday
 
 
 class Profile(object):
@@ -24,13 +22,17 @@ class Profile(object):
 
     '''
 
+    # slots instead of a __dict__ to keep long lists of profiles small, the names, birthday and gender are parsed
+    # on first access (see the properties below) and memoized in their slot
+    __slots__ = ('id', 'displayName', 'profile_url', 'aboutMe', 'emails', 'address', 'street_address', 'locality', 'postalCode', 'region', 'country', 'phoneNumbers', 'photo', 'work_history', 'organization',
+        '_raw_birthday', '_raw_sex', '_names', '_birthday', '_gender')
+
     def __init__(self, id, name, profile_url='', birthday='', sex='', description='', emails='', address='', picture='', work_history=''):
         self.id = id
         self.displayName = name
-        self.givenName, self.familyName = self.extract_names()
         self.profile_url = profile_url      
-        self.birthday = self.extract_birthday(birthday)
-        self.gender = self.extract_sex(sex)
+        self._raw_birthday = birthday
+        self._raw_sex = sex
         self.aboutMe = description
         self.emails = emails
         self.address = address
@@ -44,6 +46,67 @@ class Profile(object):
         self.work_history = work_history
         self.organization = None
         
+        
+    def __getstate__(self):
+        '''
+            Slots are not pickled by default, return the slots that are set.
+        '''
+        
+        return dict([(name, getattr(self, name)) for name in Profile.__slots__ if hasattr(self, name)])
+        
+    def __setstate__(self, state):
+        for name, value in state.items():
+            setattr(self, name, value)
+        
+
+    def _get_names(self):
+        try:
+            return self._names
+        except AttributeError:
+            self._names = self.extract_names()
+            return self._names
+    
+    def _get_given_name(self):
+        return self._get_names()[0]
+        
+    def _set_given_name(self, value):
+        self._names = (value, self._get_names()[1])
+        
+    def _get_family_name(self):
+        return self._get_names()[1]
+        
+    def _set_family_name(self, value):
+        self._names = (self._get_names()[0], value)
+    
+    givenName = property(_get_given_name, _set_given_name)
+    familyName = property(_get_family_name, _set_family_name)
+    
+    
+    def _get_birthday(self):
+        try:
+            return self._birthday
+        except AttributeError:
+            self._birthday = self.extract_birthday(self._raw_birthday)
+            return self._birthday
+            
+    def _set_birthday(self, value):
+        self._birthday = value
+        
+    birthday = property(_get_birthday, _set_birthday)
+    
+    
+    def _get_gender(self):
+        try:
+            return self._gender
+        except AttributeError:
+            self._gender = self.extract_sex(self._raw_sex)
+            return self._gender
+            
+    def _set_gender(self, value):
+        self._gender = value
+        
+    gender = property(_get_gender, _set_gender)
+        
 
     @staticmethod
     def get_default_fields(platform):
@@ -96,75 +159,89 @@ class Profile(object):
     #Voir pour etendre avec un objet par platforme voir __attr__ et aussi la redefinition des fcts foo_get, foo_del, foo_set (pour les platformes qui n'ont pas tous les types ou autre)
 
 
+class ProfileFields(dict):
+    '''
+        The names of the fields of a platform keyed by Profile attribute, as returned by Profile.get_default_fields.
+        
+        The extractor building the Profile constructor arguments from a raw profile is compiled once when the object is
+        created, so a list of profiles is converted in a single pass without looking up the field names for each profile.
+        
+        Params:
+            fields: a dict of field names keyed by Profile attribute
+            profile_class: FBProfile or OSProfile
+    '''
+    
+    def __init__(self, fields, profile_class):
+        dict.__init__(self, fields)
+        self.profile_class = profile_class
+        self.extract = self.compile_extractor(fields)
+        
+        
+    @staticmethod
+    def compile_extractor(fields):
+        '''
+            Return a function that takes a raw profile and returns the arguments of the Profile constructor.
+            The id and the name are mandatory, the other fields are None if they are missing.
+        '''
+        
+        id, name = fields['id'], fields['displayName']
+        optional = (fields['profile_url'], fields['birthday'], fields['gender'], fields['aboutMe'], fields['emails'], fields['address'], fields['photo'], fields['work_history'])
+        
+        def extract(profile):
+            get = profile.get
+            return (profile[id], profile[name]) + tuple([get(field) for field in optional])
+            
+        return extract
+
+
+    def build_profiles(self, profiles):
+        '''
+            Convert a list of raw profiles from the platform to a list of Profile objects.
+        '''
+        
+        profile_class, extract = self.profile_class, self.extract
+        return [profile_class(*extract(profile)) for profile in profiles]
+
+
 class FBProfile(Profile):
     
+    __slots__ = ()
+    
+    # the parsers of the platform formats, also used on whole columns by ProfileBatch
+    parse_sex = staticmethod(parse_fb_sex)
+    parse_birthday = staticmethod(parse_fb_birthday)
         
     def extract_sex(self, sex):
         '''
             This method tries to extract the gender of the user.
         '''     
-        if sex is not None:     
-            # Format: male              
-            reg_male = re.compile('^male$')
-            # Format: female            
-            reg_female = re.compile('^female$')
-            
-            if reg_male.match(sex):
-                return 'M'
-            elif reg_female.match(sex)  :
-                return 'F'          
-        return 'X'
+        return self.parse_sex(sex)
     
     
     def extract_birthday(self, birthday):
         '''
             This method tries to extract the birthday of the user to build a Python date.
         '''
-
-        if birthday is not None:
-            # Format: January 1, 1970
-            reg = re.compile('^(\w+)\s(\d{1,2}),\s(\d{4})$')
-            m = reg.match(birthday)
-            
-            if m:
-                return date(int(m.group(3)), time.strptime(m.group(1), "%B")[1], int(m.group(2)))
-
-        return birthday
+        return self.parse_birthday(birthday)
         
         
 class OSProfile(Profile):
     
+    __slots__ = ()
+    
+    # the parsers of the platform formats, also used on whole columns by ProfileBatch
+    parse_sex = staticmethod(parse_os_sex)
+    parse_birthday = staticmethod(parse_os_birthday)
 
     def extract_sex(self, sex):
         '''
             This method tries to extract the gender of the user.
         '''     
-        if sex is not None:
-            # Format: male or Male
-            reg_male = re.compile('^male|Male$')
-            # Format: female or Female
-            reg_female = re.compile('^female|Female$')
-            
-            if reg_male.match(sex):
-                return 'M'
-            elif reg_female.match(sex):
-                return 'F'          
-        return 'X'
+        return self.parse_sex(sex)
     
     
     def extract_birthday(self, birthday):
         '''
             This method tries to extract the birthday of the user to build a Python date.
         '''
-
-        if birthday is not None:
-            # Format: 1970-01-01
-            reg = re.compile('^(\d{4})-(\d{2})-(\d{2})')
-            m = reg.match(birthday)
-            
-            if m:
-                return date(int(m.group(1)), int(m.group(2)), int(m.group(3)))
-
-        return birthday
-
-
+        return self.parse_birthday(birthday)
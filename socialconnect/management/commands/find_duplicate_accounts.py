@@ -0,0 +1,71 @@
+from optparse import make_option
+
+from django.core.management.base import NoArgsCommand
+from django.db import connection
+
+from socialconnect.models import PlatformAccount
+
+
+class Command(NoArgsCommand):
+    '''
+        Report the platform accounts that break the unique_together constraints of PlatformAccount:
+        a user linked twice to the same platform or a remote account linked twice on the same platform.
+
+        syncdb does not alter existing tables so a database created before these constraints must be cleaned
+        with this report and then get the indexes printed by --sql.
+    '''
+
+    help = 'Report the platform accounts that break the (user, platform) and (platform, remote_id) constraints.'
+
+    option_list = NoArgsCommand.option_list + (
+        make_option('--sql', action='store_true', dest='sql', default=False,
+            help='Print the SQL that adds the unique indexes of PlatformAccount to an existing database.'),
+    )
+
+
+    def handle_noargs(self, **options):
+        qn = connection.ops.quote_name
+        opts = PlatformAccount._meta
+        table = opts.db_table
+        found = 0
+
+        for field_names in opts.unique_together:
+            fields = [opts.get_field(name) for name in field_names]
+            columns = ', '.join([qn(field.column) for field in fields])
+            not_null = ' AND '.join(['%s IS NOT NULL' % qn(field.column) for field in fields])
+
+            # find all the duplicated values with a single query
+            cursor = connection.cursor()
+            cursor.execute('SELECT %s FROM %s WHERE %s GROUP BY %s HAVING COUNT(*) > 1' % (columns, qn(table), not_null, columns))
+            duplicates = set([tuple(row) for row in cursor.fetchall()])
+            if not duplicates:
+                continue
+            found += len(duplicates)
+
+            # fetch the accounts involved in bulk, filtered on the duplicated values of every field of the constraint (only
+            # the few remote ids, not the whole platform), then group them by duplicated value
+            accounts = {}
+            lookup = dict([('%s__in' % field.attname, list(set([row[index] for row in duplicates]))) for index, field in enumerate(fields)])
+            for account in PlatformAccount.objects.select_related().filter(**lookup).order_by('id'):
+                key = tuple([getattr(account, field.attname) for field in fields])
+                if key in duplicates:
+                    accounts.setdefault(key, []).append(account)
+
+            print 'Accounts sharing the same (%s):' % ', '.join(field_names)
+            for key, linked_accounts in sorted(accounts.items()):
+                print '    %s:' % ', '.join([unicode(value) for value in key])
+                for account in linked_accounts:
+                    print '        account %d of %s on %s (remote id %s)' % (account.id, account.user.user.username, account.platform.name, account.remote_id)
+
+        if found:
+            print '%d duplicate(s) found.' % found
+        else:
+            print 'No duplicate found.'
+
+        if options.get('sql'):
+            if found:
+                print '-- Remove the duplicated accounts before adding the indexes.'
+            for field_names in opts.unique_together:
+                columns = [opts.get_field(name).column for name in field_names]
+                index_name = '%s_%s' % (table, '_'.join(field_names))
+                print 'CREATE UNIQUE INDEX %s ON %s (%s);' % (qn(index_name), qn(table), ', '.join([qn(column) for column in columns]))
@@ -0,0 +1,51 @@
+import time
+from optparse import make_option
+
+from django.core.management.base import NoArgsCommand
+
+from socialconnect.models import RemoteJob
+
+
+class Command(NoArgsCommand):
+    '''
+        Run the remote calls queued by the social contexts when SOCIALCONNECT_ASYNC_DISPATCH is enabled.
+
+        By default the pending jobs are run once, which suits a cron job. With --loop the command keeps polling the job table.
+        Several instances of the command can run at the same time, each job is claimed by one of them.
+    '''
+
+    help = 'Run the pending remote jobs (publish_user_action, send_notifications) of SocialConnect.'
+
+    option_list = NoArgsCommand.option_list + (
+        make_option('--loop', action='store_true', dest='loop', default=False,
+            help='Keep polling the pending jobs instead of exiting when there is none.'),
+        make_option('--interval', type='int', dest='interval', default=5,
+            help='Time in seconds between two polls with --loop.'),
+        make_option('--limit', type='int', dest='limit', default=100,
+            help='Maximum number of jobs run per poll.'),
+    )
+
+
+    def handle_noargs(self, **options):
+        verbosity = int(options.get('verbosity', 1))
+
+        while True:
+            done = failed = 0
+            for job in RemoteJob.objects.get_pending(options['limit']):
+                # another instance took the job
+                if not job.claim():
+                    continue
+                    
+                if job.run():
+                    done += 1
+                else:
+                    failed += 1
+                    if verbosity > 1:
+                        print 'job %d (%s): %s' % (job.id, job.status, (job.last_error.strip().splitlines() or [''])[-1])
+
+            if verbosity > 0 and (done or failed):
+                print '%d job(s) done, %d job(s) failed or rescheduled.' % (done, failed)
+
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,214 @@
+import logging
+import os
+import random
+import re
+import time
+import traceback
+
+import django
+from django.conf import settings
+from django.db import connection
+
+
+logger = logging.getLogger('socialconnect.queries')
+
+# number of frames kept in the sampled call sites
+STACK_DEPTH = 6
+
+# the frames of Django and of this module are not shown in the call sites
+_INTERNAL_PATHS = (os.path.dirname(django.__file__), os.path.splitext(__file__)[0])
+
+# string and number literals, then lists of parameters (the IN clauses)
+_LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+\b")
+_LISTS = re.compile(r'\((?:\s*(?:%s|\?)\s*,)+\s*(?:%s|\?)\s*\)')
+
+
+def fingerprint(sql):
+    '''
+        Return the SQL of a query without its literals and with its lists of parameters collapsed, so the queries that only
+        differ by their parameters (an N+1 loop for example) have the same fingerprint.
+    '''
+
+    return ' '.join(_LISTS.sub('(...)', _LITERALS.sub('?', sql)).split())
+
+
+def call_site(limit=STACK_DEPTH):
+    '''
+        Return the innermost frames of the current stack outside of Django and of this module, formatted by traceback.
+    '''
+
+    frames = [frame for frame in traceback.extract_stack() if not frame[0].startswith(_INTERNAL_PATHS)]
+    return traceback.format_list(frames[-limit:])
+
+
+def view_name(view_func):
+    '''
+        Return the dotted name of a view, for example yasn.views.remote_comment.
+    '''
+
+    # login_required wraps the views in an object keeping the view
+    view_func = getattr(view_func, 'view_func', view_func)
+    return '%s.%s' % (view_func.__module__, getattr(view_func, '__name__', view_func.__class__.__name__))
+
+
+
+class QueryStats(object):
+    '''
+        The executions of the queries with the same fingerprint during a request.
+    '''
+
+    def __init__(self):
+        self.count = 0
+        self.duplicates = 0
+        self.time = 0.0
+        self.stack = None
+
+
+
+class QueryRecorder(object):
+    '''
+        Count the queries of a request, with their time, and group them by fingerprint. The exact duplicates (same SQL and
+        same parameters) are counted apart.
+
+        The call sites of the repeated queries and of the queries over the budget are sampled with stack_sample_rate, a
+        single one is kept per fingerprint.
+
+        Params:
+            stack_sample_rate (optional): the probability to take the call site of a repeated query
+    '''
+
+    def __init__(self, stack_sample_rate=0.0):
+        self.stack_sample_rate = stack_sample_rate
+        self.view = None
+        self.budget = None
+        self.count = 0
+        self.time = 0.0
+        self.queries = {}
+        self._executed = set()
+
+
+    def record(self, sql, params, duration):
+        self.count += 1
+        self.time += duration
+
+        key = fingerprint(sql)
+        stats = self.queries.get(key)
+        if stats is None:
+            stats = self.queries[key] = QueryStats()
+        stats.count += 1
+        stats.time += duration
+
+        statement = (sql, repr(params))
+        if statement in self._executed:
+            stats.duplicates += 1
+        else:
+            self._executed.add(statement)
+
+        # the first query of a fingerprint is not suspicious unless the budget is already exceeded
+        if stats.stack is None and (stats.count > 1 or (self.budget is not None and self.count > self.budget)) and random.random() < self.stack_sample_rate:
+            stats.stack = call_site()
+
+
+
+class RecordingCursor(object):
+    '''
+        A database cursor that records its queries in a QueryRecorder.
+    '''
+
+    def __init__(self, cursor, recorder):
+        self.cursor = cursor
+        self.recorder = recorder
+
+
+    def execute(self, sql, params=()):
+        start = time.time()
+        try:
+            return self.cursor.execute(sql, params)
+        finally:
+            self.recorder.record(sql, params, time.time() - start)
+
+
+    def executemany(self, sql, param_list):
+        start = time.time()
+        try:
+            return self.cursor.executemany(sql, param_list)
+        finally:
+            self.recorder.record(sql, None, time.time() - start)
+
+
+    def __getattr__(self, name):
+        return getattr(self.cursor, name)
+
+
+    def __iter__(self):
+        return iter(self.cursor)
+
+
+
+class QueryBudgetMiddleware(object):
+    '''
+        Count the queries of each request and log a warning for the requests that:
+
+        * exceed the query budget of their view, SOCIALCONNECT_QUERY_BUDGETS (a dict of budgets keyed by dotted view name)
+          or SOCIALCONNECT_QUERY_BUDGET for the other views (None for no budget)
+        * repeat a query, with different parameters, at least SOCIALCONNECT_QUERY_REPEAT_THRESHOLD times
+        * execute the exact same query twice
+
+        The warning lists the offending queries by fingerprint with a sampled call site, see QueryRecorder.
+        It works without DEBUG: the cursors of the connection are wrapped during the request, in the thread of the request.
+        With DEBUG, the number of queries is also returned in the X-Query-Count header.
+
+        It should be the first middleware, to count the queries of the others.
+    '''
+
+    def __init__(self):
+        self.budgets = getattr(settings, 'SOCIALCONNECT_QUERY_BUDGETS', {})
+        self.default_budget = getattr(settings, 'SOCIALCONNECT_QUERY_BUDGET', None)
+        self.repeat_threshold = getattr(settings, 'SOCIALCONNECT_QUERY_REPEAT_THRESHOLD', 5)
+        self.stack_sample_rate = getattr(settings, 'SOCIALCONNECT_QUERY_STACK_SAMPLE_RATE', 0.1)
+
+
+    def process_request(self, request):
+        recorder = request.query_recorder = QueryRecorder(self.stack_sample_rate)
+        cursor = connection.__class__.cursor
+
+        # the connection is local to the thread, so are its attributes
+        connection.cursor = lambda: RecordingCursor(cursor(connection), recorder)
+
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        recorder = getattr(request, 'query_recorder', None)
+        if recorder is not None:
+            recorder.view = view_name(view_func)
+            recorder.budget = self.budgets.get(recorder.view, self.default_budget)
+
+
+    def process_response(self, request, response):
+        recorder = getattr(request, 'query_recorder', None)
+        if recorder is None:
+            return response
+
+        if 'cursor' in connection.__dict__:
+            del connection.cursor
+        del request.query_recorder
+
+        problems = []
+        if recorder.budget is not None and recorder.count > recorder.budget:
+            problems.append('%d queries over a budget of %d' % (recorder.count, recorder.budget))
+        repeated = [(key, stats) for key, stats in recorder.queries.items() if stats.count >= self.repeat_threshold or stats.duplicates]
+        if repeated:
+            problems.append('%d repeated queries' % len(repeated))
+
+        if problems:
+            lines = ['%s %s (%s): %s, %d queries in %.1f ms' % (request.method, request.path, recorder.view, ', '.join(problems), recorder.count, recorder.time * 1000)]
+            for key, stats in sorted(recorder.queries.items(), key=lambda item: -item[1].count):
+                if stats.count < self.repeat_threshold and not stats.duplicates and not stats.stack:
+                    continue
+                lines.append('  %dx (%d duplicates) %.1f ms: %s' % (stats.count, stats.duplicates, stats.time * 1000, key))
+                if stats.stack:
+                    lines.extend(['    ' + line.rstrip().replace('\n', '\n    ') for line in stats.stack])
+            logger.warning('\n'.join(lines))
+
+        if settings.DEBUG:
+            response['X-Query-Count'] = str(recorder.count)
+        return response
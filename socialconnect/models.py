@@ -1,31 +1,58 @@
 import copy
+import threading
 import time
+import traceback
+import uuid
+from datetime import datetime, timedelta
 
 from django.db import models
+from django.db.models.query import QuerySet
 from django.conf import settings
 from django.contrib.contenttypes.models import ContentType
 from django.core.urlresolvers import reverse
-from django.shortcuts import get_object_or_404
+from django.db.models.signals import post_save, post_delete
+from django.http import Http404
+from django.utils import simplejson
 
 from facebook import Facebook
 from facebook import FacebookError
 from opensocial import OpenSocial
 from opensocial import OpenSocialError
 
-from classes.profile import Profile, FBProfile, OSProfile
-from proxylayer.request_proxy import FBRequestProxy, OSRequestProxy
+from classes.batch import ProfileBatch
+from classes.profile import Profile, ProfileFields, FBProfile, OSProfile
+from proxylayer.async_proxy import AsyncFBRequestProxy, AsyncOSRequestProxy
+from proxylayer.breaker import CircuitBreaker
+from proxylayer.metrics import RemoteMetrics, DEFAULT_BUCKETS, load_sink
+from proxylayer.ratelimit import RateLimiter
+from proxylayer.request_proxy import FBRequestProxy, OSRequestProxy, is_session_error
 from utils.exceptions import *
+from utils.remote_cache import RemoteCache
+from utils.threads import run_concurrently, wait_all, ThreadPool
 
 
 class PlatformManager(models.Manager):
     """
-        Get the synchronized platforms of a user for a specific task.
+        A platform manager.
     """
     
     def get_task_user(self, user, task):
+        """
+            Get the synchronized platforms of a user for a specific task.
+        """
         
-        # filter the PlatformAccount to have only those with a platform that supports the task and then map the list to get a list of platforms
-        return map(lambda x: x.platform, filter(lambda x: x.platform.as_leaf_class().support_task(task), PlatformAccount.objects.filter(user=user)))
+        # map the PlatformAccounts of the user to their platforms (resolved from the registry) and keep only those that support the task
+        platforms = map(lambda x: self.get_leaf(x.platform_id), PlatformAccount.objects.filter(user=user))
+        return filter(lambda platform: platform is not None and platform.support_task(task), platforms)
+
+
+    def get_leaf(self, platform_id):
+        """
+            Get the FBPlatform or OSPlatform instance for a platform id from the platform registry.
+            Return None if there is no such platform.
+        """
+        
+        return platform_registry.get(platform_id)
         
         
 
@@ -74,12 +101,9 @@ class Platform(models.Model):
     def as_leaf_class(self):
         '''
             Get the FBPlatform or OSPlatform instance/child of the platform.
+            The instance comes from the platform registry so no query is made.
         '''
-        content_type = self.content_type
-        model = content_type.model_class()
-        if(model == Platform):
-            return self
-        return model.objects.get(id=self.id)
+        return platform_registry.get(self.id) or self
 
         
     def support_task(self, task):
@@ -110,19 +134,31 @@ class Platform(models.Model):
             This function takes the Json reponse from a platform and return a list of Profile objects 
             
             Params:
-                fields: the fields we are waiting for in the profiles (vary as the platform)
+                fields: the fields we are waiting for in the profiles (vary as the platform), as returned by get_fields()
                 profiles: the profiles retrived from the platform
 
         '''
         
-        profiles_objects = []
-        for profile in profiles:
-            if self.as_leaf_class().__class__ == FBPlatform:
-                profiles_objects.append(FBProfile(profile[fields['id']], profile[fields['displayName']], profile.get(fields['profile_url'], None), profile.get(fields['birthday'], None), profile.get(fields['gender'], None), profile.get(fields['aboutMe'], None), profile.get(fields['emails'], None), profile.get(fields['address'], None), profile.get(fields['photo'], None), profile.get(fields['work_history'], None)))
-            else:
-                profiles_objects.append(OSProfile(profile[fields['id']], profile[fields['displayName']], profile.get(fields['profile_url'], None), profile.get(fields['birthday'], None), profile.get(fields['gender'], None), profile.get(fields['aboutMe'], None), profile.get(fields['emails'], None), profile.get(fields['address'], None), profile.get(fields['photo'], None), profile.get(fields['work_history'], None)))
+        if not isinstance(fields, ProfileFields):
+            fields = ProfileFields(fields, self.as_leaf_class().profile_class)
 
-        return profiles_objects
+        return fields.build_profiles(profiles)
+        
+        
+    def build_profile_batch(self, fields, profiles):
+        ''' 
+            Like build_profiles but return a columnar ProfileBatch, which scales better for large lists of profiles.
+            
+            Params:
+                fields: the fields we are waiting for in the profiles (vary as the platform), as returned by get_fields()
+                profiles: the profiles retrived from the platform
+
+        '''
+        
+        if not isinstance(fields, ProfileFields):
+            fields = ProfileFields(fields, self.as_leaf_class().profile_class)
+            
+        return ProfileBatch(fields, profiles)
         
     def __unicode__(self):
         return self.name
@@ -145,6 +181,9 @@ class FBPlatform(Platform):
     # api version
     api_version = models.CharField(max_length=100, default='1.0')
     
+    # the Profile class of the platform
+    profile_class = FBProfile
+    
     
     #def save(self, *args, **kwargs):
     #   if FBPlatform.objects.all().count() >= 1:
@@ -154,9 +193,24 @@ class FBPlatform(Platform):
     
     def get_fields(self):
         '''
-            This method returns a copy of the standard fields list. 
+            This method returns the standard fields list with its compiled profile extractor, built once per platform instance.
         '''
-        return copy.copy(Profile.get_default_fields('FB'))
+        
+        if getattr(self, '_fields', None) is None:
+            self._fields = ProfileFields(Profile.get_default_fields('FB'), FBProfile)
+        return self._fields
+    
+    
+    def create_com_object(self, auth_token=None):
+        '''
+            Create a pyfacebook object for the platform. SOCIALCONNECT_FACEBOOK_URL replaces the url of the Facebook REST server,
+            to use the simulator of socialconnect.simulator for example.
+        '''
+        
+        url = getattr(settings, 'SOCIALCONNECT_FACEBOOK_URL', None)
+        if url:
+            return Facebook(self.api_key, self.api_secret, auth_token, facebook_url=url, facebook_secure_url=url)
+        return Facebook(self.api_key, self.api_secret, auth_token)
     
     
     def get_login_url(self):
@@ -203,6 +257,23 @@ class OSPlatform(Platform):
     os_thumbnailUrl = models.CharField(max_length=200, blank=True, null=True)
     os_organizations = models.CharField(max_length=200, blank=True, null=True)
     
+    # the special fields and the Profile attribute they replace
+    OS_FIELDS = (
+        ('os_id', 'id'),
+        ('os_displayName', 'displayName'),
+        ('os_profileUrl', 'profile_url'),
+        ('os_birthday', 'birthday'),
+        ('os_gender', 'gender'),
+        ('os_description', 'aboutMe'),
+        ('os_emails', 'emails'),
+        ('os_addresses', 'address'),
+        ('os_thumbnailUrl', 'photo'),
+        ('os_organizations', 'work_history'),
+    )
+    
+    # the Profile class of the platform
+    profile_class = OSProfile
+    
      
 
         
@@ -210,53 +281,190 @@ class OSPlatform(Platform):
         '''
             This method takes the standard fields list and check if a special name
             is given for these fields for this paltform.
+            The fields and their compiled profile extractor are kept until the special names change.
         '''
-        fields = copy.copy(Profile.get_default_fields('OS'))
-
-        if self.os_id != '':
-            fields['id'] = self.os_id
         
-        if self.os_displayName != '':
-            fields['displayName'] = self.os_displayName
-                
-        if self.os_profileUrl != '':
-            fields['profile_url'] = self.os_profileUrl
+        overrides = tuple([getattr(self, name) for name, field in self.OS_FIELDS])
+        if getattr(self, '_fields', None) is None or self._fields_overrides != overrides:
+            fields = copy.copy(Profile.get_default_fields('OS'))
+            for (name, field), value in zip(self.OS_FIELDS, overrides):
+                if value:
+                    fields[field] = value
+                    
+            self._fields = ProfileFields(fields, OSProfile)
+            self._fields_overrides = overrides
             
-        if self.os_birthday != '':
-            fields['birthday'] = self.os_birthday
+        return self._fields
+        
+        
+class PlatformRegistry(object):
+    '''
+        An in-memory registry of the FBPlatform and OSPlatform instances, keyed by platform id.
+        
+        The registry is loaded with one query per sub-model the first time a platform is requested and is
+        cleared each time a platform is saved or deleted in this process (see the signals below).
+    '''
+    
+    # the sub-models of Platform held by the registry
+    models = (FBPlatform, OSPlatform)
+    
+    def __init__(self):
+        self._platforms = None
+        self._lock = threading.Lock()
         
-        if self.os_gender != '':
-            fields['gender'] = self.os_gender
+        
+    def get(self, platform_id):
+        '''
+            Return the FBPlatform or OSPlatform instance with this id or None if there is no such platform.
+            
+            Params:
+                platform_id: the id of the platform (an int or a string from an url)
+        '''
+        
+        platforms = self._platforms
+        if platforms is None:
+            platforms = self._load()
+        
+        try:
+            return platforms.get(int(platform_id))
+        except (TypeError, ValueError):
+            return None
             
-        if self.os_description != '':
-            fields['aboutMe'] = self.os_description
+    
+    def all(self):
+        '''
+            Return all the registered platforms.
+        '''
+        
+        platforms = self._platforms
+        if platforms is None:
+            platforms = self._load()
+        return platforms.values()
             
-        if self.os_emails != '':
-            fields['emails'] = self.os_emails
             
-        if self.os_addresses != '':
-            fields['address'] = self.os_addresses
+    def invalidate(self, **kwargs):
+        '''
+            Clear the registry. It will be reloaded on the next lookup. 
+            The keyword arguments allow this method to be used as a signal receiver.
+        '''
+        
+        self._lock.acquire()
+        try:
+            self._platforms = None
+        finally:
+            self._lock.release()
+        
+        
+    def _load(self):
+        '''
+            Load all the platforms with one query per sub-model.
+        '''
+        
+        self._lock.acquire()
+        try:
+            if self._platforms is None:
+                platforms = {}
+                for model in self.models:
+                    for platform in model.objects.all():
+                        platforms[platform.id] = platform
+                self._platforms = platforms
+            return self._platforms
+        finally:
+            self._lock.release()
             
-        if self.os_thumbnailUrl != '':
-            fields['picture'] = self.os_thumbnailUrl
 
-        if self.os_organizations != '': 
-            fields['work_history'] = self.os_organizations      
+# the registry shared by the whole process
+platform_registry = PlatformRegistry()
+
+# the cache of the friends, profiles and groups retrieved from the platforms
+remote_cache = RemoteCache(getattr(settings, 'SOCIALCONNECT_CACHE_TTL', 300), getattr(settings, 'SOCIALCONNECT_CACHE_STALE_TTL', 600))
+
+# the request budgets of the platforms shared by the worker processes
+rate_limiter = RateLimiter(getattr(settings, 'SOCIALCONNECT_RATE_LIMITS', {}), getattr(settings, 'SOCIALCONNECT_RATE_LIMIT_BLOCK', True), getattr(settings, 'SOCIALCONNECT_RATE_LIMIT_MAX_WAIT', 5))
+
+# the circuit breakers of the platforms, per process
+circuit_breaker = CircuitBreaker(window=getattr(settings, 'SOCIALCONNECT_BREAKER_WINDOW', 60),
+                                 min_calls=getattr(settings, 'SOCIALCONNECT_BREAKER_MIN_CALLS', 10),
+                                 failure_rate=getattr(settings, 'SOCIALCONNECT_BREAKER_FAILURE_RATE', 0.5),
+                                 open_time=getattr(settings, 'SOCIALCONNECT_BREAKER_OPEN_TIME', 30),
+                                 min_timeout=getattr(settings, 'SOCIALCONNECT_REMOTE_MIN_TIMEOUT', 1),
+                                 max_timeout=getattr(settings, 'SOCIALCONNECT_REMOTE_TIMEOUT', 10))
+
+# the threads making the asynchronous calls of the whole process
+async_pool = ThreadPool(getattr(settings, 'SOCIALCONNECT_ASYNC_WORKERS', 20))
+
+# the latency histograms of the remote calls, per process, and their custom sinks
+remote_metrics = RemoteMetrics(getattr(settings, 'SOCIALCONNECT_METRICS_BUCKETS', DEFAULT_BUCKETS))
+for path in getattr(settings, 'SOCIALCONNECT_METRICS_SINKS', ()):
+    remote_metrics.add_sink(load_sink(path))
+
+# keep the registry consistent with the db
+for model in (Platform, ) + PlatformRegistry.models:
+    post_save.connect(platform_registry.invalidate, sender=model)
+    post_delete.connect(platform_registry.invalidate, sender=model)
             
-        return fields
+
+class PlatformAccountQuerySet(QuerySet):
+    '''
+        A queryset of platform accounts that can resolve its accounts to their sub-model.
+    '''
+    
+    def leaf(self):
+        '''
+            Return a list of the PlatformFBAccount and PlatformOSAccount instances of the queryset, in the queryset order.
+            The rows are grouped by content type and each sub-model is fetched with a single query.
+        '''
+        
+        rows = list(self.values_list('id', 'content_type'))
         
+        # group the account ids by content type
+        ids_by_content_type = {}
+        for account_id, content_type_id in rows:
+            ids_by_content_type.setdefault(content_type_id, []).append(account_id)
         
+        # fetch the accounts of each sub-model
+        models_by_content_type = dict([(ContentType.objects.get_for_model(model).id, model) for model in (PlatformFBAccount, PlatformOSAccount)])
+        accounts = {}
+        for content_type_id, ids in ids_by_content_type.items():
+            model = models_by_content_type.get(content_type_id, PlatformAccount)
+            for account in model.objects.filter(id__in=ids):
+                accounts[account.id] = account
+            
+        return [accounts[account_id] for account_id, content_type_id in rows if account_id in accounts]
+    
+
 class PlatformAccountManager(models.Manager):
     '''
         A platform account manager.
     '''
     
+    def get_query_set(self):
+        return PlatformAccountQuerySet(self.model)
+    
     def get_user_accounts(self, user):
         '''
             Retrieve all remote accounts of a user.
         '''
         return self.filter(user=user)
         
+    def leaf(self):
+        '''
+            Retrieve all the accounts as PlatformFBAccount or PlatformOSAccount instances.
+        '''
+        return self.get_query_set().leaf()
+        
+    def get_leaf(self, **kwargs):
+        '''
+            Like get() but return the PlatformFBAccount or PlatformOSAccount instance of the account.
+        '''
+        
+        accounts = self.filter(**kwargs).leaf()
+        if not accounts:
+            raise self.model.DoesNotExist("PlatformAccount matching query does not exist.")
+        elif len(accounts) > 1:
+            raise self.model.MultipleObjectsReturned("get_leaf() returned more than one PlatformAccount.")
+        return accounts[0]
+        
 
 class PlatformAccount(models.Model):
     ''' 
@@ -283,6 +491,12 @@ class PlatformAccount(models.Model):
     # custom manager
     objects = PlatformAccountManager()
 
+    class Meta:
+        # a user has one account per platform and a remote account can only be linked once on a platform.
+        # These constraints are also the composite indexes used by the (user, platform) lookups of the
+        # SocialContext and by the remote_id lookups of the matched friends.
+        unique_together = (('user', 'platform'), ('platform', 'remote_id'))
+
 
     def save(self, user=None, *args, **kwargs):
         '''
@@ -294,14 +508,9 @@ class PlatformAccount(models.Model):
         if not self.content_type:
             self.content_type = ContentType.objects.get_for_model(self.__class__)
         
-        # check that the account is not already used by another user 
+        # check that the account is not already used by another user: a single lookup on the (platform, remote_id) index
         if user:
-            # the accounts with the same remote_id
-            accounts = PlatformAccount.objects.select_related().filter(remote_id=self.remote_id).exclude(user=user)
-            # the accounts with the same remote_id and from the same platform
-            accounts = filter(lambda platform_account: platform_account.as_leaf_class() == self.platform_account, accounts)
-            # if there are any of those accounts raise an UsedAccountException
-            if len(accounts) != 0:
+            if PlatformAccount.objects.filter(platform=self.platform_id, remote_id=self.remote_id).exclude(user=user).count() != 0:
                 raise UsedAccountException                      
             
         super(PlatformAccount, self).save(*args, **kwargs)
@@ -326,6 +535,13 @@ class PlatformAccount(models.Model):
         
         raise NotImplementedError
     
+    def get_token(self):
+        '''
+            Return the token as a (remote_id, key, secret, expire) tuple
+        '''
+        
+        raise NotImplementedError
+    
     def update_token(self, obj):
         '''
             Update the token parameters from a com_object
@@ -365,6 +581,13 @@ class PlatformFBAccount(PlatformAccount):
         else:
             return False
             
+    def get_token(self):
+        '''
+            Return the token as a (remote_id, key, secret, expire) tuple. A Facebook session has no secret.
+        '''
+        
+        return (self.remote_id, self.token, None, self.token_expire)
+            
     def update_token(self, obj):
         '''
             Update the token parameters from a com_object.
@@ -379,6 +602,7 @@ class PlatformFBAccount(PlatformAccount):
             Reset the current token.
         '''
 
+        remote_cache.invalidate(self.platform_id, self.remote_id)
         self.token = None
         self.token_expire = None
         self.save()
@@ -404,6 +628,13 @@ class PlatformOSAccount(PlatformAccount):
         else:
             return False
 
+    def get_token(self):
+        '''
+            Return the token as a (remote_id, key, secret, expire) tuple.
+        '''
+        
+        return (self.remote_id, self.oauth_token, self.oauth_token_secret, self.oauth_token_expire)
+
     def update_token(self, obj):
         '''
             Update the token parameters from a com_object.
@@ -419,13 +650,219 @@ class PlatformOSAccount(PlatformAccount):
             Reset the current token.
         '''
 
+        remote_cache.invalidate(self.platform_id, self.remote_id)
         self.oauth_token = None
         self.oauth_token_secret = None
         self.oauth_token_expire = None
         self.save()
         
         
+
+class RemoteJobManager(models.Manager):
+    '''
+        A manager for the remote jobs.
+    '''
+    
+    def queue(self, social_context, method, **arguments):
+        '''
+            Store a remote call to be made by the process_remote_jobs command. Only a row is inserted, nothing is sent to the platform.
+            
+            Params:
+                social_context: the social context of the user
+                method: the name of the private method of SocialContext that makes the call, for example _publish_user_action
+                arguments: the keyword arguments of the method, they must be JSON serializable
+        '''
+        
+        job = self.model(platform_id=social_context.current_platform.id, user_id=social_context.user_id, method=method, arguments=simplejson.dumps(arguments))
+        job.save()
+        return job
+        
+        
+    def get_pending(self, limit=None):
+        '''
+            Return the pending jobs that are due and the running jobs whose lease expired (their worker died), oldest first.
+            A job must be claimed with RemoteJob.claim() before it's run.
+        '''
+        
+        now = datetime.now()
+        due = models.Q(status=RemoteJob.PENDING, next_attempt__lte=now) | models.Q(status=RemoteJob.RUNNING, locked_until__lt=now)
+        jobs = self.filter(due).order_by('next_attempt', 'id')
+        if limit:
+            jobs = jobs[:limit]
+        return jobs
+        
+
+class RemoteJob(models.Model):
+    '''
+        A call to a remote platform made outside of the http request, for the calls whose result is not needed to render the response
+        (publish_user_action, send_notifications). The jobs are run by the process_remote_jobs management command and a failed
+        job is retried with an exponential backoff: SOCIALCONNECT_JOB_RETRY_DELAY seconds, then twice as long, etc. until
+        SOCIALCONNECT_JOB_MAX_ATTEMPTS attempts.
+        
+        A job is claimed by a worker for SOCIALCONNECT_JOB_LEASE seconds, several workers can run at the same time. The job of
+        a worker that died while running it is claimed again once the lease is expired.
+    '''
+    
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = ((PENDING, 'Pending'), (RUNNING, 'Running'), (DONE, 'Done'), (FAILED, 'Failed'))
+    
+    # the private methods of SocialContext that can be queued
+    METHODS = ('_publish_user_action', '_send_notifications')
+    
+    # the target platform
+    platform = models.ForeignKey(Platform)
+    
+    # the user on the local platform, his platform account gives the token
+    user = models.ForeignKey(settings.AUTH_PROFILE_MODULE)
+    
+    # the call: name of the method and its keyword arguments as JSON
+    method = models.CharField(max_length=100)
+    arguments = models.TextField()
+    
+    # state of the job
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=PENDING, db_index=True)
+    attempts = models.IntegerField(default=0)
+    next_attempt = models.DateTimeField(default=datetime.now, db_index=True)
+    last_error = models.TextField(blank=True)
+    created = models.DateTimeField(auto_now_add=True)
+    
+    # end of the lease of the worker running the job and the token of its claim
+    locked_until = models.DateTimeField(null=True, blank=True, db_index=True)
+    claimed_by = models.CharField(max_length=32, blank=True)
+    
+    # custom manager
+    objects = RemoteJobManager()
+    
+    
+    def claim(self):
+        '''
+            Take the job for a run. The row is updated with a new claim token only if nobody changed it since it was read, so
+            a single update can match, then the row is read again to check that the token is ours: the claim doesn't rely on
+            the number of rows returned by update(), which some versions of Django don't give.
+            Return False if another worker claimed the job first.
+        '''
+        
+        claimed_by = uuid.uuid4().hex
+        locked_until = datetime.now() + timedelta(seconds=getattr(settings, 'SOCIALCONNECT_JOB_LEASE', 300))
+        RemoteJob.objects.filter(id=self.id, status=self.status, attempts=self.attempts).update(
+            status=RemoteJob.RUNNING, attempts=self.attempts + 1, locked_until=locked_until, claimed_by=claimed_by)
+        if not RemoteJob.objects.filter(id=self.id, claimed_by=claimed_by).count():
+            return False
+        
+        self.status = RemoteJob.RUNNING
+        self.attempts += 1
+        self.locked_until = locked_until
+        self.claimed_by = claimed_by
+        return True
+        
+        
+    def run(self):
+        '''
+            Make the remote call with the token of the user's platform account and update the state of the job, which must
+            have been claimed.
+            A feed limit error or any other error reschedules the job, a missing, expired or refused token fails it since only
+            the user can get a new one.
+            Return True if the call succeeded.
+        '''
+        
+        try:
+            if self.method not in RemoteJob.METHODS:
+                raise SocialConnectException('Unknown remote job method: %s' % self.method)
+            
+            platform_account = PlatformAccount.objects.get_leaf(platform=self.platform_id, user=self.user_id)
+            if not platform_account.is_token_valid():
+                self._fail('The token of the platform account is not valid.')
+                return False
+                
+            # a context without session, built from the token of the account
+            social_context = SocialContext(None, self.platform_id)
+            social_context.user_id = self.user_id
+            social_context.remote_id = platform_account.remote_id
+            social_context.com_object = social_context.create_com_object(*platform_account.get_token())
+            
+            arguments = dict([(str(name), value) for name, value in simplejson.loads(self.arguments).items()])
+            result = getattr(social_context, self.method)(**arguments)
+            
+            # only the recipients that were not notified are retried
+            if self.method == '_send_notifications' and result[1]:
+                arguments['user_ids'] = [uid for uid in arguments['user_ids'] if uid in result[1]]
+                self.arguments = simplejson.dumps(arguments)
+                self._retry('%d recipient(s) not notified: %s' % (len(result[1]), result[1].values()[0]))
+                return False
+            
+        except PlatformAccount.DoesNotExist:
+            self._fail('The user is not synchronized with the platform.')
+            return False
+            
+        except FeedLimitException:
+            self._retry('Feed limit reached.')
+            return False
+            
+        except RateLimitException, ex:
+            self._retry('Rate limited, retry in %s seconds.' % ex.parameter)
+            return False
+            
+        except CircuitOpenException:
+            self._retry('The platform is unavailable.')
+            return False
+            
+        except Exception, ex:
+            if is_session_error(ex):
+                self._fail('The token was refused by the platform: %s' % traceback.format_exc())
+            else:
+                self._retry(traceback.format_exc())
+            return False
+        
+        self.status = RemoteJob.DONE
+        self.last_error = ''
+        self._save_state()
+        return True
+        
+        
+    def _retry(self, error):
+        '''
+            Reschedule the job with an exponential backoff, or fail it after the maximum number of attempts.
+        '''
+        
+        if self.attempts >= getattr(settings, 'SOCIALCONNECT_JOB_MAX_ATTEMPTS', 5):
+            self._fail(error)
+            return
+            
+        delay = getattr(settings, 'SOCIALCONNECT_JOB_RETRY_DELAY', 60) * 2 ** (self.attempts - 1)
+        self.status = RemoteJob.PENDING
+        self.next_attempt = datetime.now() + timedelta(seconds=delay)
+        self.last_error = error
+        self._save_state()
+        
+        
+    def _fail(self, error):
+        self.status = RemoteJob.FAILED
+        self.last_error = error
+        self._save_state()
+        
+        
+    def _save_state(self):
+        '''
+            Save the outcome of the run, unless the lease expired and the job was claimed again by another worker.
+        '''
+        
+        self.locked_until = None
+        RemoteJob.objects.filter(id=self.id, status=RemoteJob.RUNNING, claimed_by=self.claimed_by).update(status=self.status,
+            next_attempt=self.next_attempt, last_error=self.last_error, arguments=self.arguments, locked_until=None)
+        
+        
+    def __unicode__(self):
+        return u'%s on %s (%s)' % (self.method, self.platform_id, self.status)
+        
+        
     
+# number of remote ids per query when matching friends with platform accounts, below the 999 parameters of SQLite
+MATCH_CHUNK_SIZE = 500
+
+
 class SocialContext(object):
     '''
         Context for a connection with a remote platform
@@ -440,22 +877,142 @@ class SocialContext(object):
         This context is designed to be used either with a FB platform or either with an OS platform. 
     '''
 
-    # concerned user
-    user = None
-
-    # pyfacebook or opensocial-rest-client object to communicate with the platform
-    com_object = None
-
-    # the remote platform
-    current_platform = None
+    # id of the concerned user
+    user_id = None
 
     # id of the platform
     platform_id = -1
 
+    # the calls that can be made by gather() and the task the platform must support for each one
+    ASYNC_CALLS = {
+        'get_profile': 'people',
+        'get_friends': 'people',
+        'get_friends_batch': 'people',
+        'get_groups': 'groups',
+        'publish_user_action': 'activities_push',
+        'send_notifications': 'notifications',
+    }
+
     def __init__(self, user, platform_id):
-        self.user = user        
         self.platform_id = platform_id
-        self.reload_platform()
+        self.user = user
+        self.com_object = None
+        self.remote_id = None
+        self._current_platform = None
+
+
+    def __getstate__(self):
+        '''
+            Only a tuple of primitives is pickled in the session: the platform id, the user id and the token of the com object.
+        '''
+        
+        return (self.platform_id, self.user_id, self.get_token())
+        
+        
+    def __setstate__(self, state):
+        '''
+            Restore a context from the session. The user, the platform and the com object are rebuilt on first access.
+        '''
+        
+        self.platform_id, self.user_id, self._token = state
+        self.remote_id = self._token and self._token[0] or None
+        self._user = None
+        self._com_object = None
+        self._current_platform = None
+
+
+    def _get_user(self):
+        if self._user is None and self.user_id is not None:
+            self._user = models.get_model(*settings.AUTH_PROFILE_MODULE.split('.')).objects.get(id=self.user_id)
+        return self._user
+
+    def _set_user(self, user):
+        self._user = user
+        self.user_id = user is not None and user.id or None
+
+    # concerned user
+    user = property(_get_user, _set_user)
+
+
+    def _get_current_platform(self):
+        if self._current_platform is None and self.platform_id is not None:
+            self._current_platform = Platform.objects.get_leaf(self.platform_id)
+            if self._current_platform is None:
+                raise Http404('No Platform matches the given query.')
+        return self._current_platform
+
+    # the remote platform, from the platform registry
+    current_platform = property(_get_current_platform)
+
+
+    def _get_com_object(self):
+        if self._com_object is None and self._token is not None:
+            self._com_object = self.create_com_object(*self._token)
+        return self._com_object
+
+    def _set_com_object(self, com_object):
+        self._com_object = com_object
+        self._token = None
+
+    # pyfacebook or opensocial-rest-client object to communicate with the platform
+    com_object = property(_get_com_object, _set_com_object)
+
+
+    def get_token(self):
+        '''
+            Return the token of the com object as a (remote_id, key, secret, expire) tuple or None if there is no com object.
+        '''
+        
+        if self._com_object is None:
+            return self._token
+        
+        if self.current_platform.__class__ == FBPlatform:
+            return (self._com_object.uid, self._com_object.session_key, None, self._com_object.session_key_expires)
+        else:
+            return (self.remote_id, self._com_object.token.key, self._com_object.token.secret, self._com_object.token_expire)
+
+    
+    def create_com_object(self, remote_id, key, secret, expire):
+        '''
+            Create a com object for the current platform from a token.
+            
+            Params:
+                remote_id: the id of the user on the platform
+                key, secret, expire: the token (Facebook session key or OAuth access token), its secret and its expiration
+        '''
+        
+        platform = self.current_platform
+        if platform.__class__ == FBPlatform:
+            com_object = platform.create_com_object()
+            com_object.session_key = key
+            com_object.session_key_expires = expire
+            com_object.uid = remote_id
+        else:
+            com_object = OpenSocial(platform.oauth_consumer_key, platform.oauth_consumer_secret, platform.oauth_signature_method, platform.api_url, key, secret, expire)
+        return com_object
+
+
+    def _create_proxy(self, com_object, remote_id=None):
+        '''
+            Instanciate the correct Proxy for a com object.
+        '''
+        
+        if self.current_platform.__class__ == FBPlatform: 
+            proxy = FBRequestProxy(com_object, self.current_platform.id, remote_id)
+        else:   
+            proxy = OSRequestProxy(com_object, self.current_platform.id, remote_id, self.current_platform)
+        proxy.rate_limiter = rate_limiter
+        proxy.circuit_breaker = circuit_breaker
+        proxy.metrics = remote_metrics
+        return proxy
+
+
+    def _get_proxy(self):
+        '''
+            Return the Proxy of the com object of the context.
+        '''
+        
+        return self._create_proxy(self.com_object, self.remote_id)
 
 
     @staticmethod
@@ -489,9 +1046,6 @@ class SocialContext(object):
             # get the context from the session
             else:
                 social_context = request.session['social_context']
-
-            # reload the platform information from the db to avoid inconsistency in a object from the session
-            social_context.reload_platform()
                 
         except KeyError:                                
             # there is no context in the session so create one
@@ -502,8 +1056,11 @@ class SocialContext(object):
             social_context = create_social_context()
 
         # if platform_id is not the same as in the session, we have change the platform context so we need a new one
-        if (platform_id != None and str(request.session['social_context'].current_platform.pk) != platform_id) or (social_context.user != request.user.get_profile()):
-            social_context = create_social_context()            
+        if (platform_id != None and str(social_context.platform_id) != str(platform_id)) or (social_context.user_id != request.user.get_profile().id):
+            social_context = create_social_context()
+        else:
+            # use the profile of the request instead of loading it again
+            social_context.user = request.user.get_profile()
 
         return social_context
 
@@ -516,27 +1073,14 @@ class SocialContext(object):
                 task: the task (people | groups | activities_push | activities_pull | notifications)
         '''
 
-        platforms = []
-        # add the platforms that support the task
-        if task == 'people':
-            platforms = Platform.objects.filter(support_people=True, is_active=True)
-
-        elif task == 'groups':              
-            platforms = Platform.objects.filter(support_groups=True, is_active=True)
-
-        elif task == 'activities_push':
-            platforms = Platform.objects.filter(support_activities_push=True, is_active=True)
-
-        elif task == 'activities_pull':
-            platforms = Platform.objects.filter(support_activities_pull=True, is_active=True)
-
-        elif task == 'notifications':
-            platforms = Platform.objects.filter(support_notifications=True, is_active=True)
-
-        else:
+        if task not in ('people', 'groups', 'activities_push', 'activities_pull', 'notifications'):
             raise Exception('get_synch_platforms: unknown task')
 
-        return map(lambda platform: platform.as_leaf_class(), platforms)
+        # keep the active platforms of the registry that support the task
+        platforms = filter(lambda platform: platform.is_active and platform.support_task(task), platform_registry.all())
+        platforms.sort(key=lambda platform: platform.id)
+        
+        return platforms
 
     @staticmethod
     def remove_subscription(request, platform_id):
@@ -548,7 +1092,9 @@ class SocialContext(object):
                 platform_id: id of the remote platform
         '''
         
-        PlatformAccount.objects.get(platform__id=platform_id, user=request.user.get_profile()).delete()
+        platform_account = PlatformAccount.objects.get(platform__id=platform_id, user=request.user.get_profile())
+        remote_cache.invalidate(platform_account.platform_id, platform_account.remote_id)
+        platform_account.delete()
 
         # if the user has a social context with this platform we need to delete it too
         try:
@@ -560,12 +1106,11 @@ class SocialContext(object):
 
     def reload_platform(self):
         '''
-            This method retrieves the platform from the database to ensure that the platform has the last attribute values.
-            The platform cannot be reloaded if the platform_id is None.
+            This method drops the platform of the context so that it is taken again from the platform registry on next access.
+            The registry is cleared each time a platform is saved so the platform has the last attribute values.
         '''
         
-        if self.platform_id is not None:
-            self.current_platform = get_object_or_404(Platform, pk=self.platform_id).as_leaf_class()
+        self._current_platform = None
 
     def if_fb_com_object_valid(self):
         '''
@@ -589,7 +1134,7 @@ class SocialContext(object):
         '''
 
         try:
-            return PlatformAccount.objects.get(platform=self.current_platform, user=self.user).as_leaf_class()
+            return PlatformAccount.objects.get_leaf(platform=self.current_platform, user=self.user)
 
         except PlatformAccount.DoesNotExist:
             return None
@@ -633,14 +1178,10 @@ class SocialContext(object):
         '''
 
         fields = self.current_platform.get_fields()
-        
-        if self.current_platform.__class__ == FBPlatform: 
-            proxy = FBRequestProxy(self.com_object)
-        else:   
-            proxy = OSRequestProxy(self.com_object) 
-
+        proxy = self._get_proxy()
+        profile = self._cached('get_profile', fields.values(), lambda: proxy.get_profile(fields.values()))
 
-        return self.current_platform.build_profiles(fields, proxy.get_profile(fields.values()))[0]
+        return self.current_platform.build_profiles(fields, profile)[0]
 
 
     def get_friends(self, request, callback, matched, *args):
@@ -671,38 +1212,192 @@ class SocialContext(object):
         
         '''   
         
-        # Those are the matching function for friends. By default they only check the remote_id but they
-        # can be improved to enable more specific matching. The only restriction is that they have to
-        # return PlatformAccounts querysets.        
-        def _get_matched_fb():
-            return PlatformFBAccount.objects.filter(remote_id__in=proxy.get_friends(fields.values(), get_profiles=False), platform=self.current_platform)
+        fields = self.current_platform.get_fields()
+        proxy = self._get_proxy()
+
+        if not matched:         
+            # return a list of Profiles
+            friends = self._cached('get_friends', fields.values(), lambda: proxy.get_friends(fields.values(), get_profiles=True))
+            return self.current_platform.build_profiles(fields, friends)
+        else:                     
+            # return the platformaccounts of the friends, matched as their ids are read from the platform
+            return self.match_accounts(self._cached_iter('get_friends_ids', [], lambda: proxy.iter_friends_stream(['id'], ids_only=True)))
+
+
+    def get_friends_batch(self, request, callback, *args):
+        '''
+            Entry point for the friends getter that returns the friends as a ProfileBatch instead of a list of Profile objects.
             
-        def _get_matched_os():
-            return PlatformOSAccount.objects.filter(remote_id__in=proxy.get_friends(fields.values(), get_profiles=False), platform=self.current_platform)
+            Params:
+                request: the django http request
+                callback: the view to callback if an RedirectException occurs
+                args: any args for the callback view
+        '''
+        
+        # check if the platform supports the call
+        if not self.current_platform.support_people:
+            raise NotSupportedException()
+        
+        # validate of the context, then call
+        if self._validate_context(request, callback, args):
+            return self._get_friends_batch()
+            
+            
+    def _get_friends_batch(self):
+        '''
+            Private method that call the api and build a ProfileBatch of the friends.
+        '''
         
         fields = self.current_platform.get_fields()
+        proxy = self._get_proxy()
         
-        if self.current_platform.__class__ == FBPlatform:                                                                          
-            proxy = FBRequestProxy(self.com_object)                                                                                
+        friends = self._cached('get_friends', fields.values(), lambda: proxy.get_friends(fields.values(), get_profiles=True))
+        return self.current_platform.build_profile_batch(fields, friends)
 
-            if not matched:         
-                # return a list of Profiles
-                return self.current_platform.build_profiles(fields, proxy.get_friends(fields.values(), get_profiles=True))                                                                                                          
-            else:                     
-                # return the platformaccounts of the friends
-                return _get_matched_fb()
 
-        else:                                                                                                                      
-            proxy = OSRequestProxy(self.com_object)                                                                                
+    def get_friends_page(self, request, callback, page, page_size, *args):
+        '''
+            Entry point for the paginated friends getter. Only the requested page of friends is retrieved from the platform,
+            so the first page of a large friend list can be rendered without waiting for the whole list.
+            This method returns a ProfileBatch of the friends of the page, empty after the last page.
+            
+            Params:
+                request: the django http request
+                callback: the view to callback if an RedirectException occurs
+                page: the index of the page, starting at 0
+                page_size: the number of friends per page
+                args: any args for the callback view
+        '''
+        
+        # check if the platform supports the call
+        if not self.current_platform.support_people:
+            raise NotSupportedException()
+        
+        # validate of the context, then call
+        if self._validate_context(request, callback, args):
+            return self._get_friends_page(page, page_size)
+            
+            
+    def _get_friends_page(self, page, page_size):
+        '''
+            Private method that call the api for a single page of friends and build a ProfileBatch of the page.
+        '''
+        
+        fields = self.current_platform.get_fields()
+        proxy = self._get_proxy()
+        
+        def fetch():
+            for friends in proxy.iter_friends(fields.values(), page_size, page * page_size):
+                return friends
+            return []
+        
+        friends = self._cached('get_friends_page:%d:%d' % (page, page_size), fields.values(), fetch)
+        return self.current_platform.build_profile_batch(fields, friends)
 
-            if not matched:                    
-                # return a list of Profiles                                                                                                    
-                return self.current_platform.build_profiles(fields, proxy.get_friends(fields.values(), get_profiles=True)) 
-            else:                                   
-                # return the platformaccounts of the friends
-                return _get_matched_os()                            
 
+    def iter_friends(self, request, callback, page_size, *args):
+        '''
+            Entry point for the incremental friends getter. It returns an iterator over the pages of friends as ProfileBatch
+            objects, each page is requested from the platform when the iterator reaches it. The pages are not cached.
+            
+            Params:
+                request: the django http request
+                callback: the view to callback if an RedirectException occurs
+                page_size: the number of friends per page
+                args: any args for the callback view
+        '''
+        
+        # check if the platform supports the call
+        if not self.current_platform.support_people:
+            raise NotSupportedException()
+        
+        # validate of the context, then call
+        if self._validate_context(request, callback, args):
+            return self._iter_friends(page_size)
+            
+            
+    def _iter_friends(self, page_size):
+        '''
+            Private generator over the pages of friends.
+        '''
+        
+        fields = self.current_platform.get_fields()
+        proxy = self._get_proxy()
+        
+        for friends in proxy.iter_friends(fields.values(), page_size):
+            yield self.current_platform.build_profile_batch(fields, friends)
+
+
+    def match_accounts(self, remote_ids):
+        '''
+            Return an iterator over the platform accounts of the current platform that match a list of remote ids, for example
+            the ids of the user's friends or of Profile objects already retrieved from the platform.
+            
+            The ids are looked up lazily by chunks of MATCH_CHUNK_SIZE on the (platform, remote_id) index, so long lists don't
+            exceed the number of query parameters of the database. By default the matching only checks the remote_id but it 
+            can be improved to enable more specific matching. The only restriction is that it has to return PlatformAccounts.
+            
+            Params:
+                remote_ids: an iterable of remote ids
+        '''
+        
+        if self.current_platform.__class__ == FBPlatform:
+            model = PlatformFBAccount
+        else:
+            model = PlatformOSAccount
+        
+        def lookup(chunk):
+            return model.objects.select_related('user__user').filter(platform=self.current_platform, remote_id__in=chunk)
+        
+        def matched_accounts():
+            chunk = []
+            for remote_id in remote_ids:
+                chunk.append(unicode(remote_id))
+                if len(chunk) == MATCH_CHUNK_SIZE:
+                    for account in lookup(chunk):
+                        yield account
+                    chunk = []
+            if chunk:
+                for account in lookup(chunk):
+                    yield account
+        
+        return matched_accounts()
+        
 
+    @staticmethod
+    def get_friends_all(request, timeout=None):
+        '''
+            Static method that gets the friends of the user from all his linked platforms at the same time.
+            The calls are made on separate threads with their own social contexts, so the context of the session is left untouched.
+            
+            This method returns a dict of lists of Profile objects keyed by platform. The platforms that don't support the call,
+            that need a new token, that failed or that didn't answer within the timeout are not in the dict.
+            
+            Params:
+                request: the django http request
+                timeout (optional): the time in seconds given to each platform, SOCIALCONNECT_REMOTE_TIMEOUT by default
+        '''
+        
+        if timeout is None:
+            timeout = getattr(settings, 'SOCIALCONNECT_REMOTE_TIMEOUT', 10)
+        
+        user = request.user.get_profile()
+        
+        # prepare a call for each linked platform with a valid token, the threads must not query the db
+        calls = {}
+        for platform_account in PlatformAccount.objects.filter(user=user, is_active=True).leaf():
+            platform = Platform.objects.get_leaf(platform_account.platform_id)
+            if platform is None or not platform.is_active or not platform.support_people or not platform_account.is_token_valid():
+                continue
+                
+            social_context = SocialContext(user, platform.id)
+            social_context.remote_id = platform_account.remote_id
+            social_context.com_object = social_context.create_com_object(*platform_account.get_token())
+            calls[platform] = lambda social_context=social_context: social_context._get_friends(False)
+            
+        results, errors = run_concurrently(calls, timeout)
+        return results
+        
 
     def get_groups(self, request, callback, *args):
         '''
@@ -729,11 +1424,76 @@ class SocialContext(object):
             Private method that instanciate the correct Proxy and call the api. 
         '''     
 
-        if self.current_platform.__class__ == FBPlatform:
-            proxy = FBRequestProxy(self.com_object) 
-        else:
-            proxy = OSRequestProxy(self.com_object) 
-        return proxy.get_groups()
+        proxy = self._get_proxy()
+        return self._cached('get_groups', [], proxy.get_groups)
+
+
+    def get_async_proxy(self, request, callback, *args):
+        '''
+            Entry point for the asynchronous calls. It validate the social context (synchronization, com_object, token) and
+            returns an AsyncFBRequestProxy or an AsyncOSRequestProxy: its methods return a Future at once instead of blocking.
+            
+            Params:
+                request: the django http request
+                callback: the view to callback if an RedirectException occurs
+                args: any args for the callback view
+        '''
+        
+        if self._validate_context(request, callback, args):
+            if self.current_platform.__class__ == FBPlatform:
+                return AsyncFBRequestProxy(proxy=self._get_proxy(), pool=async_pool)
+            else:
+                return AsyncOSRequestProxy(proxy=self._get_proxy(), pool=async_pool)
+
+
+    def gather(self, request, callback, calls, timeout=None, *args):
+        '''
+            Entry point that makes several calls to the platform at the same time and waits for all of them. The context is
+            validated once, then the calls run on the threads of the async pool with the remote cache, like the other entry points.
+            
+            This method returns a (results, errors) tuple of dicts with the keys of calls. errors contains the exc_info of the
+            calls that failed, the calls that didn't answer within the timeout are in neither dict.
+            
+            Params:
+                request: the django http request
+                callback: the view to callback if an RedirectException occurs
+                calls: a dict of (method, args) tuples, method is one of ASYNC_CALLS and args are its arguments after
+                       request and callback, for example {'friends': ('get_friends', (False,)), 'groups': ('get_groups', ())}
+                timeout (optional): the time in seconds given to the calls, SOCIALCONNECT_REMOTE_TIMEOUT by default
+                args: any args for the callback view
+        '''
+        
+        # check if the platform supports the calls
+        for method, call_args in calls.values():
+            if method not in SocialContext.ASYNC_CALLS:
+                raise SocialConnectException('gather: unknown call %s' % method)
+            if not self.current_platform.support_task(SocialContext.ASYNC_CALLS[method]):
+                raise NotSupportedException()
+        
+        if timeout is None:
+            timeout = getattr(settings, 'SOCIALCONNECT_REMOTE_TIMEOUT', 10)
+        
+        # validate of the context, then start all the calls before waiting for them
+        if self._validate_context(request, callback, args):
+            futures = dict([(key, async_pool.submit(getattr(self, '_' + method), *call_args)) for key, (method, call_args) in calls.items()])
+            return wait_all(futures, timeout)
+
+
+    def _cached(self, method, fields, fetch):
+        '''
+            Private method that returns the result of a remote call from the remote cache. 
+            On a cache miss, fetch is called and its result is cached for SOCIALCONNECT_CACHE_TTL seconds.
+        '''
+        
+        return remote_cache.get(self.current_platform.id, self.remote_id, method, fields, fetch)
+
+
+    def _cached_iter(self, method, fields, fetch):
+        '''
+            Private method like _cached for a remote call returning an iterator, the items are passed through on a cache miss.
+        '''
+        
+        return remote_cache.iterate(self.current_platform.id, self.remote_id, method, fields, fetch)
 
 
     def publish_user_action(self, request, callback, template_id, template_data, target_ids=None, *args):
@@ -752,9 +1512,19 @@ class SocialContext(object):
         if not self.current_platform.support_activities_push:
             raise NotSupportedException()
 
+        # queue the call if the user has a valid token
+        if self._can_queue():
+            return RemoteJob.objects.queue(self, '_publish_user_action', template_id=template_id, template_data=template_data, target_ids=target_ids)
+
         # validation of the context
         if self._validate_context(request, callback, args):
-            return self._publish_user_action(template_id, template_data, target_ids)
+            try:
+                return self._publish_user_action(template_id, template_data, target_ids)
+            except FeedLimitException:
+                # retry later if the jobs are processed, otherwise it's a failure
+                if getattr(settings, 'SOCIALCONNECT_ASYNC_DISPATCH', False):
+                    return RemoteJob.objects.queue(self, '_publish_user_action', template_id=template_id, template_data=template_data, target_ids=target_ids)
+                return 0
 
 
     def _publish_user_action(self, template_id, template_data, target_ids=None):
@@ -762,10 +1532,7 @@ class SocialContext(object):
             Private method that instanciate the correct Proxy and call the api.
         '''     
 
-        if self.current_platform.__class__ == FBPlatform:
-            proxy = FBRequestProxy(self.com_object) 
-        else:
-            proxy = OSRequestProxy(self.com_object) 
+        proxy = self._get_proxy()
             
         return proxy.publish_user_action(template_id, template_data, target_ids)
 
@@ -787,6 +1554,14 @@ class SocialContext(object):
         if not self.current_platform.support_notifications:
             raise NotSupportedException()
 
+        # nobody to notify
+        if not user_ids:
+            return [], {}
+        
+        # queue the call if the user has a valid token
+        if self._can_queue():
+            return RemoteJob.objects.queue(self, '_send_notifications', user_ids=user_ids, text=text)
+
         # validate of the context, then call
         if self._validate_context(request, callback, args):
             return self._send_notifications(user_ids, text)     
@@ -794,14 +1569,28 @@ class SocialContext(object):
 
     def _send_notifications(self, user_ids, text):
         '''
-            Private method that instanciate the correct Proxy and call the api.
+            Private method that instanciate the correct Proxy and call the api. The recipients are sent by chunks of the size
+            set for the platform in SOCIALCONNECT_NOTIFICATIONS_PER_REQUEST, or of the default size of the proxy.
+            Return a (sent, failed) tuple: the list of the notified users and a dict of the errors keyed by user.
         '''
         
-        if self.current_platform.__class__ == FBPlatform:
-            proxy = FBRequestProxy(self.com_object) 
-        else:
-            proxy = OSRequestProxy(self.com_object) 
-        return proxy.send_notifications(user_ids, text)
+        proxy = self._get_proxy()
+        chunk_size = getattr(settings, 'SOCIALCONNECT_NOTIFICATIONS_PER_REQUEST', {}).get(self.current_platform.id)
+        return proxy.send_notifications(user_ids, text, chunk_size=chunk_size)
+
+
+    def _can_queue(self):
+        '''
+            Private method that returns True if the remote calls are dispatched in background (SOCIALCONNECT_ASYNC_DISPATCH)
+            and the user has a valid token for the platform. Otherwise the call is made synchronously, so the user can be
+            redirected to the platform to get a token.
+        '''
+        
+        if not getattr(settings, 'SOCIALCONNECT_ASYNC_DISPATCH', False):
+            return False
+        
+        platform_account = self.check_synchronization()
+        return platform_account is not None and platform_account.is_token_valid()
 
 
     # def get_activities(self, request, callback, uid='@me', target='@self', *args):
@@ -850,23 +1639,21 @@ class SocialContext(object):
                 # check if the user has already sync this platform
                 platform_account = self.check_synchronization()
                 if platform_account is not None:
+                    self.remote_id = platform_account.remote_id
                     
                     # if the object is not valid, get a token from the DB   
                     if not self.if_fb_com_object_valid():       
                         
                         # create com object with the valid token
                         if platform_account.is_token_valid():                   
-                            self.com_object = Facebook(self.current_platform.api_key, self.current_platform.api_secret)
-                            self.com_object.session_key = platform_account.token
-                            self.com_object.session_key_expires = platform_account.token_expire
-                            self.com_object.uid = platform_account.remote_id
+                            self.com_object = self.create_com_object(*platform_account.get_token())
 
                         # need a new token from the platform
                         else:
                             raise NoFBTokenException
 
                     # exectuted to check if the Facebook account logged on the client is a good one                 
-                    if self.com_object.uid != PlatformAccount.objects.get(platform=self.current_platform, user=request.user.get_profile()).remote_id:
+                    if self.com_object.uid != platform_account.remote_id:
                         self.com_object = None
                         raise SocialConnectException("The Facebook logged profile is not your profile. Please log out of Facebook.")
 
@@ -889,13 +1676,14 @@ class SocialContext(object):
                 # check if the user has already sync this platform
                 platform_account = self.check_synchronization()         
                 if platform_account is not None:
+                    self.remote_id = platform_account.remote_id
 
                     # if the object is not valid, get a token from the DB   
                     if not self.is_os_com_object_valid():
 
                         # create com object with the valid access token
                         if platform_account.is_token_valid():
-                            self.com_object = OpenSocial(self.current_platform.oauth_consumer_key, self.current_platform.oauth_consumer_secret, self.current_platform.oauth_signature_method, self.current_platform.api_url, platform_account.oauth_token, platform_account.oauth_token_secret, platform_account.oauth_token_expire)
+                            self.com_object = self.create_com_object(*platform_account.get_token())
                             #platform_account.update_token(self.com_object)
 
                         # need a new token from the platform
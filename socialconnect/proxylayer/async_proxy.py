@@ -0,0 +1,68 @@
+from socialconnect.utils.threads import ThreadPool
+
+from request_proxy import FBRequestProxy, OSRequestProxy
+
+
+# the threads of the async proxies that are not given a pool
+default_pool = ThreadPool()
+
+
+class AsyncProxy(object):
+    '''
+        An asynchronous counterpart of a Proxy. Each method queues the call of the same method of the proxy on a ThreadPool
+        and returns a Future at once, so the calling thread can start several calls, do its own work and then wait for the
+        results with Future.result() or socialconnect.utils.threads.wait_all().
+
+        The calls go through the wrapped proxy, so they are rate limited and guarded by its circuit breaker.
+
+        Params:
+            proxy: the Proxy making the calls
+            pool (optional): the ThreadPool running the calls, default_pool by default
+    '''
+
+    def __init__(self, proxy, pool=None):
+        self.proxy = proxy
+        self.pool = pool or default_pool
+
+
+    def _submit(self, name, *args, **kwargs):
+        return self.pool.submit(getattr(self.proxy, name), *args, **kwargs)
+
+
+    def get_friends(self, *args, **kwargs):
+        return self._submit('get_friends', *args, **kwargs)
+
+    def get_users_profile(self, *args, **kwargs):
+        return self._submit('get_users_profile', *args, **kwargs)
+
+    def get_profile(self, *args, **kwargs):
+        return self._submit('get_profile', *args, **kwargs)
+
+    def get_groups(self, *args, **kwargs):
+        return self._submit('get_groups', *args, **kwargs)
+
+    def publish_user_action(self, *args, **kwargs):
+        return self._submit('publish_user_action', *args, **kwargs)
+
+    def send_notifications(self, *args, **kwargs):
+        return self._submit('send_notifications', *args, **kwargs)
+
+
+
+class AsyncFBRequestProxy(AsyncProxy):
+    '''
+        An asynchronous FBRequestProxy. It takes the arguments of FBRequestProxy, or an existing proxy with the proxy keyword.
+    '''
+
+    def __init__(self, fb=None, platform_id=None, remote_id=None, proxy=None, pool=None):
+        AsyncProxy.__init__(self, proxy or FBRequestProxy(fb, platform_id, remote_id), pool)
+
+
+
+class AsyncOSRequestProxy(AsyncProxy):
+    '''
+        An asynchronous OSRequestProxy. It takes the arguments of OSRequestProxy, or an existing proxy with the proxy keyword.
+    '''
+
+    def __init__(self, os=None, platform_id=None, remote_id=None, platform=None, proxy=None, pool=None):
+        AsyncProxy.__init__(self, proxy or OSRequestProxy(os, platform_id, remote_id, platform), pool)
@@ -0,0 +1,165 @@
+import socket
+import threading
+import time
+import urllib2
+
+from socialconnect.utils.exceptions import CircuitOpenException, RemoteTimeoutException
+
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half-open'
+
+# number of latencies kept per platform to compute the timeout
+LATENCY_SAMPLES = 100
+
+# number of latencies needed before the timeout adapts, until then the maximum timeout is used
+MIN_LATENCY_SAMPLES = 10
+
+
+class CircuitBreaker(object):
+    '''
+        Circuit breakers for the remote platforms, one per platform and per process.
+
+        The outcomes of the calls to a platform are kept for window seconds. When there are at least min_calls calls in the
+        window and failure_rate of them failed, the circuit opens: the calls to the platform fail at once with a
+        CircuitOpenException instead of waiting for a platform that is down. After open_time seconds the circuit is half-open,
+        a single call goes through as a probe: it closes the circuit if it succeeds, otherwise the circuit opens again.
+
+        The timeout of the calls adapts to the latency of the platform: it is the 99th percentile of the latencies of the last
+        successful calls multiplied by latency_factor, between min_timeout and max_timeout.
+
+        Params:
+            window (optional): the time in seconds the outcomes of the calls are kept
+            min_calls (optional): the minimum number of calls in the window to open the circuit
+            failure_rate (optional): the rate of failed calls in the window that opens the circuit
+            open_time (optional): the time in seconds the circuit stays open before a probe
+            min_timeout, max_timeout (optional): the bounds of the timeout in seconds
+            latency_factor (optional): the margin of the timeout over the latency of the platform
+    '''
+
+    def __init__(self, window=60, min_calls=10, failure_rate=0.5, open_time=30, min_timeout=1, max_timeout=10, latency_factor=3):
+        self.window = window
+        self.min_calls = min_calls
+        self.failure_rate = failure_rate
+        self.open_time = open_time
+        self.min_timeout = min_timeout
+        self.max_timeout = max_timeout
+        self.latency_factor = latency_factor
+        self._circuits = {}
+        self._lock = threading.Lock()
+
+
+    def before_call(self, platform_id):
+        '''
+            Check that a call to a platform can be made. Raise a CircuitOpenException if the circuit is open or if a probe is
+            already in progress.
+        '''
+
+        now = time.time()
+        self._lock.acquire()
+        try:
+            circuit = self._circuit(platform_id)
+            if circuit['state'] == OPEN:
+                retry_after = circuit['opened'] + self.open_time - now
+                if retry_after > 0:
+                    raise CircuitOpenException(retry_after)
+                circuit['state'] = HALF_OPEN
+                circuit['probing'] = False
+
+            if circuit['state'] == HALF_OPEN:
+                if circuit['probing']:
+                    raise CircuitOpenException(self.open_time)
+                circuit['probing'] = True
+        finally:
+            self._lock.release()
+
+
+    def after_call(self, platform_id, latency, failed):
+        '''
+            Record the outcome of a call to a platform.
+
+            Params:
+                platform_id: the id of the platform
+                latency: the duration of the call in seconds
+                failed: True if the platform failed, see is_failure
+        '''
+
+        now = time.time()
+        self._lock.acquire()
+        try:
+            circuit = self._circuit(platform_id)
+
+            if not failed:
+                circuit['latencies'].append(latency)
+                del circuit['latencies'][:-LATENCY_SAMPLES]
+
+            # the probe decides the state of the circuit
+            if circuit['state'] == HALF_OPEN:
+                circuit['probing'] = False
+                circuit['calls'] = []
+                if failed:
+                    circuit['state'] = OPEN
+                    circuit['opened'] = now
+                else:
+                    circuit['state'] = CLOSED
+                return
+
+            calls = circuit['calls']
+            calls.append((now, failed))
+            while calls and calls[0][0] < now - self.window:
+                calls.pop(0)
+
+            failures = len([call for call in calls if call[1]])
+            if circuit['state'] == CLOSED and len(calls) >= self.min_calls and failures >= self.failure_rate * len(calls):
+                circuit['state'] = OPEN
+                circuit['opened'] = now
+        finally:
+            self._lock.release()
+
+
+    def get_timeout(self, platform_id):
+        '''
+            Return the timeout in seconds of the next call to a platform.
+        '''
+
+        self._lock.acquire()
+        try:
+            latencies = sorted(self._circuit(platform_id)['latencies'])
+        finally:
+            self._lock.release()
+
+        if len(latencies) < MIN_LATENCY_SAMPLES:
+            return self.max_timeout
+        p99 = latencies[min(int(len(latencies) * 0.99), len(latencies) - 1)]
+        return min(max(p99 * self.latency_factor, self.min_timeout), self.max_timeout)
+
+
+    def get_state(self, platform_id):
+        '''
+            Return the state of the circuit of a platform: CLOSED, OPEN or HALF_OPEN.
+        '''
+
+        self._lock.acquire()
+        try:
+            return self._circuit(platform_id)['state']
+        finally:
+            self._lock.release()
+
+
+    def is_failure(self, exception):
+        '''
+            Return True if an exception means that the platform failed (network error, timeout, server error) and not that the
+            call was refused (invalid session, feed limit...).
+        '''
+
+        if isinstance(exception, urllib2.HTTPError):
+            return exception.code >= 500
+        return isinstance(exception, (RemoteTimeoutException, IOError, socket.error))
+
+
+    def _circuit(self, platform_id):
+        circuit = self._circuits.get(platform_id)
+        if circuit is None:
+            circuit = self._circuits[platform_id] = {'state': CLOSED, 'opened': 0, 'probing': False, 'calls': [], 'latencies': []}
+        return circuit
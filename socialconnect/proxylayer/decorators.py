@@ -0,0 +1,141 @@
+import inspect
+import threading
+import time
+
+from socialconnect.utils.exceptions import RemoteTimeoutException
+from socialconnect.utils.threads import run_concurrently
+
+from metrics import OK, payload_size
+
+
+# the remote calls in progress on the current thread
+_calls = threading.local()
+
+
+def _nested(function, args, kwargs):
+    '''
+        Call a function as a nested remote call: the remote calls it makes are neither counted nor guarded again.
+    '''
+
+    previous = getattr(_calls, 'depth', 0), getattr(_calls, 'pages', False)
+    _calls.depth, _calls.pages = 1, False
+    try:
+        return function(*args, **kwargs)
+    finally:
+        _calls.depth, _calls.pages = previous
+
+
+def guard(proxy, function, args=(), kwargs={}):
+    '''
+        Make a request to the platform of a proxy. A token is taken from the rate limiter of the proxy. If the proxy has a
+        circuit breaker, the request fails at once when the circuit of the platform is open. Otherwise it is made in a
+        separate thread and abandoned with a RemoteTimeoutException after the timeout given by the breaker, and its outcome
+        is recorded by the breaker.
+
+        Params:
+            proxy: the Proxy making the request
+            function: the function making the request
+            args, kwargs (optional): the arguments of the function
+    '''
+
+    proxy.throttle()
+
+    breaker = proxy.circuit_breaker
+    if breaker is None:
+        return _nested(function, args, kwargs)
+
+    breaker.before_call(proxy.platform_id)
+    timeout = breaker.get_timeout(proxy.platform_id)
+    start = time.time()
+    try:
+        results, errors = run_concurrently({0: lambda: _nested(function, args, kwargs)}, timeout)
+        if 0 in errors:
+            raise errors[0][0], errors[0][1], errors[0][2]
+        if 0 not in results:
+            raise RemoteTimeoutException(timeout)
+    except Exception, ex:
+        breaker.after_call(proxy.platform_id, time.time() - start, breaker.is_failure(ex))
+        raise
+
+    breaker.after_call(proxy.platform_id, time.time() - start, False)
+    return results[0]
+
+
+def guarded_request(proxy, function, args=(), kwargs={}):
+    '''
+        Make one of the requests of a remote generator, a page of iter_friends for example. The request is guarded when the
+        generator is iterated by its caller, and made directly when the generator is used by another remote call, which is
+        already guarded.
+    '''
+
+    if getattr(_calls, 'pages', False):
+        return guard(proxy, function, args, kwargs)
+    return function(*args, **kwargs)
+
+
+def remote_call(method):
+    '''
+        Decorator for the methods of a Proxy that call the remote platform.
+
+        * The call is guarded, see guard(): it is throttled by the rate limiter of the proxy, it fails at once when the
+          circuit of the platform is open, otherwise it is made in a separate thread with the timeout of the breaker.
+        * The generators (iter_friends...) make a request per page: each request is guarded when the generator reaches it,
+          the generator makes it with Proxy._guarded_request().
+        * If the proxy has metrics, the latency, the status and the number of items returned are recorded, the waits of the
+          rate limiter included. A generator is recorded once it's exhausted or closed, with the time spent producing its items.
+
+        A remote call made by another remote call or by a generator producing an item (get_profile calling get_users_profile
+        for example) is neither counted nor guarded again. The methods sending several requests at the same time, by chunks,
+        throttle the additional requests themselves with Proxy.throttle().
+    '''
+
+    is_generator = inspect.isgeneratorfunction(method)
+
+    def paged_items(self, items):
+        count, status, elapsed = 0, OK, 0.0
+        try:
+            while True:
+                # the requests of the generator are guarded, its nested remote calls are not
+                previous = getattr(_calls, 'depth', 0), getattr(_calls, 'pages', False)
+                _calls.depth, _calls.pages = 1, True
+                start = time.time()
+                try:
+                    item = items.next()
+                except StopIteration:
+                    return
+                except Exception, ex:
+                    status = ex.__class__.__name__
+                    raise
+                finally:
+                    elapsed += time.time() - start
+                    _calls.depth, _calls.pages = previous
+                count += 1
+                yield item
+        finally:
+            items.close()
+            if self.metrics is not None:
+                self.metrics.record(self.platform_id, method.__name__, status, elapsed, count)
+
+    def call(self, *args, **kwargs):
+        if getattr(_calls, 'depth', 0):
+            return method(self, *args, **kwargs)
+
+        if is_generator:
+            return paged_items(self, method(self, *args, **kwargs))
+
+        if self.metrics is None:
+            return guard(self, method, (self,) + args, kwargs)
+
+        start = time.time()
+        try:
+            result = guard(self, method, (self,) + args, kwargs)
+        except Exception, ex:
+            self.metrics.record(self.platform_id, method.__name__, ex.__class__.__name__, time.time() - start)
+            raise
+
+        self.metrics.record(self.platform_id, method.__name__, OK, time.time() - start, payload_size(result))
+        return result
+
+    call.__name__ = method.__name__
+    call.__doc__ = method.__doc__
+    return call
@@ -0,0 +1,205 @@
+import logging
+import threading
+
+
+# upper bounds in seconds of the latency buckets
+DEFAULT_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+# the status of the successful calls, the failed ones have the name of their exception
+OK = 'ok'
+
+logger = logging.getLogger('socialconnect.metrics')
+
+
+class Histogram(object):
+    '''
+        The latencies and the payload sizes of the calls with the same platform, method and status.
+
+        Params:
+            buckets: the upper bounds in seconds of the latency buckets, in increasing order
+    '''
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.latency = 0.0
+        self.size = 0
+
+
+    def add(self, latency, size=None):
+        index = 0
+        for bound in self.buckets:
+            if latency <= bound:
+                break
+            index += 1
+        self.counts[index] += 1
+        self.count += 1
+        self.latency += latency
+        if size is not None:
+            self.size += size
+
+
+
+class RemoteMetrics(object):
+    '''
+        In-process metrics of the remote calls: a Histogram of the latencies per (platform id, method, status), the status
+        being OK or the name of the exception raised by the call, with the number of items returned by the calls.
+
+        The latency of a call includes the waits of the rate limiter. The latency of a generator (iter_friends...) is the
+        time spent producing its items, its requests and their waits included: the time its caller spends between two items
+        is not counted. Its number of items is the number of items it yielded.
+
+        The calls are also passed to the sinks, for example to send them to a statsd or a log, see add_sink().
+
+        Params:
+            buckets (optional): the upper bounds in seconds of the latency buckets
+    '''
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self.sinks = []
+        self._histograms = {}
+        self._lock = threading.Lock()
+
+
+    def record(self, platform_id, method, status, latency, size=None):
+        '''
+            Record a remote call.
+
+            Params:
+                platform_id: the id of the platform
+                method: the name of the proxy method
+                status: OK or the name of the exception
+                latency: the duration of the call in seconds
+                size (optional): the number of items returned, None if the result is not a collection
+        '''
+
+        key = (platform_id, method, status)
+        self._lock.acquire()
+        try:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram(self.buckets)
+            histogram.add(latency, size)
+        finally:
+            self._lock.release()
+
+        for sink in self.sinks:
+            try:
+                sink(platform_id, method, status, latency, size)
+            except Exception:
+                # a broken sink must not break the remote calls
+                logger.exception('metrics sink %r failed', sink)
+
+
+    def add_sink(self, sink):
+        '''
+            Add a sink, a callable called with the (platform_id, method, status, latency, size) of each remote call.
+            It's called by the thread of the call so it should be fast.
+        '''
+
+        self.sinks.append(sink)
+
+
+    def remove_sink(self, sink):
+        self.sinks.remove(sink)
+
+
+    def snapshot(self):
+        '''
+            Return a copy of the histograms keyed by (platform id, method, status).
+        '''
+
+        self._lock.acquire()
+        try:
+            snapshot = {}
+            for key, histogram in self._histograms.items():
+                copy = snapshot[key] = Histogram(histogram.buckets)
+                copy.counts, copy.count, copy.latency, copy.size = list(histogram.counts), histogram.count, histogram.latency, histogram.size
+            return snapshot
+        finally:
+            self._lock.release()
+
+
+    def reset(self):
+        self._lock.acquire()
+        try:
+            self._histograms = {}
+        finally:
+            self._lock.release()
+
+
+    def render(self, platform_names=None):
+        '''
+            Return the histograms in the Prometheus text format.
+
+            Params:
+                platform_names (optional): the names of the platforms keyed by id, added as a label
+        '''
+
+        lines = [
+            '# HELP socialconnect_remote_call_seconds Latency of the calls to the remote platforms, rate limiting included (time spent producing the items for the generators).',
+            '# TYPE socialconnect_remote_call_seconds histogram',
+        ]
+        sizes = [
+            '# HELP socialconnect_remote_call_items Number of items returned by the successful calls to the remote platforms.',
+            '# TYPE socialconnect_remote_call_items counter',
+        ]
+
+        # the items of the successful calls, summed per platform and method
+        items = {}
+
+        snapshot = self.snapshot()
+        for key in sorted(snapshot):
+            platform_id, method, status = key
+            histogram = snapshot[key]
+            labels = 'platform="%s",method="%s",status="%s"' % (platform_id, method, status)
+            if platform_names and platform_id in platform_names:
+                labels += ',platform_name="%s"' % escape(platform_names[platform_id])
+            if status == OK:
+                items[(platform_id, method)] = histogram.size
+
+            cumulated = 0
+            for bound, count in zip(self.buckets, histogram.counts):
+                cumulated += count
+                lines.append('socialconnect_remote_call_seconds_bucket{%s,le="%s"} %d' % (labels, bound, cumulated))
+            lines.append('socialconnect_remote_call_seconds_bucket{%s,le="+Inf"} %d' % (labels, histogram.count))
+            lines.append('socialconnect_remote_call_seconds_sum{%s} %f' % (labels, histogram.latency))
+            lines.append('socialconnect_remote_call_seconds_count{%s} %d' % (labels, histogram.count))
+
+        for platform_id, method in sorted(items):
+            labels = 'platform="%s",method="%s"' % (platform_id, method)
+            if platform_names and platform_id in platform_names:
+                labels += ',platform_name="%s"' % escape(platform_names[platform_id])
+            sizes.append('socialconnect_remote_call_items{%s} %d' % (labels, items[(platform_id, method)]))
+
+        return '\n'.join(lines + sizes) + '\n'
+
+
+
+def escape(value):
+    '''
+        Escape a label value of the text format.
+    '''
+
+    return unicode(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n').encode('utf-8')
+
+
+def payload_size(result):
+    '''
+        Return the number of items of the result of a remote call, None if it's not a collection.
+    '''
+
+    if isinstance(result, (list, dict, basestring)):
+        return len(result)
+    return None
+
+
+def load_sink(path):
+    '''
+        Import a sink from its dotted path, for example 'myproject.metrics.statsd_sink'.
+    '''
+
+    module, name = path.rsplit('.', 1)
+    return getattr(__import__(module, {}, {}, [name]), name)
@@ -0,0 +1,124 @@
+import time
+
+from django.core.cache import cache
+
+from socialconnect.utils.exceptions import RateLimitException
+
+
+# time in seconds a bucket lock is held at most, if its owner died
+LOCK_TIMEOUT = 1
+
+# time in seconds spent waiting for a bucket lock before going on without it
+LOCK_WAIT = 0.1
+
+
+class RateLimiter(object):
+    '''
+        Token buckets in front of the calls to the remote platforms, stored in the Django cache backend so that all the
+        worker processes share the same budgets.
+
+        Each platform can have a bucket for the whole platform (the budget of the application) and a bucket per remote
+        account. A bucket holds at most burst tokens and gets rate tokens per second, each call takes a token from both
+        buckets. When a bucket is empty the call waits for a token in blocking mode, or a RateLimitException is raised at
+        once in fail-fast mode. A blocking call that would wait more than max_wait seconds also raises a RateLimitException.
+
+        Params:
+            limits: a dict keyed by platform id of dicts with the optional 'platform' and 'account' keys,
+                    each one a (rate, burst) tuple. The platforms without limits are not throttled.
+            block (optional): True to wait for a token, False to fail fast
+            max_wait (optional): the maximum time in seconds a call waits for a token in blocking mode
+    '''
+
+    def __init__(self, limits=None, block=True, max_wait=5):
+        self.limits = limits or {}
+        self.block = block
+        self.max_wait = max_wait
+
+
+    def acquire(self, platform_id, remote_id=None):
+        '''
+            Take a token for a call to a platform on behalf of a remote account, waiting for it in blocking mode.
+
+            Params:
+                platform_id: the id of the platform
+                remote_id (optional): the id of the remote account, only the platform bucket is used if it's None
+        '''
+
+        buckets = self._buckets(platform_id, remote_id)
+        if not buckets:
+            return
+
+        waited = 0
+        while True:
+            wait = self._take(buckets)
+            if not wait:
+                return
+            if not self.block or waited + wait > self.max_wait:
+                raise RateLimitException(wait)
+            time.sleep(wait)
+            waited += wait
+
+
+    def _buckets(self, platform_id, remote_id):
+        '''
+            Return the (key, rate, burst) of the buckets of a call.
+        '''
+
+        try:
+            limits = self.limits.get(int(platform_id))
+        except (TypeError, ValueError):
+            return []
+        if not limits:
+            return []
+
+        buckets = []
+        if limits.get('platform'):
+            buckets.append(('socialconnect:bucket:%s' % platform_id,) + tuple(limits['platform']))
+        if limits.get('account') and remote_id is not None:
+            buckets.append(('socialconnect:bucket:%s:%s' % (platform_id, remote_id),) + tuple(limits['account']))
+        return buckets
+
+
+    def _take(self, buckets):
+        '''
+            Take a token from all the buckets if they all have one. Otherwise nothing is taken and the time to wait for
+            the next token is returned.
+        '''
+
+        locks = [key + ':lock' for key, rate, burst in buckets]
+        locked = [lock for lock in locks if self._lock(lock)]
+        try:
+            now = time.time()
+            states = []
+            wait = 0
+            for key, rate, burst in buckets:
+                tokens, stamp = cache.get(key) or (burst, now)
+                tokens = min(burst, tokens + (now - stamp) * rate)
+                states.append((key, rate, burst, tokens))
+                if tokens < 1:
+                    wait = max(wait, (1 - tokens) / float(rate))
+
+            if wait:
+                return wait
+
+            for key, rate, burst, tokens in states:
+                # the bucket is full again after burst / rate seconds, then it doesn't need to be stored
+                cache.set(key, (tokens - 1, now), int(burst / float(rate)) + 1)
+            return 0
+        finally:
+            for lock in locked:
+                cache.delete(lock)
+
+
+    def _lock(self, lock):
+        '''
+            Acquire a lock in the cache. Return False if it could not be acquired in LOCK_WAIT seconds, the bucket is then
+            updated without the lock, which can only let a few calls more go through.
+        '''
+
+        deadline = time.time() + LOCK_WAIT
+        while not cache.add(lock, True, LOCK_TIMEOUT):
+            if time.time() > deadline:
+                return False
+            time.sleep(0.005)
+        return True
@@ -1,4 +1,34 @@
 import sys
+import urllib2
+
+from facebook import FacebookError
+
+from socialconnect.utils.exceptions import CircuitOpenException, FeedLimitException, NotSupportedException, RateLimitException, \
+    RemoteTimeoutException, SocialConnectException
+from socialconnect.utils.threads import run_concurrently
+
+from decorators import guarded_request, remote_call
+from streaming import json, open_signed_request, iter_json_array, OpenSocialError
+
+
+# the error codes meaning that the session or the token of the user is not valid anymore, for Facebook and OpenSocial
+FB_SESSION_ERROR_CODES = (101, 102)
+OS_SESSION_ERROR_CODE = 100
+
+# the http status of the responses meaning that the platform can't stream the friends (unknown resource or parameters)
+STREAM_UNSUPPORTED_CODES = (400, 404, 405, 406, 501)
+
+
+def is_session_error(ex):
+    '''
+        Return True if an exception raised by a proxy means that only the user can fix the call, by logging in again.
+    '''
+
+    if isinstance(ex, FacebookError):
+        return ex.code in FB_SESSION_ERROR_CODES
+    if isinstance(ex, OpenSocialError):
+        return getattr(ex, 'code', None) == OS_SESSION_ERROR_CODE
+    return False
 
 
 class Proxy(object):
@@ -9,11 +39,48 @@ class Proxy(object):
         
         Params: 
             com_object: A communication object related to the target platform. This object is an instance of the pyfacebook or opensocial library.
+            platform_id (optional): the id of the target platform
+            remote_id (optional): the id of the authentificated user on the target platform
             
     '''
     
-    def __init__(self, com_object):
+    # maximum number of recipients of one notification call, bigger lists are split in chunks
+    notifications_per_request = 50
+    
+    # maximum number of chunks of notifications sent at the same time
+    max_concurrent_requests = 10
+    
+    # the RateLimiter of the calls, None to not throttle them
+    rate_limiter = None
+    
+    # the CircuitBreaker of the calls, None to make them without timeout
+    circuit_breaker = None
+    
+    # the RemoteMetrics recording the calls, None to not record them
+    metrics = None
+    
+    def __init__(self, com_object, platform_id=None, remote_id=None):
         self.com_object = com_object
+        self.platform_id = platform_id
+        self.remote_id = remote_id
+    
+    
+    def throttle(self):
+        '''
+            Take a token from the rate limiter for a request to the platform. It may wait or raise a RateLimitException.
+        '''
+        
+        if self.rate_limiter is not None:
+            self.rate_limiter.acquire(self.platform_id, self.remote_id)
+    
+    
+    def _guarded_request(self, function, *args, **kwargs):
+        '''
+            Make one of the requests of a generator (a page of friends for example) with the rate limiter, the circuit breaker
+            and the timeout of a remote call, see decorators.guarded_request.
+        '''
+        
+        return guarded_request(self, function, args, kwargs)
     
     
     def get_friends(self):
@@ -22,6 +89,18 @@ class Proxy(object):
         '''
         raise NotImplementedError
 
+    def iter_friends(self, fields, page_size, start=0):
+        '''
+            Generator over the pages of friends of the authentificated user. Each page is requested when it's needed.
+        '''
+        raise NotImplementedError
+
+    def iter_friends_stream(self, fields, ids_only=False):
+        '''
+            Generator over the friends of the authentificated user, yielded one by one as they are retrieved.
+        '''
+        raise NotImplementedError
+
     def get_users_profile(self): 
         '''
             Return a list of profiles related to the uids list.
@@ -52,6 +131,69 @@ class Proxy(object):
             This function send a notification to the ids provided
         '''
         raise NotImplementedError       
+        
+        
+    def _send_in_chunks(self, uids, send, chunk_size=None):
+        '''
+            Split a list of recipients in chunks of chunk_size and send them concurrently, max_concurrent_requests chunks at a time.
+            
+            Params:
+                uids: the recipients
+                send: a function sending a chunk of recipients, it returns the list of the recipients that were notified
+                      or None if they all were
+                chunk_size (optional): notifications_per_request by default
+            
+            Return a (sent, failed) tuple: the list of the notified recipients and a dict of the errors keyed by recipient.
+            The errors that would fail the other chunks too (session, rate limit, circuit breaker, timeout) are raised at once,
+            as is the first error when every chunk failed.
+        '''
+        
+        chunk_size = chunk_size or self.notifications_per_request
+        uids = list(uids)
+        chunks = [uids[start:start + chunk_size] for start in xrange(0, len(uids), chunk_size)]
+        
+        def send_chunk(index):
+            # the first request is counted by remote_call
+            if index:
+                self.throttle()
+            return send(chunks[index])
+        
+        sent = []
+        failed = {}
+        first_error = None
+        succeeded = False
+        for wave in xrange(0, len(chunks), self.max_concurrent_requests):
+            calls = dict([(index, lambda index=index: send_chunk(index)) for index in xrange(wave, min(wave + self.max_concurrent_requests, len(chunks)))])
+            results, errors = run_concurrently(calls)
+            
+            # aggregate the results of the chunks per recipient, in the uids order
+            for index in sorted(calls):
+                if index in errors:
+                    error = errors[index]
+                    if is_session_error(error[1]) or isinstance(error[1], (RateLimitException, CircuitOpenException, RemoteTimeoutException)):
+                        raise error[0], error[1], error[2]
+                    first_error = first_error or error
+                    for uid in chunks[index]:
+                        failed[uid] = error[1]
+                    continue
+                succeeded = True
+                    
+                notified = results[index]
+                if notified is None:
+                    sent.extend(chunks[index])
+                else:
+                    notified = set([unicode(uid) for uid in notified])
+                    for uid in chunks[index]:
+                        if unicode(uid) in notified:
+                            sent.append(uid)
+                        else:
+                            failed[uid] = SocialConnectException('The recipient was not notified.')
+        
+        # nothing was sent, the call failed
+        if first_error and not succeeded:
+            raise first_error[0], first_error[1], first_error[2]
+        
+        return sent, failed
             
 
     
@@ -65,44 +207,134 @@ class FBRequestProxy(Proxy):
         
     '''
     
-    def __init__(self, fb):
-        Proxy.__init__(self, fb)
+    # maximum number of uids sent in one users.getInfo call, bigger lists are split in chunks requested concurrently
+    users_per_request = 500
+    
+    def __init__(self, fb, platform_id=None, remote_id=None):
+        Proxy.__init__(self, fb, platform_id, remote_id)
                 
                 
+    @remote_call
     def get_friends(self, fields, get_profiles=False):      
         '''
             Returns the friends of the authentificated user.
             
             Params:
                 fields: A list of fields to retrieve for each friend. If not present, the default list is used.
-                get_profile: if True, a second request is made to get the profile of the users form the first call
+                get_profile: if True, the ids and the profiles of the friends are retrieved with FQL queries of
+                        users_per_request friends, a single one for most users
                         
         '''
         
-        # calling the communication object to retrieve a list of friends uids
-        friends_ids = self.com_object.friends.get()
-        
         if not get_profiles:
-            # return list of ids
-            return friends_ids
-        else:                   
-            # return list of friend's profiles with a second call
-            return self.com_object.users.getInfo(friends_ids, fields)
+            # calling the communication object to retrieve a list of friends uids
+            return self.com_object.friends.get()
+        
+        # return list of friend's profiles in the same round trips
+        friends = []
+        offset = 0
+        while True:
+            # the first request is counted by remote_call
+            if offset:
+                self.throttle()
+            page = self._query_friends(fields, offset)
+            friends.extend(page)
+            if len(page) < self.users_per_request:
+                return friends
+            offset += self.users_per_request
+            
+            
+    def _query_friends(self, fields, offset):
+        '''
+            Return a page of users_per_request friends with their profiles from offset, with a FQL query.
+        '''
+        
+        return self.com_object.fql.query('SELECT %s FROM user WHERE uid IN (SELECT uid2 FROM friend WHERE uid1 = %s) LIMIT %d OFFSET %d'
+            % (', '.join(fields), self.com_object.uid, self.users_per_request, offset))
         
 
 
+    @remote_call
+    def iter_friends(self, fields, page_size, start=0):
+        '''
+            Generator over the pages of friends of the authentificated user. The uids of all friends are retrieved with
+            a single call then each page of profiles is requested with users.getInfo when the page is needed.
+            
+            Params:
+                fields: A list of fields to retrieve for each friend.
+                page_size: the number of friends per page
+                start (optional): the index of the first friend
+        '''
+        
+        friends_ids = self._guarded_request(self.com_object.friends.get)
+        for index in xrange(start, len(friends_ids), page_size):
+            yield self._guarded_request(self.com_object.users.getInfo, friends_ids[index:index + page_size], fields)
+            
+            
+    @remote_call
+    def iter_friends_stream(self, fields, ids_only=False):
+        '''
+            Generator over the friends of the authentificated user. Facebook returns the whole list in a single response,
+            the friends are yielded from it.
+            
+            Params:
+                fields: A list of fields to retrieve for each friend.
+                ids_only: if True, only the uids of the friends are requested and yielded
+        '''
+        
+        if ids_only:
+            for friend in self._guarded_request(self.com_object.friends.get):
+                yield friend
+            return
+        
+        offset = 0
+        while True:
+            page = self._guarded_request(self._query_friends, fields, offset)
+            for friend in page:
+                yield friend
+            if len(page) < self.users_per_request:
+                return
+            offset += self.users_per_request
+            
+            
+    @remote_call
     def get_users_profile(self, uids, fields):      
         '''
-            This function return the profiles from a list of user uid, useful to retrieve friends profile for example
+            This function return the profiles from a list of user uid, useful to retrieve friends profile for example.
+            Long lists of uids are split in chunks of users_per_request uids that are requested concurrently.
 
             Params:
                 uids: list of user id
                 fields: A list of fields to retrieve for the profile. If not present, the default list is used.
         '''
 
-        return self.com_object.users.getInfo(uids, fields)
+        if not isinstance(uids, (list, tuple)) or len(uids) <= self.users_per_request:
+            return self.com_object.users.getInfo(uids, fields)
+        
+        # request the chunks at the same time
+        chunks = range(0, len(uids), self.users_per_request)
+        def get_chunk(start):
+            # the first request is counted by remote_call
+            if start:
+                self.throttle()
+            return self.com_object.users.getInfo(uids[start:start + self.users_per_request], fields)
+        
+        calls = dict([(start, lambda start=start: get_chunk(start)) for start in chunks])
+        results, errors = run_concurrently(calls)
+        
+        # raise the error of the first failed chunk
+        for start in chunks:
+            if start in errors:
+                raise errors[start][0], errors[start][1], errors[start][2]
+        
+        # join the chunks in the uids order
+        profiles = []
+        for start in chunks:
+            profiles.extend(results[start])
+        return profiles
     
     
+    @remote_call
     def get_profile(self, fields):
         '''
             This function return the profile of the authentificated user by calling getUsersProfile with the user uid as parameter
@@ -114,6 +346,7 @@ class FBRequestProxy(Proxy):
         return self.get_users_profile(self.com_object.uid, fields)
     
 
+    @remote_call
     def get_groups(self):   
         '''
             This function return the groups of the authentificated user on the target platform
@@ -121,6 +354,7 @@ class FBRequestProxy(Proxy):
         return self.com_object.groups.get(self.com_object.uid)
 
         
+    @remote_call
     def publish_user_action(self, template_id, template_data=None, target_ids=None): 
         '''
             This function publish an action using a given template
@@ -129,24 +363,36 @@ class FBRequestProxy(Proxy):
             return self.com_object.feed.publishUserAction(template_id, template_data, target_ids)
             
         except FacebookError, ex:
-            # Feed limit error
+            # Feed limit error, the action can be published later
             if ex.code in [340, 341]:
-                return 0
+                raise FeedLimitException(ex.code)
             else:
                 raise
             
 
-    def send_notifications(self, uids, text, type='user_to_user'):
+    @remote_call
+    def send_notifications(self, uids, text, type='user_to_user', chunk_size=None):
         '''
-            This function send a notification to the ids provided
+            This function send a notification to the ids provided. The recipients are sent by chunks of chunk_size,
+            at the same time, and the results are aggregated per recipient.
             
             Params:
                 uids: target users
                 text: text of the notification
                 type: type is 'user_to_user' by default but 'app_to_user' is also possible
-            
+                chunk_size (optional): the maximum number of recipients per call, notifications_per_request by default
+                
+            Return a (sent, failed) tuple: the list of the notified users and a dict of the errors keyed by user.
         '''
-        return self.com_object.notifications.send(uids, text, type=type)
+        
+        def send(chunk):
+            # Facebook returns the comma-separated list of the notified users
+            notified = self.com_object.notifications.send(chunk, text, type=type)
+            if isinstance(notified, basestring):
+                return [uid.strip() for uid in notified.split(',') if uid.strip()]
+            return None
+            
+        return self._send_in_chunks(uids, send, chunk_size)
         
 
         
@@ -154,32 +400,116 @@ class FBRequestProxy(Proxy):
 class OSRequestProxy(Proxy):
     ''' 
         This is a proxy to send request to OpenSocial
+        
+        Params:
+            platform (optional): the OSPlatform, needed by the calls that sign their own requests to stream the response
     '''
     
     
-    def __init__(self, os):
-        Proxy.__init__(self, os)
+    def __init__(self, os, platform_id=None, remote_id=None, platform=None):
+        Proxy.__init__(self, os, platform_id, remote_id)
+        self.platform = platform
 
 
+    @remote_call
     def get_friends(self, fields, get_profiles=False):
         '''
             Returns the friends of the authentificated user.
             
             Params:
                 fields: A list of fields to retrieve for each friend. If not present, the default list is used.
-                get_profile: if True, the profile are filtered to have only the ids
+                get_profile: if False, only the ids are requested and they are decoded as the response is read
                         
         '''
-        friends = self.com_object.get_friends(fields)       
         
         if get_profiles:
             # return the friends and their profile
-            return friends
+            return self.com_object.get_friends(fields)       
         else:
             # return list of ids
-            return map(lambda friend: friend['id'], friends)
+            return list(self.iter_friends_stream(['id'], ids_only=True))
 
+
+    @remote_call
+    def iter_friends(self, fields, page_size, start=0):
+        '''
+            Generator over the pages of friends of the authentificated user. Each page is requested with the startIndex and 
+            count parameters of the OpenSocial REST api when the page is needed, until a page is not full. 
+            Without the platform, all the friends are retrieved with the communication object and split in pages.
+            
+            Params:
+                fields: A list of fields to retrieve for each friend.
+                page_size: the number of friends per page
+                start (optional): the index of the first friend
+        '''
         
+        if self.platform is None:
+            friends = self._guarded_request(self.com_object.get_friends, fields)
+            for index in xrange(start, len(friends), page_size):
+                yield friends[index:index + page_size]
+            return
+            
+        while True:
+            page = self._guarded_request(self._get_friends_page, fields, start, page_size)
+            if page:
+                yield page
+            if len(page) < page_size:
+                return
+            start += page_size
+            
+
+    def _get_friends_page(self, fields, start, page_size):
+        '''
+            Request a page of friends and read it.
+        '''
+        
+        response = open_signed_request(self.platform, self.com_object.token, '/people/@me/@friends', {'fields': ','.join(fields), 'startIndex': str(start), 'count': str(page_size)})
+        try:
+            return list(iter_json_array(response, 'entry'))
+        finally:
+            response.close()
+            
+            
+    @remote_call
+    def iter_friends_stream(self, fields, ids_only=False):
+        '''
+            Generator over the friends of the authentificated user. The http response is parsed incrementally and each friend is
+            yielded as soon as it's decoded, so the memory used doesn't depend on the number of friends.
+            Without the platform, or when the platform can't answer the request (STREAM_UNSUPPORTED_CODES), the friends are
+            retrieved with the communication object. The timeout of the circuit breaker applies to the opening of the response,
+            not to its reading.
+            
+            Params:
+                fields: A list of fields to retrieve for each friend.
+                ids_only: if True, only the ids of the friends are yielded
+        '''
+        
+        response = None
+        if self.platform is not None:
+            try:
+                response = self._guarded_request(open_signed_request, self.platform, self.com_object.token, '/people/@me/@friends', {'fields': ','.join(fields)})
+            except urllib2.HTTPError, ex:
+                # the platform doesn't support the request, fall back to the communication object
+                if ex.code not in STREAM_UNSUPPORTED_CODES:
+                    raise
+        
+        if response is None:
+            friends = self._guarded_request(self.com_object.get_friends, fields)
+        else:
+            friends = iter_json_array(response, 'entry')
+            
+        try:
+            for friend in friends:
+                if ids_only:
+                    yield friend['id']
+                else:
+                    yield friend
+        finally:
+            if response is not None:
+                response.close()
+
+        
+    @remote_call
     def get_users_profile(self, ids, fields): 
         '''
             This function return the profiles from a list of user uid, usefull to retrieve friends profile for example
@@ -193,6 +523,7 @@ class OSRequestProxy(Proxy):
                 
         
         
+    @remote_call
     def get_profile(self, fields):
         '''
             This function return the profile of the authentificated user by calling getUsersProfile with the user uid as parameter
@@ -209,5 +540,29 @@ class OSRequestProxy(Proxy):
         
 
 
-
-
+    @remote_call
+    def send_notifications(self, uids, text, title=None, chunk_size=None):
+        '''
+            This function send a message to the ids provided with the messages service of the REST api (POST to the outbox
+            of the authentificated user). The recipients are sent by chunks of chunk_size, at the same time, and the results
+            are aggregated per recipient.
+            
+            Params:
+                uids: target users
+                text: body of the message
+                title (optional): title of the message
+                chunk_size (optional): the maximum number of recipients per call, notifications_per_request by default
+                
+            Return a (sent, failed) tuple: the list of the notified users and a dict of the errors keyed by user.
+        '''
+        
+        if self.platform is None:
+            raise NotSupportedException('The messages need the OSPlatform.')
+            
+        def send(chunk):
+            message = {'recipients': list(chunk), 'body': text, 'title': title or text[:100]}
+            response = open_signed_request(self.platform, self.com_object.token, '/messages/@me/@outbox', body=json.dumps(message), method='POST')
+            response.close()
+            return None
+            
+        return self._send_in_chunks(uids, send, chunk_size)
@@ -0,0 +1,184 @@
+import urllib2
+
+try:
+    import json
+except ImportError:
+    from django.utils import simplejson as json
+
+from oauth import oauth
+from opensocial import OpenSocialError
+
+
+# size of the blocks read from the http response
+CHUNK_SIZE = 8192
+
+# the http status of the responses refusing the token, reported as an OpenSocialError with the code 100
+TOKEN_ERROR_CODES = (401, 403)
+
+
+class OpenSocialTokenError(OpenSocialError):
+    '''
+        The OpenSocialError of a signed request whose token was refused by the platform, so the session is reset like for the
+        errors of the communication object.
+    '''
+
+    def __init__(self, code, message):
+        Exception.__init__(self, message)
+        self.code = code
+        self.message = message
+
+
+def open_signed_request(platform, token, path, parameters=None, body=None, method='GET'):
+    '''
+        Send an OAuth signed request to the REST api of an OpenSocial platform and return the http response, unread.
+
+        Params:
+            platform: the OSPlatform (api url, consumer key and secret, signature method)
+            token: the OAuth access token
+            path: the path of the resource from the api url, for example /people/@me/@friends
+            parameters (optional): a dict of query parameters
+            body (optional): a JSON document sent as the body of the request, it's not part of the signature
+            method (optional): the http method, GET by default
+
+        An http error refusing the token (TOKEN_ERROR_CODES) is raised as an OpenSocialTokenError.
+    '''
+
+    url = platform.api_url.rstrip('/') + path
+    consumer = oauth.OAuthConsumer(platform.oauth_consumer_key, platform.oauth_consumer_secret)
+    oauth_request = oauth.OAuthRequest.from_consumer_and_token(consumer, token=token, http_method=method, http_url=url, parameters=parameters or {})
+    oauth_request.sign_request(getattr(oauth, platform.oauth_signature_method)(), consumer, token)
+
+    # the OAuth parameters are in the query string so the body can be JSON
+    request = urllib2.Request(oauth_request.to_url(), body)
+    if body is not None:
+        request.add_header('Content-Type', 'application/json')
+    request.get_method = lambda: method
+    try:
+        return urllib2.urlopen(request)
+    except urllib2.HTTPError, ex:
+        if ex.code in TOKEN_ERROR_CODES:
+            raise OpenSocialTokenError(100, 'The token was refused by the platform (http %d).' % ex.code)
+        raise
+
+
+class JSONReader(object):
+    '''
+        Read the values of a JSON document from a stream, one at a time, keeping only the unread part of the last chunks.
+
+        Params:
+            stream: a file-like object, for example an http response
+            chunk_size (optional): the size of the blocks read from the stream
+    '''
+
+    def __init__(self, stream, chunk_size=CHUNK_SIZE):
+        self.stream = stream
+        self.chunk_size = chunk_size
+        self.decoder = json.JSONDecoder()
+        self.buffer = ''
+        self.eof = False
+
+
+    def read(self):
+        '''
+            Append a chunk of the stream to the buffer. Return False at the end of the stream.
+        '''
+
+        if not self.eof:
+            chunk = self.stream.read(self.chunk_size)
+            if chunk:
+                self.buffer += chunk
+                return True
+            self.eof = True
+        return False
+
+
+    def peek(self):
+        '''
+            Return the next character that is not a whitespace, without consuming it.
+        '''
+
+        while True:
+            self.buffer = self.buffer.lstrip(' \t\r\n')
+            if self.buffer:
+                return self.buffer[0]
+            if not self.read():
+                raise ValueError('Truncated JSON document')
+
+
+    def expect(self, characters):
+        '''
+            Consume the next character that is not a whitespace and return it, raise a ValueError if it's not one of characters.
+        '''
+
+        character = self.peek()
+        if character not in characters:
+            raise ValueError('Expected one of %r in the JSON document, found: %r' % (characters, self.buffer[:100]))
+        self.buffer = self.buffer[1:]
+        return character
+
+
+    def decode(self):
+        '''
+            Consume and return the next value. A value ending with the buffer may be incomplete (a number split between two
+            chunks for example), it's only decoded once something follows it or the stream is over.
+        '''
+
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer)
+            except ValueError:
+                if not self.read():
+                    raise ValueError('Truncated JSON document: %r' % self.buffer[:100])
+                continue
+
+            if end == len(self.buffer) and self.read():
+                continue
+            self.buffer = self.buffer[end:]
+            return value
+
+
+
+def iter_json_array(stream, key, chunk_size=CHUNK_SIZE):
+    '''
+        Parse a JSON object incrementally and yield the items of the array of its top-level member named key, for example
+        the entry array of an OpenSocial collection. Only the item being decoded is kept in memory, the other top-level
+        members (startIndex, totalResults...) are decoded and skipped.
+
+        A ValueError is raised if the document isn't an object with such an array (an error body for example) or if it's
+        truncated, so a failed call can't be mistaken for an empty array.
+
+        Params:
+            stream: a file-like object, for example an http response
+            key: the name of the array
+            chunk_size (optional): the size of the blocks read from the stream
+    '''
+
+    reader = JSONReader(stream, chunk_size)
+
+    # find the member among the top-level ones
+    name = None
+    reader.expect('{')
+    if reader.peek() != '}':
+        while True:
+            name = reader.decode()
+            reader.expect(':')
+            if name == key:
+                break
+            reader.decode()
+            if reader.expect(',}') == '}':
+                break
+
+    if name != key:
+        raise ValueError('The JSON document has no top-level %r member' % key)
+    if reader.peek() != '[':
+        raise ValueError('The top-level %r member of the JSON document is not an array: %r' % (key, reader.buffer[:100]))
+
+    # decode the items one by one
+    reader.expect('[')
+    if reader.peek() == ']':
+        return
+    while True:
+        yield reader.decode()
+        if reader.expect(',]') == ']':
+            return
@@ -0,0 +1,23 @@
+'''
+    A local stand-in for Facebook and OpenSocial platforms, to load test SocialConnect without calling the real platforms.
+
+    server.py is an HTTP server speaking enough of the Facebook REST api (restserver.php, login.php) and of the OpenSocial
+    REST and OAuth endpoints for the SocialConnect views and every SocialContext method. The users and their friends come
+    from a deterministic synthetic graph (graph.py) that is computed on demand, so it can have millions of users. The
+    latency of the calls and the errors of the platforms can be injected.
+
+    loadtest.py logs virtual users into a running yasn_example, links their accounts through the simulator and reports the
+    throughput and the latency percentiles of each view.
+
+    Setup, with the simulator on localhost:8765 and the site on localhost:8000:
+
+        python -m socialconnect.simulator.server --port 8765 --site http://localhost:8000
+
+        * SOCIALCONNECT_FACEBOOK_URL = 'http://localhost:8765/restserver.php' in the settings
+        * a FBPlatform with the login url http://localhost:8765/login.php (any api key and secret)
+        * an OSPlatform with the api url http://localhost:8765/social/rest and the OAuth urls
+          http://localhost:8765/oauth/request_token, /oauth/authorize and /oauth/access_token (any consumer key and secret)
+        * the domain of the current Site set to localhost:8000 for the OAuth callback
+
+        python -m socialconnect.simulator.loadtest --url http://localhost:8000 --platform 1 --platform 2
+'''
@@ -0,0 +1,140 @@
+import random
+from datetime import date
+
+
+FIRST_NAMES = ('Alice', 'Bob', 'Carol', 'David', 'Emma', 'Frank', 'Grace', 'Henri', 'Irene', 'Jules', 'Karen', 'Louis',
+               'Marie', 'Nicolas', 'Olivia', 'Paul', 'Quentin', 'Rose', 'Simon', 'Tina')
+LAST_NAMES = ('Martin', 'Bernard', 'Dubois', 'Thomas', 'Robert', 'Richard', 'Petit', 'Durand', 'Leroy', 'Moreau',
+              'Simard', 'Laurent', 'Lefebvre', 'Michel', 'Garcia', 'Tremblay', 'Roux', 'Fournier', 'Girard', 'Bonnet')
+MONTHS = ('January', 'February', 'March', 'April', 'May', 'June', 'July', 'August', 'September', 'October', 'November', 'December')
+
+
+class FriendGraph(object):
+    '''
+        A deterministic synthetic graph of users. Nothing is stored: the friends and the profile of a user are computed from
+        his id and the seed, so the graph can have millions of users and two simulators with the same seed serve the same graph.
+
+        The users have ids from 1 to size. The number of friends of a user is drawn around mean_friends, up to max_friends.
+
+        Params:
+            size: the number of users
+            mean_friends: the average number of friends
+            max_friends: the maximum number of friends
+            seed (optional): the seed of the graph
+    '''
+
+    def __init__(self, size=1000000, mean_friends=200, max_friends=5000, seed=0):
+        self.size = size
+        self.mean_friends = mean_friends
+        self.max_friends = max_friends
+        self.seed = seed
+
+
+    def _random(self, uid, salt=0):
+        return random.Random(hash((self.seed, int(uid), salt)))
+
+
+    def count_friends(self, uid):
+        '''
+            Return the number of friends of a user.
+        '''
+
+        return min(int(self._random(uid).expovariate(1.0 / self.mean_friends)), self.max_friends, self.size - 1)
+
+
+    def friends(self, uid, start=0, count=None):
+        '''
+            Return the ids of the friends of a user, or a page of them.
+        '''
+
+        stop = self.count_friends(uid)
+        if count is not None:
+            stop = min(start + count, stop)
+
+        uid = int(uid)
+        friends = []
+        for index in xrange(start, stop):
+            friend = self._random(uid, index + 1).randint(1, self.size)
+            if friend == uid:
+                friend = friend % self.size + 1
+            friends.append(friend)
+        return friends
+
+
+    def person(self, uid):
+        '''
+            Return the attributes of a user.
+        '''
+
+        rnd = self._random(uid, -1)
+        first_name, last_name = rnd.choice(FIRST_NAMES), rnd.choice(LAST_NAMES)
+        birthday = date(rnd.randint(1940, 2000), rnd.randint(1, 12), rnd.randint(1, 28))
+        return {
+            'id': int(uid),
+            'first_name': first_name,
+            'last_name': last_name,
+            'name': '%s %s' % (first_name, last_name),
+            'sex': rnd.choice(('male', 'female', None)),
+            'birthday': rnd.random() < 0.8 and birthday or None,
+            'about_me': 'Synthetic user %s' % uid,
+            'city': rnd.choice(('Montreal', 'Paris', 'Lyon', 'Quebec')),
+            'company': rnd.choice(('Electron Libre', 'ACME', None)),
+        }
+
+
+    def fb_profile(self, uid, fields):
+        '''
+            Return the profile of a user in the format of the Facebook users.getInfo call, with the requested fields.
+        '''
+
+        person = self.person(uid)
+        values = {
+            'uid': person['id'],
+            'name': person['name'],
+            'first_name': person['first_name'],
+            'last_name': person['last_name'],
+            'profile_url': 'http://www.facebook.com/profile.php?id=%s' % uid,
+            'birthday': person['birthday'] and '%s %d, %d' % (MONTHS[person['birthday'].month - 1], person['birthday'].day, person['birthday'].year) or None,
+            'sex': person['sex'],
+            'about_me': person['about_me'],
+            'email_hashes': [],
+            'current_location': {'city': person['city']},
+            'pic': 'http://www.facebook.com/pics/%s.jpg' % uid,
+            'pic_square': 'http://www.facebook.com/pics/%s_q.jpg' % uid,
+            'work_history': person['company'] and [{'company_name': person['company']}] or [],
+        }
+        return dict([(field, values.get(field)) for field in fields])
+
+
+    def os_person(self, uid, fields=None):
+        '''
+            Return the profile of a user as an OpenSocial Person. Only the requested fields are returned, with the id and
+            the displayName that are always present.
+        '''
+
+        person = self.person(uid)
+        values = {
+            'id': str(person['id']),
+            'displayName': person['name'],
+            'name': {'givenName': person['first_name'], 'familyName': person['last_name']},
+            'profileUrl': 'http://opensocial.localhost/profile/%s' % uid,
+            'birthday': person['birthday'] and person['birthday'].isoformat() or None,
+            'gender': person['sex'],
+            'aboutMe': person['about_me'],
+            'emails': [],
+            'addresses': [{'locality': person['city']}],
+            'thumbnailUrl': 'http://opensocial.localhost/pics/%s.jpg' % uid,
+            'organizations': person['company'] and [{'name': person['company']}] or [],
+        }
+        if not fields:
+            return values
+        return dict([(field, values.get(field)) for field in set(fields) | set(['id', 'displayName'])])
+
+
+    def groups(self, uid):
+        '''
+            Return the groups of a user: up to 10 groups among 1000.
+        '''
+
+        rnd = self._random(uid, -2)
+        return [{'gid': gid, 'name': 'Group %d' % gid} for gid in sorted(set([rnd.randint(1, 1000) for i in xrange(rnd.randint(0, 10))]))]
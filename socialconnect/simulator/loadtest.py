@@ -0,0 +1,201 @@
+'''
+    Load driver for the yasn_example site running against the simulator, see socialconnect.simulator.
+
+    Each virtual user is a thread with its own cookies: it signs up (or logs in) as loadtest<N>, links its account on each
+    platform with the synch view, going through the login pages of the simulator, then requests the views at random until
+    the end of the test. The throughput, the errors and the latency percentiles are reported per path.
+
+    Usage: python -m socialconnect.simulator.loadtest --url http://localhost:8000 --platform 1 [--platform 2]
+           [--users 20] [--duration 60] [--view /poc/profile/%(platform)s/ ...] [--json]
+'''
+
+import cookielib
+import random
+import sys
+import threading
+import time
+import urllib
+import urllib2
+from optparse import OptionParser
+
+try:
+    import json
+except ImportError:
+    import simplejson as json
+
+
+# the views requested by default, %(platform)s is replaced by the id of the platform
+DEFAULT_VIEWS = (
+    '/poc/profile/%(platform)s/',
+    '/poc/friends/%(platform)s/',
+    '/poc/groups/%(platform)s/',
+    '/friends/matched/%(platform)s/',
+    '/friends/invite/%(platform)s/',
+    '/friends/',
+    '/stories/',
+)
+
+
+class Stats(object):
+    '''
+        The latencies and the errors of the requests, per view. Shared by the virtual users.
+    '''
+
+    def __init__(self):
+        self.latencies = {}
+        self.errors = {}
+        self._lock = threading.Lock()
+
+
+    def add(self, view, latency, error=None):
+        self._lock.acquire()
+        try:
+            self.latencies.setdefault(view, []).append(latency)
+            if error is not None:
+                self.errors.setdefault(view, {})
+                self.errors[view][error] = self.errors[view].get(error, 0) + 1
+        finally:
+            self._lock.release()
+
+
+    def report(self, duration):
+        '''
+            Return the statistics of each view: requests, errors, throughput and p50/p99/max latencies in ms.
+        '''
+
+        report = {}
+        for view, latencies in self.latencies.items():
+            latencies = sorted(latencies)
+            errors = self.errors.get(view, {})
+            report[view] = {
+                'requests': len(latencies),
+                'errors': sum(errors.values()),
+                'error_types': errors,
+                'throughput': len(latencies) / float(duration),
+                'p50': percentile(latencies, 0.50) * 1000,
+                'p99': percentile(latencies, 0.99) * 1000,
+                'max': latencies[-1] * 1000,
+            }
+        return report
+
+
+def percentile(values, rank):
+    '''
+        Return the percentile of a sorted list.
+    '''
+
+    if not values:
+        return 0
+    return values[min(int(len(values) * rank), len(values) - 1)]
+
+
+class VirtualUser(threading.Thread):
+    '''
+        A user browsing the site.
+
+        Params:
+            number: the number of the user, his username is loadtest<number>
+            options: the options of the load test
+            stats: the shared Stats
+            deadline: the end of the test
+    '''
+
+    def __init__(self, number, options, stats, deadline):
+        threading.Thread.__init__(self)
+        self.setDaemon(True)
+        self.username = 'loadtest%d' % number
+        self.options = options
+        self.stats = stats
+        self.deadline = deadline
+        self.opener = urllib2.build_opener(urllib2.HTTPCookieProcessor(cookielib.CookieJar()))
+        self.random = random.Random(number)
+
+
+    def request(self, view, path, data=None):
+        '''
+            Request a page, following the redirections, and record its latency under the name view.
+            Return the url of the final page or None if the request failed.
+        '''
+
+        start = time.time()
+        try:
+            response = self.opener.open(self.options.url + path, data and urllib.urlencode(data), self.options.timeout)
+            response.read()
+            response.close()
+        except urllib2.HTTPError, ex:
+            self.stats.add(view, time.time() - start, 'HTTP %d' % ex.code)
+            return None
+        except Exception, ex:
+            self.stats.add(view, time.time() - start, ex.__class__.__name__)
+            return None
+        self.stats.add(view, time.time() - start)
+        return response.geturl()
+
+
+    def run(self):
+        password = 'loadtest'
+        url = self.request('signup', '/signup/', {'username': self.username, 'password': password, 'password2': password, 'email': '%s@localhost' % self.username})
+        if url is None or url.rstrip('/') != self.options.url.rstrip('/'):
+            # the user already exists
+            self.request('login', '/login/', {'username': self.username, 'password': password})
+
+        # link the accounts through the login pages of the simulator
+        for platform in self.options.platforms:
+            self.request('synch %s' % platform, '/poc/synch/%s/' % platform)
+
+        views = [(view, platform) for view in self.options.views for platform in self.options.platforms if '%(platform)s' in view]
+        views += [(view, None) for view in self.options.views if '%(platform)s' not in view]
+        while time.time() < self.deadline:
+            view, platform = self.random.choice(views)
+            path = view % {'platform': platform}
+            self.request(path, path)
+            if self.options.think:
+                time.sleep(self.random.expovariate(1.0 / self.options.think))
+
+
+def print_report(report, duration):
+    print '%-48s %9s %7s %9s %9s %9s %9s' % ('view', 'requests', 'errors', 'req/s', 'p50 ms', 'p99 ms', 'max ms')
+    for view in sorted(report):
+        stats = report[view]
+        print '%-48s %9d %7d %9.1f %9.1f %9.1f %9.1f' % (view[:48], stats['requests'], stats['errors'], stats['throughput'], stats['p50'], stats['p99'], stats['max'])
+        for error, count in sorted(stats['error_types'].items()):
+            print '    %s: %d' % (error, count)
+    total = sum([stats['requests'] for stats in report.values()])
+    print 'total: %d requests in %.1f s, %.1f req/s' % (total, duration, total / duration)
+
+
+def main(argv=None):
+    parser = OptionParser(usage='python -m socialconnect.simulator.loadtest [options]')
+    parser.add_option('--url', default='http://localhost:8000', help='url of the site')
+    parser.add_option('--platform', action='append', dest='platforms', default=[], help='id of a platform to test, repeatable')
+    parser.add_option('--users', type='int', default=20, help='number of virtual users')
+    parser.add_option('--first-user', type='int', default=1, dest='first_user', help='number of the first virtual user')
+    parser.add_option('--duration', type='float', default=60, help='duration of the test in seconds')
+    parser.add_option('--think', type='float', default=0, help='mean time in seconds between two requests of a user')
+    parser.add_option('--timeout', type='float', default=60, help='timeout of a request in seconds')
+    parser.add_option('--view', action='append', dest='views', default=[], help='path of a view to request, repeatable')
+    parser.add_option('--json', action='store_true', default=False, help='print the report as JSON')
+    options, args = parser.parse_args(argv)
+
+    options.url = options.url.rstrip('/')
+    options.views = options.views or list(DEFAULT_VIEWS)
+
+    stats = Stats()
+    start = time.time()
+    users = [VirtualUser(number, options, stats, start + options.duration) for number in xrange(options.first_user, options.first_user + options.users)]
+    for user in users:
+        user.start()
+    for user in users:
+        while user.isAlive():
+            user.join(1)
+    duration = time.time() - start
+
+    report = stats.report(duration)
+    if options.json:
+        print json.dumps(report, indent=2, sort_keys=True)
+    else:
+        print_report(report, duration)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
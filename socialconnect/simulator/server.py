@@ -0,0 +1,466 @@
+'''
+    HTTP simulator of a Facebook platform and of an OpenSocial platform, see socialconnect.simulator.
+
+    Usage: python -m socialconnect.simulator.server [--port 8765] [--site http://localhost:8000] [--users 1000000]
+           [--friends 200] [--latency 0.05] [--jitter 0.02] [--error 102=0.01] [--error 340=0.05] [--error 100=0.01]
+
+    Error codes: 101 and 102 (invalid Facebook session) are returned by any Facebook call, 340 and 341 (feed limits) by
+    feed.publishUserAction, 100 (invalid OpenSocial token) by any OpenSocial call as a 401 response and the codes from 500
+    by any call as an http error. The signatures of the requests are not checked.
+'''
+
+import BaseHTTPServer
+import cgi
+import random
+import re
+import SocketServer
+import sys
+import threading
+import time
+import urllib
+import urlparse
+from optparse import OptionParser
+
+try:
+    import json
+except ImportError:
+    import simplejson as json
+
+from socialconnect.simulator.graph import FriendGraph
+
+
+# prefix of the OpenSocial REST api
+OS_API_PATH = '/social/rest'
+
+# the query of FBRequestProxy.get_friends, paged with LIMIT and OFFSET
+FQL_FRIENDS = re.compile(r'^SELECT (.+) FROM user WHERE uid IN \(SELECT uid2 FROM friend WHERE uid1 = (\d+)\)(?: LIMIT (\d+)(?: OFFSET (\d+))?)?$', re.I)
+
+# number of OpenSocial friends written at once in a response
+WRITE_BATCH = 500
+
+
+class Simulator(object):
+    '''
+        The state of the simulated platforms: the graph, the tokens delivered and the injected latency and errors.
+
+        The browser of a user is identified by a cookie: the first visit to the login or authorization page gives it the id
+        of a new user of the graph, so each virtual user of a load test is a different remote user.
+
+        Params:
+            graph: the FriendGraph
+            site: the url of the site, the Facebook login redirects to it
+            latency, jitter (optional): the mean and the standard deviation of the latency of the api calls in seconds
+            errors (optional): a dict of error rates keyed by error code
+            session_ttl (optional): the validity of the Facebook sessions in seconds, 0 for infinite sessions
+    '''
+
+    def __init__(self, graph, site, latency=0, jitter=0, errors=None, session_ttl=0):
+        self.graph = graph
+        self.site = site.rstrip('/')
+        self.latency = latency
+        self.jitter = jitter
+        self.errors = errors or {}
+        self.session_ttl = session_ttl
+        self._lock = threading.Lock()
+        self._next_uid = 0
+        self._tokens = {}
+
+
+    def new_uid(self):
+        self._lock.acquire()
+        try:
+            self._next_uid = self._next_uid % self.graph.size + 1
+            return self._next_uid
+        finally:
+            self._lock.release()
+
+
+    def new_token(self, uid, prefix):
+        token = '%s-%s-%s' % (prefix, random.getrandbits(64), uid)
+        self._lock.acquire()
+        try:
+            self._tokens[token] = uid
+        finally:
+            self._lock.release()
+        return token
+
+
+    def get_token_uid(self, token):
+        return self._tokens.get(token)
+
+
+    def authorize(self, token, uid):
+        '''
+            Authorize an OAuth request token for a user.
+        '''
+
+        if token in self._tokens:
+            self._tokens[token] = uid
+
+
+    def wait(self):
+        '''
+            Sleep for the latency of a call.
+        '''
+
+        if self.latency or self.jitter:
+            time.sleep(max(random.gauss(self.latency, self.jitter), 0))
+
+
+    def error(self, codes):
+        '''
+            Return one of the error codes drawn with its rate, or None.
+        '''
+
+        for code in codes:
+            rate = self.errors.get(code)
+            if rate and random.random() < rate:
+                return code
+        return None
+
+
+    def http_error(self):
+        return self.error([code for code in self.errors if code >= 500])
+
+
+
+class Handler(BaseHTTPServer.BaseHTTPRequestHandler):
+    '''
+        The requests of the simulated platforms.
+    '''
+
+    # the Simulator, set by serve()
+    simulator = None
+
+    # log the requests
+    verbose = False
+
+    def log_message(self, format, *args):
+        if self.verbose:
+            BaseHTTPServer.BaseHTTPRequestHandler.log_message(self, format, *args)
+
+
+    def do_GET(self):
+        self.handle_request()
+
+    def do_POST(self):
+        self.handle_request()
+
+
+    def handle_request(self):
+        url = urlparse.urlparse(self.path)
+        self.params = dict([(key, values[0]) for key, values in cgi.parse_qs(url[4]).items()])
+        self.body = ''
+        if self.command == 'POST':
+            self.body = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+            if self.headers.get('Content-Type', '').startswith('application/x-www-form-urlencoded'):
+                self.params.update(dict([(key, values[0]) for key, values in cgi.parse_qs(self.body).items()]))
+
+        path = url[2]
+        try:
+            if path == '/login.php':
+                self.fb_login()
+            elif path == '/restserver.php':
+                self.fb_api()
+            elif path == '/oauth/request_token':
+                self.oauth_request_token()
+            elif path == '/oauth/authorize':
+                self.oauth_authorize()
+            elif path == '/oauth/access_token':
+                self.oauth_access_token()
+            elif path.startswith(OS_API_PATH + '/'):
+                self.os_api(path[len(OS_API_PATH) + 1:].strip('/').split('/'))
+            else:
+                self.send_text(404, 'Not found')
+        except Exception, ex:
+            self.send_text(500, 'Simulator error: %r' % ex)
+
+
+    def send_text(self, status, text, content_type='text/plain', headers=()):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(text)))
+        for name, value in headers:
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(text)
+
+
+    def send_json(self, value, status=200):
+        self.send_text(status, json.dumps(value), 'application/json')
+
+
+    def redirect(self, url, uid):
+        self.send_response(302)
+        self.send_header('Location', url)
+        self.send_header('Set-Cookie', 'simulator_uid=%s; path=/' % uid)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+
+    def browser_uid(self):
+        '''
+            Return the user logged in the browser making the request, a new user if it has no cookie.
+        '''
+
+        for cookie in self.headers.getheaders('Cookie'):
+            for item in cookie.split(';'):
+                name, _, value = item.strip().partition('=')
+                if name == 'simulator_uid' and value.isdigit():
+                    return int(value)
+        return self.simulator.new_uid()
+
+
+    #### Facebook ####
+
+    def fb_login(self):
+        '''
+            The login page redirects the browser to the next url of the site with a new auth token.
+        '''
+
+        uid = self.browser_uid()
+        next = self.params.get('next', '/')
+        if not next.startswith('http'):
+            next = self.simulator.site + next
+        separator = '?' in next and '&' or '?'
+        self.redirect(next + separator + urllib.urlencode({'auth_token': self.simulator.new_token(uid, 'auth')}), uid)
+
+
+    def fb_api(self):
+        simulator = self.simulator
+        method = self.params.get('method', '')
+        if method.startswith('facebook.'):
+            method = method[len('facebook.'):]
+        simulator.wait()
+
+        code = simulator.http_error()
+        if code:
+            return self.send_text(code, 'Injected error %d' % code)
+
+        if method == 'auth.createToken':
+            return self.send_json(simulator.new_token(simulator.new_uid(), 'auth'))
+
+        if method == 'auth.getSession':
+            uid = simulator.get_token_uid(self.params.get('auth_token'))
+            if uid is None:
+                return self.fb_error(100, 'Invalid parameter')
+            expires = simulator.session_ttl and int(time.time()) + simulator.session_ttl or 0
+            return self.send_json({'session_key': simulator.new_token(uid, 'session'), 'uid': str(uid), 'expires': expires, 'secret': str(random.getrandbits(64))})
+
+        # the Facebook session keys end with the uid of the user
+        session_key = self.params.get('session_key') or ''
+        if not session_key:
+            return self.fb_error(102, 'Session key invalid or no longer valid')
+        uid = int(session_key.split('-')[-1])
+
+        code = simulator.error([101, 102])
+        if code:
+            return self.fb_error(code, 'Session key invalid or no longer valid')
+
+        graph = simulator.graph
+        if method == 'friends.get':
+            return self.send_json(graph.friends(self.params.get('uid') or uid))
+
+        if method == 'users.getInfo':
+            uids, fields = self.fb_list('uids'), self.fb_list('fields')
+            return self.send_json([graph.fb_profile(friend, fields) for friend in uids])
+
+        if method == 'fql.query':
+            m = FQL_FRIENDS.match(self.params.get('query', '').strip())
+            if not m:
+                return self.fb_error(601, 'Parser error: unsupported query')
+            fields = [field.strip() for field in m.group(1).split(',')]
+            friends = graph.friends(m.group(2), int(m.group(4) or 0), m.group(3) and int(m.group(3)) or None)
+            return self.send_json([graph.fb_profile(friend, fields) for friend in friends])
+
+        if method == 'groups.get':
+            return self.send_json(graph.groups(self.params.get('uid') or uid))
+
+        if method == 'feed.publishUserAction':
+            code = simulator.error([340, 341])
+            if code:
+                return self.fb_error(code, 'Feed action request limit reached')
+            return self.send_json({'feed.publishUserAction_response': True})
+
+        if method == 'notifications.send':
+            return self.send_json(','.join(self.fb_list('to_ids')))
+
+        return self.fb_error(3, 'Unknown method')
+
+
+    def fb_list(self, name):
+        '''
+            Return a list parameter sent as a comma-separated string or as JSON.
+        '''
+
+        value = self.params.get(name, '')
+        if value.startswith('['):
+            return [unicode(item) for item in json.loads(value)]
+        return [item for item in value.split(',') if item]
+
+
+    def fb_error(self, code, message):
+        self.send_json({'error_code': code, 'error_msg': message, 'request_args': []})
+
+
+    #### OAuth ####
+
+    def oauth_request_token(self):
+        self.simulator.wait()
+        token = self.simulator.new_token(0, 'request')
+        self.send_text(200, urllib.urlencode({'oauth_token': token, 'oauth_token_secret': random.getrandbits(64)}))
+
+
+    def oauth_authorize(self):
+        '''
+            The authorization page authorizes the request token for the user of the browser and redirects to the callback.
+        '''
+
+        uid = self.browser_uid()
+        token = self.params.get('oauth_token', '')
+        self.simulator.authorize(token, uid)
+        callback = self.params.get('oauth_callback') or self.simulator.site + '/'
+        separator = '?' in callback and '&' or '?'
+        self.redirect(callback + separator + urllib.urlencode({'oauth_token': token}), uid)
+
+
+    def oauth_access_token(self):
+        self.simulator.wait()
+        uid = self.simulator.get_token_uid(self.params.get('oauth_token'))
+        if not uid:
+            return self.send_text(401, 'oauth_problem=token_rejected')
+        token = self.simulator.new_token(uid, 'access')
+        self.send_text(200, urllib.urlencode({'oauth_token': token, 'oauth_token_secret': random.getrandbits(64)}))
+
+
+    #### OpenSocial ####
+
+    def os_uid(self):
+        '''
+            Return the user of the OAuth access token of the request, from the query or the Authorization header.
+        '''
+
+        token = self.params.get('oauth_token')
+        if token is None:
+            m = re.search(r'oauth_token="([^"]+)"', self.headers.get('Authorization', ''))
+            token = m and urllib.unquote(m.group(1))
+        return self.simulator.get_token_uid(token)
+
+
+    def os_api(self, parts):
+        simulator = self.simulator
+        simulator.wait()
+
+        code = simulator.http_error()
+        if code:
+            return self.send_text(code, 'Injected error %d' % code)
+
+        uid = self.os_uid()
+        if uid is None or simulator.error([100]):
+            return self.send_json({'error': {'code': 100, 'message': 'Invalid access token'}}, 401)
+
+        def guid(value):
+            if value == '@me':
+                return uid
+            return int(value)
+
+        fields = [field for field in self.params.get('fields', '').split(',') if field]
+        service, guids = parts[0], len(parts) > 1 and parts[1] or '@me'
+        selector = len(parts) > 2 and parts[2] or '@self'
+        graph = simulator.graph
+
+        if service == 'people' and selector == '@self':
+            ids = [guid(value) for value in guids.split(',')]
+            entries = [graph.os_person(person, fields) for person in ids]
+            return self.send_json({'entry': len(entries) == 1 and entries[0] or entries})
+
+        if service == 'people' and selector in ('@friends', '@all'):
+            start = int(self.params.get('startIndex', 0))
+            count = self.params.get('count') and int(self.params['count']) or None
+            return self.send_people(guid(guids), fields, start, count)
+
+        if service == 'groups':
+            return self.send_json({'entry': [{'id': str(group['gid']), 'title': group['name']} for group in graph.groups(guid(guids))]})
+
+        if service == 'messages' and self.command == 'POST':
+            message = self.body and json.loads(self.body) or {}
+            return self.send_json({'entry': {'id': str(random.getrandbits(32)), 'recipients': message.get('recipients', [])}})
+
+        if service == 'activities' and self.command == 'POST':
+            return self.send_json({'entry': {}})
+
+        self.send_json({'error': {'code': 501, 'message': 'Not implemented'}}, 501)
+
+
+    def send_people(self, uid, fields, start, count):
+        '''
+            Write a collection of friends without building the whole document, for the users with very large friend lists.
+        '''
+
+        graph = self.simulator.graph
+        total = graph.count_friends(uid)
+        friends = graph.friends(uid, start, count)
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.end_headers()
+        self.wfile.write('{"startIndex": %d, "itemsPerPage": %d, "totalResults": %d, "entry": [' % (start, len(friends), total))
+        for index in xrange(0, len(friends), WRITE_BATCH):
+            batch = [json.dumps(graph.os_person(friend, fields)) for friend in friends[index:index + WRITE_BATCH]]
+            self.wfile.write((index and ', ' or '') + ', '.join(batch))
+        self.wfile.write(']}')
+
+
+
+class SimulatorServer(SocketServer.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+    request_queue_size = 128
+
+
+def serve(simulator, host='', port=8765, verbose=False):
+    '''
+        Serve the simulated platforms until the process is interrupted.
+    '''
+
+    class SimulatorHandler(Handler):
+        pass
+    SimulatorHandler.simulator = simulator
+    SimulatorHandler.verbose = verbose
+
+    server = SimulatorServer((host, port), SimulatorHandler)
+    print 'Simulator listening on http://%s:%d (%d users, site %s)' % (host or 'localhost', port, simulator.graph.size, simulator.site)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+def main(argv=None):
+    parser = OptionParser(usage='python -m socialconnect.simulator.server [options]')
+    parser.add_option('--host', default='')
+    parser.add_option('--port', type='int', default=8765)
+    parser.add_option('--site', default='http://localhost:8000', help='url of the site, the Facebook login redirects to it')
+    parser.add_option('--users', type='int', default=1000000, help='number of users of the graph')
+    parser.add_option('--friends', type='int', default=200, help='average number of friends')
+    parser.add_option('--max-friends', type='int', default=5000, dest='max_friends', help='maximum number of friends')
+    parser.add_option('--seed', type='int', default=0, help='seed of the graph')
+    parser.add_option('--latency', type='float', default=0, help='mean latency of the api calls in seconds')
+    parser.add_option('--jitter', type='float', default=0, help='standard deviation of the latency in seconds')
+    parser.add_option('--error', action='append', default=[], help='CODE=RATE, an error code returned with this rate')
+    parser.add_option('--session-ttl', type='int', default=0, dest='session_ttl', help='validity of the Facebook sessions in seconds, 0 for infinite')
+    parser.add_option('--verbose', action='store_true', default=False)
+    options, args = parser.parse_args(argv)
+
+    errors = {}
+    for error in options.error:
+        code, rate = error.split('=')
+        errors[int(code)] = float(rate)
+
+    graph = FriendGraph(options.users, options.friends, options.max_friends, options.seed)
+    simulator = Simulator(graph, options.site, options.latency, options.jitter, errors, options.session_ttl)
+    serve(simulator, options.host, options.port, options.verbose)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
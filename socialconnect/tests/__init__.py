@@ -0,0 +1,6 @@
+from socialconnect.tests.test_streaming import *
+from socialconnect.tests.test_remote_cache import *
+from socialconnect.tests.test_remote_jobs import *
+from socialconnect.tests.test_ratelimit import *
+from socialconnect.tests.test_breaker import *
+from socialconnect.tests.test_threads import *
@@ -0,0 +1,110 @@
+import unittest
+import urllib2
+
+from socialconnect.proxylayer import breaker
+from socialconnect.proxylayer.breaker import CircuitBreaker, CLOSED, OPEN, HALF_OPEN, MIN_LATENCY_SAMPLES
+from socialconnect.utils.exceptions import CircuitOpenException, RemoteTimeoutException
+
+
+class FakeClock(object):
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def time(self):
+        return self.now
+
+
+
+class CircuitBreakerTest(unittest.TestCase):
+    '''
+        The states of the circuits and the adaptive timeouts, with a fake clock.
+    '''
+
+    def setUp(self):
+        self.time = breaker.time
+        breaker.time = self.clock = FakeClock()
+        self.breaker = CircuitBreaker(window=60, min_calls=4, failure_rate=0.5, open_time=30, min_timeout=1, max_timeout=10, latency_factor=3)
+
+
+    def tearDown(self):
+        breaker.time = self.time
+
+
+    def failed_calls(self, platform_id=1, count=1):
+        for i in xrange(count):
+            self.breaker.before_call(platform_id)
+            self.breaker.after_call(platform_id, 0.1, True)
+
+
+    def succeeded_calls(self, platform_id=1, count=1, latency=0.1):
+        for i in xrange(count):
+            self.breaker.before_call(platform_id)
+            self.breaker.after_call(platform_id, latency, False)
+
+
+    def test_opens_on_failure_rate(self):
+        self.succeeded_calls(count=2)
+        self.failed_calls()
+        self.assertEqual(self.breaker.get_state(1), CLOSED)
+        self.failed_calls()
+        self.assertEqual(self.breaker.get_state(1), OPEN)
+        self.assertRaises(CircuitOpenException, self.breaker.before_call, 1)
+
+        # the other platforms are not affected
+        self.succeeded_calls(platform_id=2)
+
+
+    def test_needs_min_calls(self):
+        self.failed_calls(count=3)
+        self.assertEqual(self.breaker.get_state(1), CLOSED)
+
+
+    def test_old_calls_leave_the_window(self):
+        self.failed_calls(count=3)
+        self.clock.now += 61
+        self.succeeded_calls(count=3)
+        self.failed_calls()
+        self.assertEqual(self.breaker.get_state(1), CLOSED)
+
+
+    def test_probe_closes(self):
+        self.failed_calls(count=4)
+        self.clock.now += 31
+        self.breaker.before_call(1)
+        self.assertEqual(self.breaker.get_state(1), HALF_OPEN)
+
+        # a single probe at a time
+        self.assertRaises(CircuitOpenException, self.breaker.before_call, 1)
+
+        self.breaker.after_call(1, 0.1, False)
+        self.assertEqual(self.breaker.get_state(1), CLOSED)
+        self.succeeded_calls()
+
+
+    def test_probe_reopens(self):
+        self.failed_calls(count=4)
+        self.clock.now += 31
+        self.failed_calls()
+        self.assertEqual(self.breaker.get_state(1), OPEN)
+        self.assertRaises(CircuitOpenException, self.breaker.before_call, 1)
+
+
+    def test_timeout(self):
+        self.assertEqual(self.breaker.get_timeout(1), 10)
+        self.succeeded_calls(count=MIN_LATENCY_SAMPLES, latency=0.5)
+        self.assertAlmostEqual(self.breaker.get_timeout(1), 1.5)
+
+        # between min_timeout and max_timeout
+        self.succeeded_calls(platform_id=2, count=MIN_LATENCY_SAMPLES, latency=0.01)
+        self.assertEqual(self.breaker.get_timeout(2), 1)
+        self.succeeded_calls(platform_id=3, count=MIN_LATENCY_SAMPLES, latency=8)
+        self.assertEqual(self.breaker.get_timeout(3), 10)
+
+
+    def test_is_failure(self):
+        self.assertTrue(self.breaker.is_failure(RemoteTimeoutException(1)))
+        self.assertTrue(self.breaker.is_failure(IOError()))
+        self.assertTrue(self.breaker.is_failure(urllib2.HTTPError('http://localhost/', 503, 'Unavailable', {}, None)))
+        self.assertFalse(self.breaker.is_failure(urllib2.HTTPError('http://localhost/', 404, 'Not found', {}, None)))
+        self.assertFalse(self.breaker.is_failure(ValueError()))
@@ -0,0 +1,101 @@
+import unittest
+
+from django.core.cache import get_cache
+
+from socialconnect.proxylayer import ratelimit
+from socialconnect.proxylayer.ratelimit import RateLimiter
+from socialconnect.utils.exceptions import RateLimitException
+
+
+class FakeClock(object):
+    '''
+        Stands in for the time module: sleep() moves the clock forward at once.
+    '''
+
+    def __init__(self):
+        self.now = 1000.0
+        self.sleeps = []
+
+    def time(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+
+class RateLimiterTest(unittest.TestCase):
+    '''
+        The token buckets of the rate limiter, in a local memory cache with a fake clock.
+    '''
+
+    def setUp(self):
+        self.cache, self.time = ratelimit.cache, ratelimit.time
+        ratelimit.cache = get_cache('locmem:///')
+        ratelimit.time = self.clock = FakeClock()
+
+
+    def tearDown(self):
+        ratelimit.cache, ratelimit.time = self.cache, self.time
+
+
+    def test_burst_then_fail_fast(self):
+        limiter = RateLimiter({1: {'platform': (1, 2)}}, block=False)
+        limiter.acquire(1)
+        limiter.acquire(1)
+        try:
+            limiter.acquire(1)
+        except RateLimitException, ex:
+            self.assertAlmostEqual(ex.parameter, 1)
+        else:
+            self.fail('RateLimitException not raised')
+
+
+    def test_refill(self):
+        limiter = RateLimiter({1: {'platform': (2, 1)}}, block=False)
+        limiter.acquire(1)
+        self.assertRaises(RateLimitException, limiter.acquire, 1)
+        self.clock.now += 0.5
+        limiter.acquire(1)
+
+
+    def test_blocking_waits_for_a_token(self):
+        limiter = RateLimiter({1: {'platform': (2, 1)}}, block=True, max_wait=5)
+        limiter.acquire(1)
+        limiter.acquire(1)
+        self.assertEqual(len(self.clock.sleeps), 1)
+        self.assertAlmostEqual(self.clock.sleeps[0], 0.5)
+
+
+    def test_blocking_max_wait(self):
+        limiter = RateLimiter({1: {'platform': (0.1, 1)}}, block=True, max_wait=5)
+        limiter.acquire(1)
+        self.assertRaises(RateLimitException, limiter.acquire, 1)
+        self.assertEqual(self.clock.sleeps, [])
+
+
+    def test_account_buckets(self):
+        limiter = RateLimiter({1: {'account': (1, 1)}}, block=False)
+        limiter.acquire(1, 'a')
+        limiter.acquire(1, 'b')
+        self.assertRaises(RateLimitException, limiter.acquire, 1, 'a')
+
+        # without remote account only the platform bucket is used, there is none
+        limiter.acquire(1)
+
+
+    def test_both_buckets_or_none(self):
+        limiter = RateLimiter({1: {'platform': (1, 2), 'account': (1, 1)}}, block=False)
+        limiter.acquire(1, 'a')
+        self.assertRaises(RateLimitException, limiter.acquire, 1, 'a')
+
+        # the refused call didn't take the token of the platform bucket
+        limiter.acquire(1, 'b')
+        self.assertRaises(RateLimitException, limiter.acquire, 1, 'c')
+
+
+    def test_platform_without_limits(self):
+        limiter = RateLimiter({1: {'platform': (1, 1)}}, block=False)
+        for i in xrange(10):
+            limiter.acquire(2)
@@ -0,0 +1,57 @@
+import unittest
+
+from django.core.cache import get_cache
+
+from socialconnect.utils import remote_cache
+from socialconnect.utils.remote_cache import RemoteCache
+
+
+class RemoteCacheIterateTest(unittest.TestCase):
+    '''
+        The caching of the remote calls returning an iterator, in a local memory cache.
+    '''
+
+    def setUp(self):
+        self.cache = remote_cache.cache
+        remote_cache.cache = get_cache('locmem:///')
+        self.fetches = 0
+
+
+    def tearDown(self):
+        remote_cache.cache = self.cache
+
+
+    def fetch(self):
+        self.fetches += 1
+        for item in ['1', '2', '3']:
+            yield item
+
+
+    def test_cached_once_exhausted(self):
+        cache = RemoteCache(300, 600)
+        self.assertEqual(list(cache.iterate(1, 'a', 'ids', [], self.fetch)), ['1', '2', '3'])
+        self.assertEqual(list(cache.iterate(1, 'a', 'ids', [], self.fetch)), ['1', '2', '3'])
+        self.assertEqual(self.fetches, 1)
+
+
+    def test_partial_iteration_not_cached(self):
+        cache = RemoteCache(300, 600)
+        items = cache.iterate(1, 'a', 'ids', [], self.fetch)
+        self.assertEqual(items.next(), '1')
+        self.assertEqual(list(cache.iterate(1, 'a', 'ids', [], self.fetch)), ['1', '2', '3'])
+        self.assertEqual(self.fetches, 2)
+
+
+    def test_invalidate(self):
+        cache = RemoteCache(300, 600)
+        list(cache.iterate(1, 'a', 'ids', [], self.fetch))
+        cache.invalidate(1, 'a')
+        list(cache.iterate(1, 'a', 'ids', [], self.fetch))
+        self.assertEqual(self.fetches, 2)
+
+
+    def test_disabled(self):
+        cache = RemoteCache(0)
+        list(cache.iterate(1, 'a', 'ids', [], self.fetch))
+        list(cache.iterate(1, 'a', 'ids', [], self.fetch))
+        self.assertEqual(self.fetches, 2)
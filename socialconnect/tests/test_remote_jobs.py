@@ -0,0 +1,70 @@
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import models
+from django.test import TestCase
+
+from socialconnect.models import Platform, RemoteJob
+
+
+class RemoteJobClaimTest(TestCase):
+    '''
+        The claim and the lease of the remote jobs, without any call to a platform.
+    '''
+
+    def setUp(self):
+        profile_model = models.get_model(*settings.AUTH_PROFILE_MODULE.split('.'))
+        profile = profile_model.objects.create(user=User.objects.create(username='jobs'))
+        platform = Platform.objects.create(name='Platform', api_url='http://localhost/')
+        self.job = RemoteJob.objects.create(platform=platform, user=profile, method='_send_notifications', arguments='{}')
+
+
+    def reload(self):
+        return RemoteJob.objects.get(id=self.job.id)
+
+
+    def test_single_claim(self):
+        first, second = self.reload(), self.reload()
+        self.assertTrue(first.claim())
+        self.assertFalse(second.claim())
+
+        job = self.reload()
+        self.assertEqual(job.status, RemoteJob.RUNNING)
+        self.assertEqual(job.attempts, 1)
+        self.assertEqual(job.claimed_by, first.claimed_by)
+
+
+    def test_running_job_is_not_pending(self):
+        self.assertEqual([job.id for job in RemoteJob.objects.get_pending()], [self.job.id])
+        self.assertTrue(self.reload().claim())
+        self.assertEqual(list(RemoteJob.objects.get_pending()), [])
+
+
+    def test_expired_lease_is_reclaimed(self):
+        worker = self.reload()
+        self.assertTrue(worker.claim())
+        RemoteJob.objects.filter(id=self.job.id).update(locked_until=datetime.now() - timedelta(seconds=1))
+
+        pending = list(RemoteJob.objects.get_pending())
+        self.assertEqual([job.id for job in pending], [self.job.id])
+        self.assertTrue(pending[0].claim())
+
+        # the first worker finishing late doesn't overwrite the new run
+        worker._fail('late')
+        job = self.reload()
+        self.assertEqual(job.status, RemoteJob.RUNNING)
+        self.assertEqual(job.attempts, 2)
+        self.assertEqual(job.claimed_by, pending[0].claimed_by)
+
+
+    def test_outcome_releases_the_lease(self):
+        job = self.reload()
+        self.assertTrue(job.claim())
+        job._retry('error')
+
+        job = self.reload()
+        self.assertEqual(job.status, RemoteJob.PENDING)
+        self.assertEqual(job.locked_until, None)
+        self.assertEqual(job.last_error, 'error')
+        self.assertTrue(job.next_attempt > datetime.now())
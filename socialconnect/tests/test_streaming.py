@@ -0,0 +1,60 @@
+import unittest
+from StringIO import StringIO
+
+from socialconnect.proxylayer.streaming import iter_json_array
+
+
+class IterJSONArrayTest(unittest.TestCase):
+    '''
+        The incremental parsing of the entry array of the OpenSocial collections.
+    '''
+
+    def parse(self, document, chunk_size=8192):
+        return list(iter_json_array(StringIO(document), 'entry', chunk_size))
+
+
+    def test_collection(self):
+        document = '{"startIndex": 0, "totalResults": 2, "entry": [{"id": "1"}, {"id": "2"}]}'
+        self.assertEqual(self.parse(document), [{'id': '1'}, {'id': '2'}])
+
+
+    def test_one_byte_chunks(self):
+        document = '{"totalResults": 3, "entry" : [ 12345, "a,b]", {"id": "3", "tags": [1, 2]} ] }'
+        self.assertEqual(self.parse(document, 1), [12345, 'a,b]', {'id': '3', 'tags': [1, 2]}])
+
+
+    def test_number_at_the_end_of_a_chunk(self):
+        self.assertEqual(self.parse('{"entry": [12345, 678]}', 13), [12345, 678])
+
+
+    def test_empty_array(self):
+        self.assertEqual(self.parse('{"entry": []}', 1), [])
+
+
+    def test_nested_entry(self):
+        document = '{"filter": {"entry": ["nested"]}, "entry": [{"id": "1", "entry": [2]}]}'
+        self.assertEqual(self.parse(document, 1), [{'id': '1', 'entry': [2]}])
+
+
+    def test_only_nested_entry(self):
+        self.assertRaises(ValueError, self.parse, '{"data": {"entry": [{"id": "1"}]}}')
+
+
+    def test_error_body(self):
+        self.assertRaises(ValueError, self.parse, '{"code": 401, "message": "Unauthorized"}')
+        self.assertRaises(ValueError, self.parse, '<html><body>Internal Server Error</body></html>')
+        self.assertRaises(ValueError, self.parse, '')
+
+
+    def test_entry_not_an_array(self):
+        self.assertRaises(ValueError, self.parse, '{"entry": {"id": "1"}}')
+
+
+    def test_truncated(self):
+        self.assertRaises(ValueError, self.parse, '{"entry": [{"id": "1"}, {"id": "2', 4)
+        self.assertRaises(ValueError, self.parse, '{"entry": [1, 2', 4)
+
+
+    def test_key_far_from_the_array(self):
+        document = '{"entry"' + ' ' * 100 + ':' + ' ' * 100 + '[1]}'
+        self.assertEqual(self.parse(document, 8), [1])
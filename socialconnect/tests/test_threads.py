@@ -0,0 +1,91 @@
+import threading
+import time
+import unittest
+
+from socialconnect.utils.exceptions import RemoteTimeoutException
+from socialconnect.utils.threads import run_concurrently, wait_all, ThreadPool
+
+
+class RunConcurrentlyTest(unittest.TestCase):
+
+    def test_results_and_errors(self):
+        def fail():
+            raise ValueError('failed')
+        results, errors = run_concurrently({'a': lambda: 1, 'b': fail})
+        self.assertEqual(results, {'a': 1})
+        self.assertEqual(errors.keys(), ['b'])
+        self.assertTrue(errors['b'][0] is ValueError)
+
+
+    def test_calls_run_at_the_same_time(self):
+        barrier = threading.Event()
+        results, errors = run_concurrently({'wait': lambda: barrier.wait(1) or barrier.isSet(), 'set': barrier.set}, 2)
+        self.assertEqual(results['wait'], True)
+
+
+    def test_timeout(self):
+        release = threading.Event()
+        start = time.time()
+        results, errors = run_concurrently({'fast': lambda: 1, 'slow': lambda: release.wait(5)}, 0.1)
+        release.set()
+        self.assertTrue(time.time() - start < 1)
+        self.assertEqual(results, {'fast': 1})
+        self.assertEqual(errors, {})
+
+
+
+class ThreadPoolTest(unittest.TestCase):
+
+    def setUp(self):
+        self.pool = ThreadPool(2)
+
+
+    def test_result(self):
+        future = self.pool.submit(lambda x, y=0: x + y, 1, y=2)
+        self.assertEqual(future.result(1), 3)
+        self.assertTrue(future.done())
+
+
+    def test_exception(self):
+        def fail():
+            raise ValueError('failed')
+        future = self.pool.submit(fail)
+        self.assertRaises(ValueError, future.result, 1)
+        self.assertTrue(future.exc_info()[0] is ValueError)
+
+
+    def test_result_timeout(self):
+        release = threading.Event()
+        future = self.pool.submit(release.wait, 5)
+        self.assertRaises(RemoteTimeoutException, future.result, 0.05)
+        self.assertFalse(future.done())
+        release.set()
+        future.result(1)
+
+
+    def test_pool_size(self):
+        # more calls than threads, they are queued
+        release = threading.Event()
+        futures = [self.pool.submit(release.wait, 5) for i in xrange(4)]
+        time.sleep(0.05)
+        self.assertEqual(len(self.pool._threads), 2)
+        release.set()
+        for future in futures:
+            future.result(1)
+
+
+    def test_wait_all(self):
+        release = threading.Event()
+        def fail():
+            raise ValueError('failed')
+        def timeout():
+            raise RemoteTimeoutException(1)
+        futures = {'ok': self.pool.submit(lambda: 1), 'error': self.pool.submit(fail), 'slow': self.pool.submit(release.wait, 5)}
+        results, errors = wait_all(futures, 0.2)
+        release.set()
+        self.assertEqual(results, {'ok': 1})
+        self.assertEqual(errors.keys(), ['error'])
+
+        # a function raising a RemoteTimeoutException is an error, not a call still running
+        results, errors = wait_all({'timeout': self.pool.submit(timeout)}, 1)
+        self.assertEqual(errors.keys(), ['timeout'])
@@ -1,7 +1,7 @@
 import re
 
 from django.core.urlresolvers import reverse
-from django.http import HttpResponseRedirect
+from django.http import Http404, HttpResponse, HttpResponseRedirect
 
 from facebook import FacebookError
 from opensocial import OpenSocialError
@@ -17,7 +17,7 @@ def exception_handler(function):
         '''
         
         try:
-            PlatformAccount.objects.get(platform=platform_id, user=request.user).as_leaf_class().invalidate_token()
+            PlatformAccount.objects.get_leaf(platform=platform_id, user=request.user).invalidate_token()
         except PlatformAccount.DoesNotExist:
             pass
         
@@ -37,7 +37,10 @@ def exception_handler(function):
             '''
                 This Exception is raised if we need to go to Facebook to login the user, authorized the app or get new session.
             '''
-            return HttpResponseRedirect(Platform.objects.get(id=platform_id).as_leaf_class().get_login_url())
+            platform = Platform.objects.get_leaf(platform_id)
+            if platform is None:
+                raise Http404('No Platform matches the given query.')
+            return HttpResponseRedirect(platform.get_login_url())
 
         except RedirectOSException:
             '''
@@ -70,6 +73,27 @@ def exception_handler(function):
             # It's another exception    
             raise
             
+        except RateLimitException, ex:
+            '''
+                This exception is raised when the request budget of the platform is exceeded.
+            '''
+            
+            response = HttpResponse('Too many requests to the platform, please retry later.', status=503)
+            if ex.parameter:
+                response['Retry-After'] = str(int(ex.parameter) + 1)
+            return response
+            
+        except (CircuitOpenException, RemoteTimeoutException), ex:
+            '''
+                This exception is raised when the platform is down or too slow: the call failed at once or was abandoned.
+                The results in the remote cache are still served, only the calls that are not cached fail.
+            '''
+            
+            response = HttpResponse('The platform is not available at the moment, please retry later.', status=503)
+            if isinstance(ex, CircuitOpenException) and ex.parameter:
+                response['Retry-After'] = str(int(ex.parameter) + 1)
+            return response
+            
         except SocialConnectException, ex:
             ''' 
                 This exception could be raised in some very rare case where multiple users use the same computer
@@ -79,5 +103,9 @@ def exception_handler(function):
             
             return HttpResponse(ex.message)
                         
-        
+    
+    # keep the name of the view, for the QueryBudgetMiddleware budgets for example
+    handle.__name__ = function.__name__
+    handle.__module__ = function.__module__
+    handle.__doc__ = function.__doc__
     return handle
\ No newline at end of file
@@ -73,4 +73,33 @@ class SocialConnectException(Exception):
         self.parameter = value
 
     def __unicode__(self):
-        return repr(self.parameter)     
+        return repr(self.parameter)
+        
+        
+class FeedLimitException(SocialConnectException):
+    def __init__(self, value=None):
+        SocialConnectException.__init__(self, value)
+        
+        
+class RateLimitException(Exception):
+    def __init__(self, value=None):
+        self.parameter = value
+
+    def __unicode__(self):
+        return repr(self.parameter)
+        
+        
+class CircuitOpenException(Exception):
+    def __init__(self, value=None):
+        self.parameter = value
+
+    def __unicode__(self):
+        return repr(self.parameter)
+        
+        
+class RemoteTimeoutException(Exception):
+    def __init__(self, value=None):
+        self.parameter = value
+
+    def __unicode__(self):
+        return repr(self.parameter)
@@ -0,0 +1,137 @@
+import hashlib
+import threading
+import time
+
+from django.core.cache import cache
+
+
+class RemoteCache(object):
+    '''
+        A cache of the results of remote calls stored in the Django cache backend.
+
+        Entries are keyed by (platform_id, remote_id, method, fields). An entry is fresh for ttl seconds. After that it is
+        still served for stale_ttl seconds while a single background thread refreshes it. All the entries of a remote account
+        are invalidated at once by changing the generation of the account, which is part of the keys.
+
+        Params:
+            ttl: the time in seconds an entry is fresh, 0 disables the cache
+            stale_ttl: the time in seconds a stale entry is served while it is refreshed
+    '''
+
+    def __init__(self, ttl=300, stale_ttl=600):
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+
+
+    def get(self, platform_id, remote_id, method, fields, fetch):
+        '''
+            Return the cached result of a remote call, or call fetch and cache its result.
+
+            Params:
+                platform_id: the id of the platform
+                remote_id: the id of the authentificated user on the platform, the call is not cached if it's None
+                method: the name of the remote call
+                fields: the list of fields requested
+                fetch: a function without arguments making the remote call, it must not query the db
+        '''
+
+        if not self.ttl or remote_id is None:
+            return fetch()
+
+        key = self._key(platform_id, remote_id, method, fields)
+        entry = cache.get(key)
+
+        if entry is None:
+            value = fetch()
+            self._set(key, value)
+            return value
+
+        value, fresh_until = entry
+        if fresh_until < time.time() and cache.add(key + ':refresh', True, self.stale_ttl):
+            # refresh the stale entry in background, the lock prevents other threads or processes from doing the same
+            thread = threading.Thread(target=self._refresh, args=(key, fetch))
+            thread.setDaemon(True)
+            thread.start()
+
+        return value
+
+
+    def iterate(self, platform_id, remote_id, method, fields, fetch):
+        '''
+            Like get for a remote call returning an iterator: on a cache miss the items are passed through as fetch yields
+            them and the list of the items is cached once the iterator is exhausted, an iteration left before its end is not
+            cached. Without the cache the iterator of fetch is returned as is.
+
+            Params:
+                platform_id: the id of the platform
+                remote_id: the id of the authentificated user on the platform, the call is not cached if it's None
+                method: the name of the remote call
+                fields: the list of fields requested
+                fetch: a function without arguments returning the iterator of the remote call, it must not query the db
+        '''
+
+        if not self.ttl or remote_id is None:
+            return fetch()
+
+        key = self._key(platform_id, remote_id, method, fields)
+        entry = cache.get(key)
+
+        if entry is None:
+            return self._pass_through(key, fetch())
+
+        value, fresh_until = entry
+        if fresh_until < time.time() and cache.add(key + ':refresh', True, self.stale_ttl):
+            # the background refresh reads the whole iterator
+            thread = threading.Thread(target=self._refresh, args=(key, lambda: list(fetch())))
+            thread.setDaemon(True)
+            thread.start()
+
+        return iter(value)
+
+
+    def invalidate(self, platform_id, remote_id):
+        '''
+            Invalidate all the cached results of a remote account.
+        '''
+
+        if remote_id is not None:
+            cache.set(self._generation_key(platform_id, remote_id), repr(time.time()), self.ttl + self.stale_ttl)
+
+
+    def _refresh(self, key, fetch):
+        try:
+            self._set(key, fetch())
+        finally:
+            cache.delete(key + ':refresh')
+
+
+    def _pass_through(self, key, items):
+        value = []
+        for item in items:
+            value.append(item)
+            yield item
+        self._set(key, value)
+
+
+    def _set(self, key, value):
+        cache.set(key, (value, time.time() + self.ttl), self.ttl + self.stale_ttl)
+
+
+    def _generation_key(self, platform_id, remote_id):
+        return 'socialconnect:generation:%s:%s' % (platform_id, hashlib.md5(unicode(remote_id).encode('utf-8')).hexdigest())
+
+
+    def _key(self, platform_id, remote_id, method, fields):
+        '''
+            The cache key of a call. The fields and the generation of the account are hashed to fit any cache backend.
+        '''
+
+        generation_key = self._generation_key(platform_id, remote_id)
+        generation = cache.get(generation_key)
+        if generation is None:
+            generation = repr(time.time())
+            if not cache.add(generation_key, generation, self.ttl + self.stale_ttl):
+                generation = cache.get(generation_key, generation)
+
+        call = repr((unicode(remote_id), method, sorted(fields or []), generation))
+        return 'socialconnect:call:%s:%s' % (platform_id, hashlib.md5(call).hexdigest())
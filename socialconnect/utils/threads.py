@@ -0,0 +1,165 @@
+import Queue
+import sys
+import threading
+import time
+
+from socialconnect.utils.exceptions import RemoteTimeoutException
+
+
+def run_concurrently(calls, timeout=None):
+    '''
+        Run functions at the same time, each one in its own thread, and wait for them at most timeout seconds.
+        The threads are daemonic so a call that never returns doesn't prevent the process from exiting.
+
+        Params:
+            calls: a dict of functions without arguments
+            timeout (optional): the time in seconds given to the calls, None to wait until all calls are done
+
+        Return a (results, errors) tuple of dicts with the keys of calls. errors contains the exc_info of the calls that raised
+        an exception. The calls still running after the timeout are in neither dict.
+    '''
+
+    results = {}
+    errors = {}
+
+    def run(key, function):
+        try:
+            results[key] = function()
+        except Exception:
+            errors[key] = sys.exc_info()
+
+    threads = []
+    for key, function in calls.items():
+        thread = threading.Thread(target=run, args=(key, function))
+        thread.setDaemon(True)
+        thread.start()
+        threads.append(thread)
+
+    # all the calls share the same deadline
+    deadline = timeout is not None and time.time() + timeout or None
+    for thread in threads:
+        if deadline is None:
+            thread.join()
+        else:
+            thread.join(max(deadline - time.time(), 0))
+
+    # copy the dicts so that the calls which finish late don't change them
+    return dict(results), dict(errors)
+
+
+class Future(object):
+    '''
+        The result of a function run by a ThreadPool, available once the function returned.
+    '''
+
+    def __init__(self):
+        self._done = threading.Event()
+        self._result = None
+        self._exc_info = None
+
+
+    def done(self):
+        return self._done.isSet()
+
+
+    def result(self, timeout=None):
+        '''
+            Wait for the function at most timeout seconds and return its result or raise its exception.
+            Raise a RemoteTimeoutException if the function is still running after the timeout.
+        '''
+
+        self._done.wait(timeout)
+        if not self._done.isSet():
+            raise RemoteTimeoutException(timeout)
+        if self._exc_info is not None:
+            raise self._exc_info[0], self._exc_info[1], self._exc_info[2]
+        return self._result
+
+
+    def exc_info(self):
+        '''
+            Return the exc_info of the exception raised by the function, or None.
+        '''
+
+        return self._exc_info
+
+
+    def _set(self, result=None, exc_info=None):
+        self._result = result
+        self._exc_info = exc_info
+        self._done.set()
+
+
+class ThreadPool(object):
+    '''
+        A fixed number of daemon threads running the functions submitted by all the threads of the process, so that many
+        remote calls can be in progress at the same time without a thread per call. The threads are started on first use.
+
+        Params:
+            size: the number of threads
+    '''
+
+    def __init__(self, size=20):
+        self.size = size
+        self._queue = Queue.Queue()
+        self._threads = []
+        self._lock = threading.Lock()
+
+
+    def submit(self, function, *args, **kwargs):
+        '''
+            Queue a call of a function and return its Future.
+        '''
+
+        if len(self._threads) < self.size:
+            self._start()
+
+        future = Future()
+        self._queue.put((future, function, args, kwargs))
+        return future
+
+
+    def _start(self):
+        self._lock.acquire()
+        try:
+            while len(self._threads) < self.size:
+                thread = threading.Thread(target=self._work)
+                thread.setDaemon(True)
+                thread.start()
+                self._threads.append(thread)
+        finally:
+            self._lock.release()
+
+
+    def _work(self):
+        while True:
+            future, function, args, kwargs = self._queue.get()
+            try:
+                future._set(function(*args, **kwargs))
+            except Exception:
+                future._set(exc_info=sys.exc_info())
+
+
+def wait_all(futures, timeout=None):
+    '''
+        Wait for a dict of futures with a shared deadline.
+
+        Return a (results, errors) tuple of dicts with the keys of futures, like run_concurrently. errors contains the
+        exc_info of the functions that raised an exception. The functions still running after the timeout are in neither dict.
+    '''
+
+    results = {}
+    errors = {}
+    deadline = timeout is not None and time.time() + timeout or None
+    for key, future in futures.items():
+        try:
+            if deadline is None:
+                results[key] = future.result()
+            else:
+                results[key] = future.result(max(deadline - time.time(), 0))
+        except RemoteTimeoutException:
+            if future.done():
+                errors[key] = future.exc_info()
+        except Exception:
+            errors[key] = sys.exc_info()
+    return results, errors
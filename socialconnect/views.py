@@ -1,9 +1,10 @@
 import time
 
+from django.conf import settings
 from django.contrib.auth.decorators import login_required
 from django.contrib.sites.models import Site
 from django.core.urlresolvers import reverse
-from django.http import HttpResponseRedirect, HttpResponse
+from django.http import HttpResponseRedirect, HttpResponse, Http404
 
 from facebook import Facebook
 from oauth import oauth
@@ -11,7 +12,7 @@ from opensocial import OpenSocial
 from restclient import GET
 
 from socialconnect.models import PlatformAccount, PlatformOSAccount, PlatformFBAccount
-from socialconnect.models import SocialContext
+from socialconnect.models import SocialContext, platform_registry, remote_metrics
 from socialconnect.utils.decorators import exception_handler
 from socialconnect.utils.exceptions import *
 
@@ -30,14 +31,14 @@ def fb_after_login(request):
     fb_platform = social_context.current_platform.as_leaf_class()
     
     # create a com object
-    com_object = Facebook(fb_platform.api_key, fb_platform.api_secret, request.GET['auth_token'])
+    com_object = fb_platform.create_com_object(request.GET['auth_token'])
     
     # get a session
     com_object.auth.getSession()
 
     # create a platform account if necessary
     try:
-        platform_account = PlatformAccount.objects.get(user=request.user.get_profile(), platform=social_context.current_platform).as_leaf_class()
+        platform_account = PlatformAccount.objects.get_leaf(user=request.user.get_profile(), platform=social_context.current_platform)
         
         # check if the token is for the actual user (the FB tokens have the following format : xxxxxxxxxxxx-123456789 where 123456789 is the FB user id)
         if com_object.session_key.split('-')[-1] != platform_account.remote_id:
@@ -145,7 +146,7 @@ def oauth_exchange_token(request):
     
     # create a platform account if necessary
     try:    
-        platform_account = PlatformAccount.objects.get(user=request.user.get_profile(), platform=social_context.current_platform).as_leaf_class()
+        platform_account = PlatformAccount.objects.get_leaf(user=request.user.get_profile(), platform=social_context.current_platform)
         
         # update the db
         platform_account.update_token(com_object)
@@ -169,3 +170,15 @@ def oauth_exchange_token(request):
     return HttpResponseRedirect(reverse(request.session['callback_view'], args=request.session['callback_args']))   
         
 
+
+def metrics(request):
+    '''
+        The latency histograms of the remote calls of this process in the Prometheus text format.
+        Only served to the INTERNAL_IPS and to the staff.
+    '''
+    
+    if request.META.get('REMOTE_ADDR') not in settings.INTERNAL_IPS and not request.user.is_staff:
+        raise Http404
+    
+    platform_names = dict([(platform.id, platform.name) for platform in platform_registry.all()])
+    return HttpResponse(remote_metrics.render(platform_names), mimetype='text/plain; version=0.0.4')
@@ -57,6 +57,7 @@ TEMPLATE_LOADERS = (
 
 
 MIDDLEWARE_CLASSES = (
+    'socialconnect.middleware.QueryBudgetMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
@@ -94,6 +95,73 @@ CACHE_BACKEND = 'dummy:///'
 
 AUTH_PROFILE_MODULE = 'accounts.UserProfile'
 
+## SocialConnect settings ##
+
+# time in seconds given to each platform when several platforms are called at the same time
+SOCIALCONNECT_REMOTE_TIMEOUT = 10
+
+# time in seconds the friends, profiles and groups retrieved from a platform are cached (0 disables the cache),
+# then the time in seconds they are still served while being refreshed
+SOCIALCONNECT_CACHE_TTL = 300
+SOCIALCONNECT_CACHE_STALE_TTL = 600
+
+# send the stories and the notifications in background with the process_remote_jobs command instead of during the request,
+# then the retry policy of the failed calls: delay in seconds before the first retry (doubled at each attempt) and maximum attempts
+SOCIALCONNECT_ASYNC_DISPATCH = False
+SOCIALCONNECT_JOB_RETRY_DELAY = 60
+SOCIALCONNECT_JOB_MAX_ATTEMPTS = 5
+
+# time in seconds a job is reserved by the process running it, after which it's run again by another process
+SOCIALCONNECT_JOB_LEASE = 300
+
+# maximum number of recipients per notification call, keyed by platform id (the default of the proxy is used for the others)
+SOCIALCONNECT_NOTIFICATIONS_PER_REQUEST = {}
+
+# request budgets keyed by platform id: a (requests per second, burst) token bucket for the whole platform and one for each
+# remote account, for example {1: {'platform': (50, 100), 'account': (1, 10)}}. The buckets are stored in the cache backend,
+# it must be shared by the processes (memcached for example). The calls wait for a token at most SOCIALCONNECT_RATE_LIMIT_MAX_WAIT
+# seconds, or fail at once if SOCIALCONNECT_RATE_LIMIT_BLOCK is False.
+SOCIALCONNECT_RATE_LIMITS = {}
+SOCIALCONNECT_RATE_LIMIT_BLOCK = True
+SOCIALCONNECT_RATE_LIMIT_MAX_WAIT = 5
+
+# circuit breaker of each platform: the circuit opens when SOCIALCONNECT_BREAKER_FAILURE_RATE of the calls of the last
+# SOCIALCONNECT_BREAKER_WINDOW seconds failed (at least SOCIALCONNECT_BREAKER_MIN_CALLS calls), then the calls fail at once for
+# SOCIALCONNECT_BREAKER_OPEN_TIME seconds before a probe. The timeout of the calls adapts to the latency of the platform
+# between SOCIALCONNECT_REMOTE_MIN_TIMEOUT and SOCIALCONNECT_REMOTE_TIMEOUT seconds.
+SOCIALCONNECT_BREAKER_WINDOW = 60
+SOCIALCONNECT_BREAKER_MIN_CALLS = 10
+SOCIALCONNECT_BREAKER_FAILURE_RATE = 0.5
+SOCIALCONNECT_BREAKER_OPEN_TIME = 30
+SOCIALCONNECT_REMOTE_MIN_TIMEOUT = 1
+
+# number of threads making the asynchronous calls (SocialContext.gather and get_async_proxy) in each process
+SOCIALCONNECT_ASYNC_WORKERS = 20
+
+# url of the Facebook REST server, None for the real one. To load test with socialconnect.simulator:
+# 'http://localhost:8765/restserver.php'
+SOCIALCONNECT_FACEBOOK_URL = None
+
+# upper bounds in seconds of the latency buckets of the remote call metrics, served by the socialconnect_metrics view
+SOCIALCONNECT_METRICS_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+# dotted paths of callables called with (platform_id, method, status, latency, size) after each remote call
+SOCIALCONNECT_METRICS_SINKS = ()
+
+# maximum number of queries of a request per view (dotted name), for the other views SOCIALCONNECT_QUERY_BUDGET (None for
+# no budget). The requests over budget are logged by socialconnect.middleware.QueryBudgetMiddleware on the
+# socialconnect.queries logger, as are the requests running a query SOCIALCONNECT_QUERY_REPEAT_THRESHOLD times or more
+SOCIALCONNECT_QUERY_BUDGETS = {
+    'yasn.views.get_matched_friends': 10,
+    'yasn.views.remote_comment': 10,
+    'yasn.views.invite_friends': 10,
+}
+SOCIALCONNECT_QUERY_BUDGET = None
+SOCIALCONNECT_QUERY_REPEAT_THRESHOLD = 5
+
+# probability to sample the call site of a repeated query or of a query over budget
+SOCIALCONNECT_QUERY_STACK_SAMPLE_RATE = 0.1
+
 ## YASN settings ##
 LOGIN_URL = '/login/'
 
@@ -19,13 +19,17 @@ from django.shortcuts import get_object_or_404
 from django.views.generic.simple import direct_to_template
 
 from accounts.models import UserProfile
-from socialconnect.models import SocialContext, PlatformAccount, Platform
+from socialconnect.models import SocialContext, PlatformAccount, Platform, RemoteJob
 from socialconnect.utils.decorators import exception_handler
 
 from yasn.models import Relation, Story, StoryComment
 from yasn.forms import UserForm, UserProfileForm, SignupForm, RecoverPasswordForm, StoryForm, StoryCommentForm
 
 
+# number of remote friends displayed per page by invite_friends
+INVITE_PAGE_SIZE = 100
+
+
 @login_required
 def home(request):
     '''
@@ -161,7 +165,7 @@ def profile(request, user_id=None):
     # get the current user profile
     if user_id is None or user_id == str(request.user.id):
         profile = get_object_or_404(UserProfile.objects.select_related(), user=request.user)
-        subscriptions = PlatformAccount.objects.get_user_accounts(profile)
+        subscriptions = PlatformAccount.objects.get_user_accounts(profile).select_related('platform')
         mode = 'self'
         
     # get another user profile
@@ -274,10 +278,10 @@ def get_matched_friends(request, platform_id):
     friends_accounts = social_context.get_friends(request, 'get_matched_friends', True, platform_id)
 
     users = []
-    rel = Relation.objects.select_related(depth=1).filter(user=request.user.get_profile())
+    targets = set(Relation.objects.filter(user=request.user.get_profile()).values_list('target', flat=True))
     
     for account in friends_accounts:                        
-        if list(rel.filter(target=account.user)) == []:
+        if account.user_id not in targets:
             users.append({'username': account.user.user.username, 'givenName': account.user.user.first_name, 'familyName': account.user.user.last_name, 'photo': account.user.picture})
             
     return direct_to_template(request, 'yasn/friends.html', {'friends': users, 'platform': social_context.current_platform.name})           
@@ -419,10 +423,10 @@ def view_story(request, story_id):
         comment_form = StoryCommentForm()
                 
         # get the story
-        story = get_object_or_404(Story, id=story_id)
+        story = get_object_or_404(Story.objects.select_related('author__user'), id=story_id)
         
-        # story comments
-        comments = list(StoryComment.objects.filter(story=story))       
+        # story comments, with their author displayed by the template
+        comments = list(StoryComment.objects.select_related('author__user').filter(story=story))       
     
         # remote platforms that support activities notification where the user has an account 
         platforms = Platform.objects.get_task_user(request.user.get_profile(), 'activities_push')           
@@ -440,18 +444,19 @@ def remote_comment(request, story_id, platform_id):
     # get the social context
     social_context = SocialContext.get_or_create_social_context(request, platform_id)
     
-    # author of the story
-    author = Story.objects.select_related().get(id=story_id).author
+    # the story and its author, with a single query
+    story = Story.objects.select_related('author__user').get(id=story_id)
+    author = story.author
     
-    # try to see if the author has an account on the remote platform
+    # try to see if the author has an account on the remote platform, only its remote id is needed
     try:
-        author_account = PlatformAccount.objects.select_related().get(user=author, platform__id=platform_id)
+        author_account = PlatformAccount.objects.get(user=author, platform=platform_id)
     except PlatformAccount.DoesNotExist:
         author_account = None
         
     # template data
     domain = Site.objects.get_current().domain
-    template_data = {'story_link':'http://'+domain+''+Story.objects.get(id=story_id).get_absolute_url(), 'link':'<a href="http://'+domain+'">YASN</a>'}
+    template_data = {'story_link':'http://'+domain+''+story.get_absolute_url(), 'link':'<a href="http://'+domain+'">YASN</a>'}
     target_ids = None
 
     # if the user has no account on the remote platform, send the author as a string 
@@ -496,16 +501,25 @@ def invite_friends(request, platform_id):
     # get the social context
     social_context = SocialContext.get_or_create_social_context(request, platform_id)
         
-    # friends of the user from the remote platform 
-    remote_friends = social_context.get_friends(request, 'invite_friends', False, platform_id)
+    # the page of friends to display
+    try:
+        page = max(int(request.GET.get('page', 0)), 0)
+    except ValueError:
+        page = 0
+    
+    # a page of friends of the user from the remote platform, the whole list isn't retrieved
+    remote_friends = social_context.get_friends_page(request, 'invite_friends', page, INVITE_PAGE_SIZE, platform_id)
+    
+    # a full page means there may be more friends
+    has_next = len(remote_friends) == INVITE_PAGE_SIZE
     
-    # remote_ids (converted to int) of all user on YASN that synch their account with the remote platform
-    platform_accounts_ids = [int(x) for x in PlatformAccount.objects.filter(platform__id=1).values_list('remote_id', flat=True)]
+    # remote_ids of the friends that synch their account with the remote platform
+    platform_accounts_ids = [account.remote_id for account in social_context.match_accounts(remote_friends.ids)]
     
     # filter to remove the friends form the remote platform that have already synch their account with YASN 
-    remote_friends = filter(lambda user: not user.id in platform_accounts_ids, remote_friends)
+    remote_friends = remote_friends.exclude_ids(platform_accounts_ids)
     
-    return direct_to_template(request, 'yasn/friends.html', {'friends': remote_friends, 'platform': social_context.current_platform, 'invite': True})
+    return direct_to_template(request, 'yasn/friends.html', {'friends': remote_friends, 'platform': social_context.current_platform, 'invite': True, 'page': page, 'has_next': has_next})
 
 
 @login_required
@@ -523,16 +537,29 @@ def send_invite_friends(request, platform_id):
         for item in request.POST:
             if reg.match(item):
                 ids.append(item.split('-', 1)[1])
+        
+        # nobody to invite
+        if not ids:
+            return direct_to_template(request, 'yasn/message.html', {'message': 'No friend was selected.', 'back': reverse('invite_friends', args=[platform_id])})
             
-            # get the social context    
-            social_context = SocialContext.get_or_create_social_context(request, platform_id)
-            
-            # text of the invitation
-            text = 'ask you to join him on <a href="http://'+Site.objects.get_current().domain+'">YASN<a/> to experience a new social network! <a href="http://'+Site.objects.get_current().domain+''+reverse('signup')+'">Join now!</a>'
-
-            # send the invitations
-            response = social_context.send_notifications(request, 'send_invite_friends', ids, text, platform_id)
-        return direct_to_template(request, 'yasn/message.html', {'message': 'Invitations sent!', 'back': reverse('friends')})
+        # get the social context    
+        social_context = SocialContext.get_or_create_social_context(request, platform_id)
+        
+        # text of the invitation
+        domain = Site.objects.get_current().domain
+        text = 'ask you to join him on <a href="http://'+domain+'">YASN<a/> to experience a new social network! <a href="http://'+domain+''+reverse('signup')+'">Join now!</a>'
+
+        # send the invitations with a single call (queued if SOCIALCONNECT_ASYNC_DISPATCH is enabled)
+        response = social_context.send_notifications(request, 'send_invite_friends', ids, text, platform_id)
+        if isinstance(response, RemoteJob):
+            message = 'Invitations will be sent shortly!'
+        else:
+            sent, failed = response
+            if failed:
+                message = 'Invitations sent to %d friend(s), %d could not be invited, please try again later.' % (len(sent), len(failed))
+            else:
+                message = 'Invitations sent!'
+        return direct_to_template(request, 'yasn/message.html', {'message': message, 'back': reverse('friends')})
             
     return HttpResponseRedirect(reverse('home'))
     